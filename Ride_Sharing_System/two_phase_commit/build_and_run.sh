@@ -10,6 +10,9 @@ GREEN='\033[0;32m'
 YELLOW='\033[1;33m'
 NC='\033[0m' # No Color
 
+# diagnostics.py is shared with the Raft cluster: refuse to build from a drifted copy
+bash ../../Task_Scheduler_System/tests/check_diagnostics_copies.sh || exit 1
+
 # Step 1: Generate Python code from proto file
 echo ""
 echo "[1/6] Generating gRPC code from proto file..."
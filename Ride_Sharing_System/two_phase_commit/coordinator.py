@@ -1,11 +1,11 @@
 import grpc
-from concurrent import futures
 import time
 import uuid
 import logging
 from typing import List, Dict, Tuple
 import two_phase_commit_pb2 as pb2
 import two_phase_commit_pb2_grpc as pb2_grpc
+from diagnostics import DiagnosticsServer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -69,10 +69,14 @@ class TwoPhaseCommitCoordinator(pb2_grpc.TwoPhaseCommitCoordinatorServicer):
         logger.info(f"[{self.node_id}] Final Status: {decision_str}")
         logger.info(f"{'='*70}\n")
         
+        message = f"Transaction {decision_str}"
+        if not vote_result['success']:
+            message += f" ({vote_result['reason']})"  # lets clients break aborts down by reason
+        
         return pb2.TransactionResponse(
             transaction_id=transaction_id,
             success=(final_decision == pb2.GLOBAL_COMMIT),
-            message=f"Transaction {decision_str}",
+            message=message,
             timestamp=int(time.time()),
             final_decision=decision_str
         )
@@ -144,7 +148,8 @@ class TwoPhaseCommitCoordinator(pb2_grpc.TwoPhaseCommitCoordinatorServicer):
         logger.info(f"  ABORT Votes: {len(failed_participants)}")
         
         if len(failed_participants) > 0:
-            reason = f"Failed participants: {[p['participant'] for p in failed_participants]}"
+            # "<participant>: <reason>" per failed participant, also returned to the client
+            reason = "; ".join(f"{p['participant']}: {p['reason']}" for p in failed_participants)
             return {'success': False, 'reason': reason, 'failed': failed_participants}
         
         return {'success': True, 'votes': vote_responses}
@@ -198,9 +203,10 @@ class TwoPhaseCommitCoordinator(pb2_grpc.TwoPhaseCommitCoordinatorServicer):
         return {'acknowledgments': acknowledgments}
 
 
-def serve(port: int = 50050, participant_addresses: List[str] = None):
+def serve(port: int = 50050, participant_addresses: List[str] = None,
+          diag_host: str = '127.0.0.1', diag_port: int = 0):
     """
-    Start the coordinator gRPC server
+    Start the coordinator gRPC server (and the local diagnostics endpoint unless diag_port is 0)
     """
     if participant_addresses is None:
         # Default participant addresses
@@ -212,7 +218,9 @@ def serve(port: int = 50050, participant_addresses: List[str] = None):
             'participant5:50055'
         ]
     
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    diagnostics = DiagnosticsServer()
+    server = grpc.server(diagnostics.thread_pool('coordinator', max_workers=10),
+                         interceptors=[diagnostics.rpc_timer])
     coordinator = TwoPhaseCommitCoordinator(participant_addresses)
     
     pb2_grpc.add_TwoPhaseCommitCoordinatorServicer_to_server(coordinator, server)
@@ -224,12 +232,15 @@ def serve(port: int = 50050, participant_addresses: List[str] = None):
     logger.info(f"[COORDINATOR] Two-Phase Commit Coordinator Started")
     logger.info(f"[COORDINATOR] Listening on port {port}")
     logger.info(f"[COORDINATOR] Managing {len(participant_addresses)} participants")
+    if diagnostics.start(diag_host, diag_port):
+        logger.info(f"[COORDINATOR] Diagnostics on http://{diag_host}:{diag_port}/stats")
     logger.info(f"{'='*70}\n")
     
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
         logger.info("[COORDINATOR] Shutting down...")
+        diagnostics.stop()
         server.stop(0)
 
 
@@ -240,4 +251,7 @@ if __name__ == '__main__':
                              'participant1:50051,participant2:50052,participant3:50053,'
                              'participant4:50054,participant5:50055')
     participant_addresses = addresses_str.split(',')
-    serve(port, participant_addresses)
\ No newline at end of file
+    # Local HTTP diagnostics endpoint (RPC timings, thread pool, profiler); 0 disables it
+    diag_host = os.getenv('DIAG_HOST', '127.0.0.1')
+    diag_port = int(os.getenv('DIAG_PORT', str(port + 1000)))
+    serve(port, participant_addresses, diag_host, diag_port)
\ No newline at end of file
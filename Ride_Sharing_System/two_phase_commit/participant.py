@@ -1,5 +1,4 @@
 import grpc
-from concurrent import futures
 import time
 import logging
 import random
@@ -7,6 +6,7 @@ import os
 from typing import Dict
 import two_phase_commit_pb2 as pb2
 import two_phase_commit_pb2_grpc as pb2_grpc
+from diagnostics import DiagnosticsServer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -285,9 +285,10 @@ class DecisionPhase(pb2_grpc.ParticipantDecisionPhaseServicer,
 
 
 def serve_voting_phase(port: int, participant_id: str, service_name: str, 
-                      decision_phase_port: int):
+                      decision_phase_port: int, diagnostics: DiagnosticsServer):
     # Start the voting phase gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=5))
+    server = grpc.server(diagnostics.thread_pool('voting', max_workers=5),
+                         interceptors=[diagnostics.rpc_timer])
     voting_phase = VotingPhase(participant_id, service_name, decision_phase_port)
     
     pb2_grpc.add_ParticipantVotingPhaseServicer_to_server(voting_phase, server)
@@ -299,10 +300,12 @@ def serve_voting_phase(port: int, participant_id: str, service_name: str,
     return server
 
 
-def serve_decision_phase(port: int, participant_id: str, service_name: str):
+def serve_decision_phase(port: int, participant_id: str, service_name: str,
+                         diagnostics: DiagnosticsServer):
     
     # Start the decision phase gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=5))
+    server = grpc.server(diagnostics.thread_pool('decision', max_workers=5),
+                         interceptors=[diagnostics.rpc_timer])
     decision_phase = DecisionPhase(participant_id, service_name)
     
     pb2_grpc.add_ParticipantDecisionPhaseServicer_to_server(decision_phase, server)
@@ -321,6 +324,9 @@ if __name__ == '__main__':
     decision_port = int(os.getenv('DECISION_PORT', '60051'))
     participant_id = os.getenv('PARTICIPANT_ID', 'PARTICIPANT_1')
     service_name = os.getenv('SERVICE_NAME', 'GenericService')
+    # Local HTTP diagnostics endpoint for both phases of this process; 0 disables it
+    diag_host = os.getenv('DIAG_HOST', '127.0.0.1')
+    diag_port = int(os.getenv('DIAG_PORT', str(voting_port + 1000)))
     
     logger.info(f"\n{'='*70}")
     logger.info(f"[{participant_id}] Starting Two-Phase Commit Participant")
@@ -330,13 +336,17 @@ if __name__ == '__main__':
     logger.info(f"{'='*70}\n")
     
     # Start both phases
-    voting_server = serve_voting_phase(voting_port, participant_id, service_name, decision_port)
-    decision_server = serve_decision_phase(decision_port, participant_id, service_name)
+    diagnostics = DiagnosticsServer()
+    voting_server = serve_voting_phase(voting_port, participant_id, service_name, decision_port, diagnostics)
+    decision_server = serve_decision_phase(decision_port, participant_id, service_name, diagnostics)
+    if diagnostics.start(diag_host, diag_port):
+        logger.info(f"[{participant_id}] Diagnostics on http://{diag_host}:{diag_port}/stats")
     
     try:
         voting_server.wait_for_termination()
         decision_server.wait_for_termination()
     except KeyboardInterrupt:
         logger.info(f"[{participant_id}] Shutting down...")
+        diagnostics.stop()
         voting_server.stop(0)
         decision_server.stop(0)
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Concurrent load generator for the 2PC coordinator.
+
+Many workers send BOOK_RIDE transactions to the coordinator, either as fast as the
+coordinator answers (closed loop) or at a target rate (--tps, open loop: latency
+is measured from the scheduled send time, so queueing shows up in the numbers).
+Riders and drivers are drawn from Zipf distributions so a few hot drivers get a
+large share of the bookings, as in a real city.
+
+Reports commit/abort/error rates with aborts broken down by participant reason,
+latency percentiles, and throughput per second. Use it to size the coordinator
+and the participants.
+
+Usage:
+    python performance_test.py --workers 20 --duration 60
+    python performance_test.py --tps 200 --workers 50 --duration 60 --output results.json
+"""
+import argparse
+import bisect
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+import grpc
+import two_phase_commit_pb2 as pb2
+import two_phase_commit_pb2_grpc as pb2_grpc
+
+LOCATIONS = [
+    'Downtown Dallas', 'DFW Airport', 'Love Field', 'Deep Ellum', 'Uptown',
+    'Bishop Arts', 'UT Arlington', 'Fair Park', 'Oak Lawn', 'Las Colinas'
+]
+
+
+def print_header(title):
+    """Print a formatted header"""
+    print("\n" + "="*60)
+    print(f"  {title}")
+    print("="*60)
+
+
+class ZipfSampler:
+    # Draws ids 1..n with P(k) proportional to 1 / k**s (s=0 is uniform)
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        weights = [1.0 / (k ** s) for k in range(1, n + 1)]
+        total = sum(weights)
+        self.cdf = list(itertools.accumulate(w / total for w in weights))
+
+    def sample(self):
+        return min(bisect.bisect_left(self.cdf, self.rng.random()), len(self.cdf) - 1) + 1
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def abort_reasons(message):
+    # "Transaction GLOBAL_ABORT (PARTICIPANT_1: Driver not available; ...)" -> one entry per participant
+    if '(' not in message:
+        return [message or "unknown"]
+    return [reason.strip() for reason in message[message.index('(') + 1:message.rindex(')')].split(';')]
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.riders = ZipfSampler(args.riders, args.rider_skew, self.rng)
+        self.drivers = ZipfSampler(args.drivers, args.driver_skew, self.rng)
+        self.lock = threading.Lock()
+        self.latencies = {'COMMIT': [], 'ABORT': []}  # seconds
+        self.outcomes = {'COMMIT': 0, 'ABORT': 0, 'ERROR': 0}
+        self.reasons = {}  # "PARTICIPANT_n: reason" or gRPC status -> count
+        self.timeline = {}  # second -> {'COMMIT': n, 'ABORT': n, 'ERROR': n}
+        self.driver_bookings = {}  # driver id -> transactions sent
+        self.stop = threading.Event()
+        self.start_time = None
+
+    def _transaction(self):
+        with self.rng_lock:
+            rider = self.riders.sample()
+            driver = self.drivers.sample()
+            fare = round(min(self.rng.lognormvariate(3.2, 0.4), 200.0), 2)  # median ~$25
+            pickup, destination = self.rng.sample(LOCATIONS, 2)
+        with self.lock:
+            self.driver_bookings[driver] = self.driver_bookings.get(driver, 0) + 1
+        return pb2.TransactionRequest(
+            transaction_id=str(uuid.uuid4()),
+            operation_type="BOOK_RIDE",
+            parameters={
+                'rider_id': f'rider_{rider}',
+                'driver_id': f'driver_{driver}',
+                'amount': f'{fare:.2f}',
+                'pickup': pickup,
+                'destination': destination
+            }
+        )
+
+    def _send(self, stub, intended_at):
+        # One transaction; latency counts from intended_at (the scheduled send time)
+        request = self._transaction()
+        try:
+            response = stub.InitiateTransaction(request, timeout=self.args.timeout)
+            outcome = 'COMMIT' if response.success else 'ABORT'
+            reasons = [] if response.success else abort_reasons(response.message)
+        except grpc.RpcError as e:
+            outcome = 'ERROR'
+            reasons = [f"RPC {e.code().name}"]
+        done_at = time.perf_counter()
+
+        with self.lock:
+            self.outcomes[outcome] += 1
+            if outcome != 'ERROR':
+                self.latencies[outcome].append(done_at - intended_at)
+            for reason in reasons:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            second = self.timeline.setdefault(int(done_at - self.start_time), {'COMMIT': 0, 'ABORT': 0, 'ERROR': 0})
+            second[outcome] += 1
+
+    def _closed_loop_worker(self):
+        # One channel per worker, reused for every transaction
+        channel = grpc.insecure_channel(self.args.coordinator)
+        stub = pb2_grpc.TwoPhaseCommitCoordinatorStub(channel)
+        while not self.stop.is_set():
+            self._send(stub, time.perf_counter())
+        channel.close()
+
+    def _open_loop_worker(self, schedule):
+        channel = grpc.insecure_channel(self.args.coordinator)
+        stub = pb2_grpc.TwoPhaseCommitCoordinatorStub(channel)
+        while True:
+            intended_at = schedule.get()
+            if intended_at is None:
+                break
+            self._send(stub, intended_at)
+        channel.close()
+
+    def _dispatch(self, schedule, end_at):
+        # Open loop: transaction i is due at start + i / tps, whether or not workers keep up
+        interval = 1.0 / self.args.tps
+        for i in itertools.count():
+            intended_at = self.start_time + i * interval
+            if intended_at >= end_at:
+                break
+            delay = intended_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            schedule.put(intended_at)
+        for _ in range(self.args.workers):
+            schedule.put(None)
+
+    def run(self):
+        args = self.args
+        self.start_time = time.perf_counter()
+        end_at = self.start_time + args.duration
+
+        if args.tps:
+            schedule = queue.Queue()
+            threads = [threading.Thread(target=self._dispatch, args=(schedule, end_at))]
+            threads += [threading.Thread(target=self._open_loop_worker, args=(schedule,))
+                        for _ in range(args.workers)]
+        else:
+            threads = [threading.Thread(target=self._closed_loop_worker) for _ in range(args.workers)]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        time.sleep(max(0.0, end_at - time.perf_counter()))
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - self.start_time)
+
+    def report(self, elapsed):
+        args = self.args
+        total = sum(self.outcomes.values())
+
+        def latency_ms(values):
+            values = sorted(values)
+            summary = {name: percentile(values, p) * 1000 for name, p in
+                       (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9))}
+            summary['max'] = values[-1] * 1000 if values else 0.0
+            summary['mean'] = sum(values) / len(values) * 1000 if values else 0.0
+            return summary
+
+        # How concentrated the load was on the hottest drivers
+        bookings = sorted(self.driver_bookings.values(), reverse=True)
+        top = max(1, args.drivers // 100)
+        seconds = max(self.timeline) + 1 if self.timeline else 0
+
+        return {
+            'config': {
+                'coordinator': args.coordinator,
+                'mode': 'open' if args.tps else 'closed',
+                'target_tps': args.tps,
+                'workers': args.workers,
+                'duration_s': args.duration,
+                'riders': args.riders,
+                'drivers': args.drivers,
+                'rider_skew': args.rider_skew,
+                'driver_skew': args.driver_skew,
+            },
+            'elapsed_s': elapsed,
+            'transactions': total,
+            'throughput_tps': total / elapsed if elapsed > 0 else 0.0,
+            'outcomes': self.outcomes,
+            'rates': {outcome: count / total if total else 0.0 for outcome, count in self.outcomes.items()},
+            'abort_reasons': dict(sorted(self.reasons.items(), key=lambda item: -item[1])),
+            'latency_ms': {
+                'all': latency_ms(self.latencies['COMMIT'] + self.latencies['ABORT']),
+                'commit': latency_ms(self.latencies['COMMIT']),
+                'abort': latency_ms(self.latencies['ABORT']),
+            },
+            'timeline': [self.timeline.get(second, {'COMMIT': 0, 'ABORT': 0, 'ERROR': 0})
+                         for second in range(seconds)],
+            'hot_drivers': {
+                'top_percent_drivers': top,
+                'share_of_bookings': sum(bookings[:top]) / total if total else 0.0,
+                'busiest_driver_bookings': bookings[0] if bookings else 0,
+            },
+        }
+
+
+def print_report(report):
+    config = report['config']
+    mode = f"open loop at {config['target_tps']} TPS" if config['mode'] == 'open' else "closed loop"
+    print_header(f"2PC LOAD TEST ({mode}, {config['workers']} workers)")
+
+    total = report['transactions']
+    print(f"Transactions: {total} in {report['elapsed_s']:.1f}s ({report['throughput_tps']:.1f} TPS)")
+    for outcome in ('COMMIT', 'ABORT', 'ERROR'):
+        print(f"  {outcome:7} {report['outcomes'][outcome]:8}  ({report['rates'][outcome] * 100:.1f}%)")
+
+    if report['abort_reasons']:
+        print("\nAbort reasons (a transaction can have several):")
+        for reason, count in report['abort_reasons'].items():
+            print(f"  {count:8}  {reason}")
+
+    print("\nLatency (ms)      p50      p90      p99    p99.9      max")
+    for name, latency in report['latency_ms'].items():
+        print(f"  {name:8} {latency['p50']:9.1f}{latency['p90']:9.1f}{latency['p99']:9.1f}"
+              f"{latency['p999']:9.1f}{latency['max']:9.1f}")
+
+    hot = report['hot_drivers']
+    print(f"\nHottest {hot['top_percent_drivers']} drivers (top 1%) got {hot['share_of_bookings'] * 100:.1f}% "
+          f"of bookings (busiest: {hot['busiest_driver_bookings']})")
+
+    print("\nThroughput over time (per second: commit / abort / error)")
+    for second, counts in enumerate(report['timeline']):
+        print(f"  {second:4}s  {counts['COMMIT']:6} / {counts['ABORT']:5} / {counts['ERROR']:5}")
+    print("="*60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the 2PC coordinator")
+    parser.add_argument('--coordinator', default='localhost:50050', help="coordinator address")
+    parser.add_argument('--workers', type=int, default=10, help="concurrent client threads")
+    parser.add_argument('--tps', type=float, default=0, help="target transactions/s (0: closed loop)")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run")
+    parser.add_argument('--timeout', type=float, default=15.0, help="per-transaction timeout in seconds")
+    parser.add_argument('--riders', type=int, default=10000, help="distinct rider ids")
+    parser.add_argument('--drivers', type=int, default=500, help="distinct driver ids")
+    parser.add_argument('--rider-skew', type=float, default=0.5, help="Zipf exponent for riders (0: uniform)")
+    parser.add_argument('--driver-skew', type=float, default=1.1, help="Zipf exponent for drivers (hot drivers)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible id/fare sequences")
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = LoadTest(args).run()
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
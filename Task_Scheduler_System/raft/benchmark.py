@@ -0,0 +1,413 @@
+"""Throughput and commit-latency benchmark for a running Raft cluster.
+
+Workers submit SET operations through RaftClient (leader caching, NOT_LEADER
+redirects) and record the commit latency of each one in a histogram.
+
+  closed loop (default): --concurrency workers each keep one operation in flight
+  open loop (--rate R):  operations are issued on a fixed schedule of R per second
+                         and latency is measured from the scheduled send time, so
+                         a slow cluster shows up as queueing delay instead of
+                         silently lowering the offered load
+
+With --failover-after S the leader of group 0 is killed S seconds into the run
+(--kill-cmd, "{node}" is replaced by its node id) and the report includes how long
+the cluster took to elect a new leader and to commit the next write.
+
+Usage:
+    python benchmark.py --duration 30 --concurrency 16 --payload 128
+    python benchmark.py --rate 500 --duration 30
+    python benchmark.py --failover-after 10 --kill-cmd "docker kill raft_{node}" \\
+        --restart-cmd "docker start raft_{node}"
+    python benchmark.py --output results.json --baseline previous.json --max-regression 10
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import grpc
+import raft_pb2
+import raft_pb2_grpc
+from client import NODES, RaftClient
+
+
+class LatencyHistogram:
+    """HDR-style histogram: values bucketed with a fixed relative precision.
+
+    A value v is stored in a bucket of width 2**shift where shift is chosen so that
+    v >> shift keeps `precision_bits` significant bits (10 bits: within 0.2%), so
+    memory depends on the range of values, not on how many are recorded.
+    """
+
+    def __init__(self, precision_bits=10):
+        self.precision_bits = precision_bits
+        self.counts = {}  # bucket lower bound -> count
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def _shift(self, value):
+        return max(0, value.bit_length() - self.precision_bits)
+
+    def record(self, value):
+        """Record a non-negative integer value (microseconds)"""
+        shift = self._shift(value)
+        bucket = (value >> shift) << shift
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Highest value equivalent to the p-th percentile (0 < p <= 100)"""
+        if not self.total:
+            return 0
+        rank = max(1, int(round(p / 100.0 * self.total)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(bucket + (1 << self._shift(bucket)) - 1, self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def summary_ms(self):
+        """Latency summary in milliseconds"""
+        return {
+            "min": (self.min or 0) / 1000.0,
+            "p50": self.percentile(50) / 1000.0,
+            "p90": self.percentile(90) / 1000.0,
+            "p99": self.percentile(99) / 1000.0,
+            "p999": self.percentile(99.9) / 1000.0,
+            "max": self.max / 1000.0,
+            "mean": self.mean() / 1000.0,
+        }
+
+    def to_dict(self):
+        return {"unit": "us", "precision_bits": self.precision_bits,
+                "buckets": [[bucket, self.counts[bucket]] for bucket in sorted(self.counts)]}
+
+
+class Benchmark:
+    def __init__(self, args, nodes):
+        self.args = args
+        self.nodes = nodes
+        self.payload = "x" * args.payload
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.histogram = LatencyHistogram()
+        self.errors = {}  # message -> count
+        self.timeline = {}  # second of the run -> committed operations
+        self.commits = []  # (completed_at, leader_id), only kept around a failover
+        self.failover = None
+        self.start_time = None
+        self.measure_from = None
+
+    def _operation(self, worker, seq):
+        return f"SET bench{worker}_{seq % self.args.keys}={self.payload}"
+
+    def _submit(self, client, worker, seq, histogram, errors, intended_at):
+        """Submit one operation; latency counts from intended_at (the scheduled send time)"""
+        response = client.submit(self._operation(worker, seq), timeout=self.args.timeout)  # None: no node reachable
+        done_at = time.perf_counter()
+
+        if done_at < self.measure_from:
+            return  # warmup
+        if response is not None and response.success:
+            histogram.record(int((done_at - intended_at) * 1e6))
+            second = int(done_at - self.measure_from)
+            with self.lock:
+                self.timeline[second] = self.timeline.get(second, 0) + 1
+                if self.args.failover_after is not None:
+                    self.commits.append((done_at, response.leader_id))
+        else:
+            message = "no response" if response is None else response.message
+            errors[message] = errors.get(message, 0) + 1
+
+    def _closed_loop_worker(self, worker):
+        client = RaftClient(self.nodes, client_id=f"bench{worker}")
+        histogram, errors = LatencyHistogram(), {}
+        for seq in itertools.count():
+            if self.stop.is_set():
+                break
+            self._submit(client, worker, seq, histogram, errors, time.perf_counter())
+        client.close()
+        self._collect(histogram, errors)
+
+    def _open_loop_worker(self, worker, schedule):
+        client = RaftClient(self.nodes, client_id=f"bench{worker}")
+        histogram, errors = LatencyHistogram(), {}
+        while True:
+            item = schedule.get()
+            if item is None:
+                break
+            seq, intended_at = item
+            self._submit(client, worker, seq, histogram, errors, intended_at)
+        client.close()
+        self._collect(histogram, errors)
+
+    def _collect(self, histogram, errors):
+        with self.lock:
+            self.histogram.merge(histogram)
+            for message, count in errors.items():
+                self.errors[message] = self.errors.get(message, 0) + count
+
+    def _dispatch(self, schedule, end_at):
+        """Open loop: enqueue operation seq at start + seq / rate, whether or not workers keep up"""
+        interval = 1.0 / self.args.rate
+        for seq in itertools.count():
+            intended_at = self.start_time + seq * interval
+            if intended_at >= end_at:
+                break
+            delay = intended_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            schedule.put((seq, intended_at))
+        for _ in range(self.args.concurrency):
+            schedule.put(None)
+
+    def _leader_of(self, node_ids):
+        """Group 0 leader according to any of node_ids (None if none knows one)"""
+        for node_id in node_ids:
+            try:
+                channel = grpc.insecure_channel(self.nodes[node_id])
+                info = raft_pb2_grpc.RaftClientStub(channel).GetLeader(raft_pb2.LeaderRequest(), timeout=0.5)
+                channel.close()
+            except grpc.RpcError:
+                continue
+            if info.leader_id:
+                return info.leader_id
+        return None
+
+    def _run_failover(self):
+        """Kill the group 0 leader, then time the election of its successor"""
+        if self.stop.wait(self.args.warmup + self.args.failover_after):
+            return
+        old_leader = self._leader_of(list(self.nodes))
+        if old_leader is None:
+            self.failover = {"error": "no leader to kill"}
+            return
+
+        command = self.args.kill_cmd.format(node=old_leader)
+        print(f" Killing leader {old_leader}: {command}")
+        killed_at = time.perf_counter()
+        subprocess.run(command, shell=True, check=False)
+
+        survivors = [node_id for node_id in self.nodes if node_id != old_leader]
+        new_leader, elected_at = None, None
+        while not self.stop.is_set():
+            leader = self._leader_of(survivors)
+            if leader is not None and leader != old_leader:
+                new_leader, elected_at = leader, time.perf_counter()
+                break
+            time.sleep(0.01)
+        print(f" New leader: {new_leader or '-'}")
+        self.failover = {"killed": old_leader, "new_leader": new_leader, "killed_at": killed_at,
+                         "election_s": elected_at - killed_at if elected_at else None}
+
+    def _failover_report(self):
+        if self.failover is None or "killed_at" not in self.failover:
+            return self.failover
+        report = dict(self.failover)
+        killed_at = report.pop("killed_at")
+        # Recovered once a write commits on a leader other than the one killed
+        recovered = sorted(done_at for done_at, leader_id in self.commits
+                           if done_at > killed_at and leader_id != report["killed"])
+        report["write_unavailable_s"] = recovered[0] - killed_at if recovered else None
+        report["killed_at_s"] = killed_at - self.measure_from
+        return report
+
+    def _wait_for_leader(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self._leader_of(list(self.nodes)):
+                return True
+            time.sleep(0.5)
+        return False
+
+    def run(self):
+        args = self.args
+        if not self._wait_for_leader():
+            print(" Error: no leader elected; is the cluster running?")
+            sys.exit(1)
+
+        self.start_time = time.perf_counter()
+        self.measure_from = self.start_time + args.warmup
+        end_at = self.measure_from + args.duration
+
+        threads = []
+        if args.rate:
+            schedule = queue.Queue()
+            threads.append(threading.Thread(target=self._dispatch, args=(schedule, end_at), daemon=True))
+            threads += [threading.Thread(target=self._open_loop_worker, args=(worker, schedule), daemon=True)
+                        for worker in range(args.concurrency)]
+        else:
+            threads += [threading.Thread(target=self._closed_loop_worker, args=(worker,), daemon=True)
+                        for worker in range(args.concurrency)]
+        failover_thread = None
+        if args.failover_after is not None:
+            failover_thread = threading.Thread(target=self._run_failover, daemon=True)
+            failover_thread.start()
+
+        for thread in threads:
+            thread.start()
+        remaining = end_at - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        # Open loop: operations still queued at the end are issued late, not dropped
+        elapsed = time.perf_counter() - self.measure_from
+        if failover_thread:
+            failover_thread.join()
+            if self.failover and self.failover.get("killed") and args.restart_cmd:
+                command = args.restart_cmd.format(node=self.failover["killed"])
+                print(f" Restarting {self.failover['killed']}: {command}")
+                subprocess.run(command, shell=True, check=False)
+
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        args = self.args
+        seconds = max(self.timeline) + 1 if self.timeline else 0
+        return {
+            "benchmark": "raft-submit",
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "version": _git_version(),
+            "config": {
+                "mode": "open" if args.rate else "closed",
+                "rate": args.rate,
+                "concurrency": args.concurrency,
+                "payload_bytes": args.payload,
+                "keys": args.keys,
+                "duration_s": args.duration,
+                "warmup_s": args.warmup,
+                "nodes": self.nodes,
+            },
+            "elapsed_s": elapsed,
+            "committed": self.histogram.total,
+            "errors": self.errors,
+            "throughput_ops_s": self.histogram.total / elapsed if elapsed > 0 else 0,
+            "latency_ms": self.histogram.summary_ms(),
+            "timeline_ops": [self.timeline.get(second, 0) for second in range(seconds)],
+            "failover": self._failover_report(),
+            "histogram": self.histogram.to_dict(),
+        }
+
+
+def _git_version():
+    """Commit the benchmark ran against, so results can be lined up with versions"""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def print_report(report):
+    config = report["config"]
+    latency = report["latency_ms"]
+    mode = f"open loop at {config['rate']} ops/s" if config["mode"] == "open" else "closed loop"
+    print(f"\n Raft benchmark ({mode}, {config['concurrency']} workers, "
+          f"{config['payload_bytes']}-byte values, version {report['version'] or '?'})")
+    print(f"   Committed:  {report['committed']} in {report['elapsed_s']:.1f}s "
+          f"({report['throughput_ops_s']:.0f} ops/s)")
+    print(f"   Latency ms: p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  p99 {latency['p99']:.2f}  "
+          f"p99.9 {latency['p999']:.2f}  max {latency['max']:.2f}")
+    if report["errors"]:
+        errors = ", ".join(f"{message} x{count}" for message, count in sorted(report["errors"].items()))
+        print(f"   Errors:     {errors}")
+    failover = report["failover"]
+    if failover:
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else "-"
+        print(f"   Failover:   killed {failover.get('killed', '-')}, new leader {failover.get('new_leader') or '-'}"
+              f" elected after {seconds(failover.get('election_s'))}, writes resumed after "
+              f"{seconds(failover.get('write_unavailable_s'))}")
+
+
+def compare(report, baseline, max_regression):
+    """Print the change against a previous result; True if within max_regression percent"""
+    def change(new, old):
+        return (new - old) / old * 100.0 if old else 0.0
+
+    print(f"\n Compared with {baseline.get('version') or 'baseline'} ({baseline.get('timestamp', '?')}):")
+    settings = ("mode", "rate", "concurrency", "payload_bytes")
+    if any(report["config"].get(name) != baseline.get("config", {}).get(name) for name in settings):
+        print("   Warning: baseline ran with a different workload (" +
+              ", ".join(f"{name}={baseline.get('config', {}).get(name)}" for name in settings) + ")")
+    ok = True
+    metrics = [("throughput ops/s", report["throughput_ops_s"], baseline["throughput_ops_s"], -1)]
+    metrics += [(f"{name} ms", report["latency_ms"][name], baseline["latency_ms"][name], 1)
+                for name in ("p50", "p99", "p999")]
+    for name, new, old, worse in metrics:
+        delta = change(new, old)
+        regressed = max_regression is not None and delta * worse > max_regression
+        ok = ok and not regressed
+        print(f"   {name:17} {old:10.2f} -> {new:10.2f}  ({delta:+.1f}%){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def parse_nodes(spec):
+    """"node1=host:port,node2=host:port" -> {node_id: address}"""
+    return dict(item.split("=", 1) for item in spec.split(","))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raft SubmitOperation throughput/latency benchmark")
+    parser.add_argument("--nodes", type=parse_nodes, default=dict(NODES),
+                        help="client addresses, e.g. node1=localhost:50151,node2=localhost:50152")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds run before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="workers (closed loop: operations in flight)")
+    parser.add_argument("--rate", type=float, default=0, help="open loop: operations per second (0: closed loop)")
+    parser.add_argument("--payload", type=int, default=16, help="value size in bytes")
+    parser.add_argument("--keys", type=int, default=1000, help="distinct keys per worker")
+    parser.add_argument("--timeout", type=float, default=10, help="per-operation timeout in seconds")
+    parser.add_argument("--failover-after", type=float, default=None,
+                        help="kill the group 0 leader this many seconds into the measured run")
+    parser.add_argument("--kill-cmd", default="docker kill raft_{node}", help="command killing node {node}")
+    parser.add_argument("--restart-cmd", default=None, help="command bringing {node} back after the run")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="with --baseline: exit 1 if throughput or a latency percentile is worse by "
+                             "more than this many percent")
+    args = parser.parse_args()
+
+    report = Benchmark(args, args.nodes).run()
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,263 @@
 import grpc
+import itertools
+import json
 import sys
+import threading
 import time
+import uuid
+from concurrent import futures
 import raft_pb2
 import raft_pb2_grpc
+from sharding import TASK_QUEUE_GROUP, group_for_command, group_for_read, is_cross_group_read
+
+
+# Default node addresses (client ports), by node id
+NODES = {
+    "node1": "localhost:50151",
+    "node2": "localhost:50152",
+    "node3": "localhost:50153",
+    "node4": "localhost:50154",
+    "node5": "localhost:50155",
+}
+
+
+def operation_fields(operation):
+    """ClientRequest / StreamRequest fields for a text or binary (bytes) operation"""
+    return {"payload": operation} if isinstance(operation, bytes) else {"operation": operation}
+
+
+class RaftClient:
+    """Client that caches the leader of each Raft group and follows NOT_LEADER hints.
+    
+    Requests are sent with redirect=True, so a follower answers with the leader's id
+    instead of forwarding; after the first call most requests reach the leader directly.
+    Keys are mapped to groups exactly as the nodes do (sharding.py).
+    
+    Writes are exactly-once: each gets the next sequence number of this client's session
+    and keeps it across retries, so a retry of a write that did commit is answered from
+    the session instead of being applied twice. The session id is client_id plus a
+    random suffix, so separate client processes never share a session. Each group keeps
+    its own session table, so sequence numbers are counted per group.
+    """
+    
+    def __init__(self, nodes=NODES, client_id="client1", max_redirects=3):
+        self.nodes = dict(nodes)
+        self.client_id = f"{client_id}-{uuid.uuid4().hex[:8]}"
+        self.sequences = {}  # group_id -> counter of this client's sequence numbers in that group
+        self.sequence_lock = threading.Lock()
+        self.max_redirects = max_redirects
+        self.leaders = {}  # group_id -> cached leader node id
+        self.num_groups = None  # learned from GetLeader
+        self.channels = {}
+        self.reads_sent = 0  # round-robin position for bounded-staleness reads
+    
+    @property
+    def leader_id(self):
+        """Cached leader of group 0 (the only group unless RAFT_GROUPS is set)"""
+        return self.leaders.get(0)
+    
+    def _stub(self, node_id):
+        address = self.nodes[node_id]
+        if address not in self.channels:
+            self.channels[address] = grpc.insecure_channel(address)
+        return raft_pb2_grpc.RaftClientStub(self.channels[address])
+    
+    def find_leader(self, group_id=0):
+        """Ask nodes who the group's leader is (GetLeader is answered locally, nothing is logged)"""
+        for node_id in list(self.nodes):
+            try:
+                info = self._stub(node_id).GetLeader(raft_pb2.LeaderRequest(group_id=group_id), timeout=1)
+            except grpc.RpcError:
+                continue
+            self.num_groups = info.num_groups or 1
+            if info.leader_id and info.leader_id not in self.nodes:
+                self._learn_node(info.leader_id, info.leader_address)
+            if info.leader_id in self.nodes:
+                self.leaders[group_id] = info.leader_id
+                return info.leader_id
+        return None
+    
+    def groups(self):
+        """Number of Raft groups keys are sharded over (asked once)"""
+        if self.num_groups is None:
+            self.find_leader()
+        return self.num_groups or 1
+    
+    def _learn_node(self, node_id, address):
+        # A node added at runtime advertises its address as configured in the cluster
+        # (e.g. a docker hostname): only use it if it is one of ours, under another id
+        if address in self.nodes.values():
+            self.nodes[node_id] = address
+    
+    def _next_sequence(self, group_id):
+        with self.sequence_lock:
+            return next(self.sequences.setdefault(group_id, itertools.count(1)))
+    
+    def submit(self, operation, timeout=10):
+        """operation is text, or bytes for a binary one (b"SET key=" + raw value; read back from
+        ReadResponse.payload)"""
+        group_id = group_for_command(operation, self.groups())
+        request = raft_pb2.ClientRequest(client_id=self.client_id, redirect=True,
+                                         sequence=self._next_sequence(group_id), **operation_fields(operation))
+        return self._call("SubmitOperation", request, timeout, group_id)
+    
+    def read(self, key, timeout=10, max_staleness_ms=0, min_index=0):
+        """Linearizable read through the leader, or with max_staleness_ms / min_index a
+        bounded-staleness read that any node may answer (spread round-robin over the
+        cluster; a node that is not fresh enough falls back to the leader)"""
+        request = raft_pb2.ReadRequest(key=key, client_id=self.client_id, redirect=True,
+                                       max_staleness_ms=max_staleness_ms, min_index=min_index)
+        if max_staleness_ms > 0 or min_index > 0:
+            nodes = list(self.nodes)
+            node_id = nodes[self.reads_sent % len(nodes)]
+            self.reads_sent += 1
+            try:
+                response = self._stub(node_id).Read(request, timeout=timeout)
+                if response.message != "NOT_LEADER":
+                    return response
+            except grpc.RpcError:
+                pass  # node down: read through the leader instead
+        
+        # A cross-group read can go to any node, which queries every group
+        group_id = 0 if is_cross_group_read(key) else group_for_read(key, self.groups())
+        return self._call("Read", request, timeout, group_id)
+    
+    def submit_stream(self, operations, timeout=60):
+        """Pipeline operations over SubmitStream calls, one per node leading some of their groups.
+        
+        Correlation ids are positions in operations; returns {position: StreamResponse}.
+        Operations a node bounced with NOT_LEADER are resent to the hinted leader.
+        """
+        num_groups = self.groups()
+        group_of = {cid: group_for_command(op, num_groups) for cid, op in enumerate(operations)}
+        pending = dict(enumerate(operations))
+        # Kept when an operation is resent
+        sequences = {cid: self._next_sequence(group_of[cid]) for cid in pending}
+        acks = {}
+        
+        for _ in range(self.max_redirects + 1):
+            targets = {}
+            for group_id in set(group_of[cid] for cid in pending):
+                targets[group_id] = self.leaders.get(group_id) or self.find_leader(group_id)
+            by_target = {}
+            for cid, op in pending.items():
+                target = targets[group_of[cid]]
+                if target is not None:
+                    by_target.setdefault(target, []).append(
+                        raft_pb2.StreamRequest(correlation_id=cid, client_id=self.client_id,
+                                               sequence=sequences[cid], **operation_fields(op))
+                    )
+            if not by_target:
+                time.sleep(0.5)  # election in progress
+                continue
+            
+            with futures.ThreadPoolExecutor(max_workers=len(by_target)) as pool:
+                calls = {target: pool.submit(self._stream_to, target, requests, timeout)
+                         for target, requests in by_target.items()}
+            
+            retry_same_leader = False
+            for target, call in calls.items():
+                responses = call.result()
+                if responses is None:
+                    # Node is down: rediscover the leader of every group it led
+                    for group_id, leader_id in list(self.leaders.items()):
+                        if leader_id == target:
+                            del self.leaders[group_id]
+                    continue
+                for ack in responses:
+                    if ack.message == "NOT_LEADER":
+                        # Never appended, so it can safely be resent as a new request
+                        group_id = group_of[ack.correlation_id]
+                        sequences[ack.correlation_id] = self._next_sequence(group_id)
+                        retry_same_leader = retry_same_leader or ack.leader_id == target
+                        if ack.leader_id in self.nodes:
+                            self.leaders[group_id] = ack.leader_id
+                        else:
+                            self.leaders.pop(group_id, None)
+                        continue
+                    acks[ack.correlation_id] = ack
+                    pending.pop(ack.correlation_id, None)
+            
+            if not pending:
+                break
+            if retry_same_leader:
+                time.sleep(0.05)  # leader is mid-transfer or just stepped down
+        return acks
+    
+    def enqueue(self, task_id, description="", priority=0, deadline_ms=0, timeout=10):
+        """Queue a task; higher priority is claimed first, deadline_ms (epoch ms, 0: none)
+        is when it expires unclaimed"""
+        return self.submit(f"TASK_ENQUEUE {task_id} {priority} {deadline_ms} {description}".rstrip(), timeout)
+    
+    def claim(self, worker_id, max_tasks=1, lease_ms=30000, timeout=10):
+        """Lease up to max_tasks queued tasks to worker_id; list of task dicts (empty if none or on error).
+        A task goes back to the queue unless it is completed or heartbeated within lease_ms."""
+        return self._worker_request(f"TASK_CLAIM {worker_id} {max_tasks} {lease_ms}", timeout)
+    
+    def heartbeat(self, worker_id, lease_ms=30000, timeout=10):
+        """Renew the leases of all tasks held by worker_id; list of the renewed task ids"""
+        return self._worker_request(f"TASK_HEARTBEAT {worker_id} {lease_ms}", timeout)
+    
+    def complete(self, task_id, result="", timeout=10):
+        return self.submit(f"TASK_COMPLETE {task_id} {result}".rstrip(), timeout)
+    
+    def _worker_request(self, operation, timeout):
+        # Not sequenced: the leader batches worker requests, and a lost claim only costs a lease
+        request = raft_pb2.ClientRequest(client_id=self.client_id, redirect=True, operation=operation)
+        response = self._call("SubmitOperation", request, timeout, group_for_command(operation, self.groups()))
+        if response is None or not response.success:
+            return []
+        return json.loads(response.result)
+    
+    def _stream_to(self, target, requests, timeout):
+        """One SubmitStream call; returns its acks, or None if the node could not be reached"""
+        try:
+            return list(self._stub(target).SubmitStream(iter(requests), timeout=timeout))
+        except grpc.RpcError:
+            return None
+    
+    def transfer_leadership(self, target_id="", group_id=0, timeout=10):
+        """Ask the group's leader to hand over to target_id (empty: most up-to-date follower)"""
+        request = raft_pb2.TransferRequest(target_id=target_id, redirect=True, group_id=group_id)
+        response = self._call("TransferLeadership", request, timeout, group_id)
+        if response is not None and response.success:
+            self.leaders[group_id] = response.leader_id
+        return response
+    
+    def change_membership(self, action, address, group_id=0, timeout=10):
+        """add_learner / promote / remove one member of a group (raft address, e.g. raft_node6:50066)"""
+        request = raft_pb2.MembershipRequest(action=action, address=address, redirect=True, group_id=group_id)
+        return self._call("ChangeMembership", request, timeout, group_id)
+    
+    def _call(self, method, request, timeout, group_id=0):
+        response = None
+        for _ in range(self.max_redirects + 1):
+            target = self.leaders.get(group_id) or self.find_leader(group_id)
+            if target is None:
+                time.sleep(0.5)  # election in progress
+                continue
+            
+            try:
+                response = getattr(self._stub(target), method)(request, timeout=timeout)
+            except grpc.RpcError:
+                self.leaders.pop(group_id, None)  # cached leader is down; rediscover
+                continue
+            
+            if response.message != "NOT_LEADER":
+                return response
+            if response.leader_id == target:
+                time.sleep(0.05)  # leader is mid-transfer or just stepped down
+            # Follow the hint; an empty hint means the node knows no leader yet
+            if response.leader_id in self.nodes:
+                self.leaders[group_id] = response.leader_id
+            else:
+                self.leaders.pop(group_id, None)
+        return response
+    
+    def close(self):
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
 
 
 def submit_operation(node_address, operation, client_id="client1"):
@@ -24,6 +279,8 @@ def submit_operation(node_address, operation, client_id="client1"):
             print(f" Response:")
             print(f"   Success: {response.success}")
             print(f"   Message: {response.message}")
+            if response.result:
+                print(f"   Result: {response.result}")
             print(f"   Leader: {response.leader_id}")
             
             return response
@@ -33,19 +290,197 @@ def submit_operation(node_address, operation, client_id="client1"):
         return None
 
 
+def read_key(node_address, key, client_id="client1"):
+    """Linearizable read of a key from a Raft node"""
+    try:
+        with grpc.insecure_channel(node_address) as channel:
+            stub = raft_pb2_grpc.RaftClientStub(channel)
+            
+            print(f"\n Reading key '{key}' from {node_address}")
+            
+            response = stub.Read(raft_pb2.ReadRequest(key=key, client_id=client_id), timeout=10)
+            
+            print(f" Response:")
+            print(f"   Success: {response.success}")
+            print(f"   Message: {response.message}")
+            if response.success:
+                print(f"   Value: {response.value if response.found else '(not found)'}")
+                print(f"   Read Index: {response.read_index}")
+            print(f"   Leader: {response.leader_id}")
+            
+            return response
+    
+    except grpc.RpcError as e:
+        print(f" Error: {e}")
+        return None
+
+
+def submit_to_leader(operation, max_staleness_ms=0):
+    """Send an operation (or GET) straight to the leader via RaftClient.
+    
+    With max_staleness_ms a GET may be answered by any node whose state is fresh enough.
+    """
+    client = RaftClient()
+    try:
+        if operation.upper().startswith("GET "):
+            response = client.read(operation[4:].strip(), max_staleness_ms=max_staleness_ms)
+        else:
+            response = client.submit(operation)
+    finally:
+        client.close()
+    
+    if response is None:
+        print(" Error: no leader reachable")
+        return None
+    print(f" Response from leader {response.leader_id}:" if not max_staleness_ms
+          else f" Bounded-staleness response (leader {response.leader_id}):")
+    print(f"   Success: {response.success}")
+    print(f"   Message: {response.message}")
+    if getattr(response, "result", ""):
+        print(f"   Result: {response.result}")
+    if getattr(response, "found", False):
+        print(f"   Value: {response.value}")
+    if max_staleness_ms:
+        print(f"   Applied Index: {response.read_index}")
+    return response
+
+
+def transfer_leadership(target_id):
+    """Move leadership of every group (e.g. before restarting the leader's container)"""
+    client = RaftClient()
+    num_groups = client.groups()
+    responses = []
+    for group_id in range(num_groups):
+        old_leader = client.find_leader(group_id)
+        start = time.time()
+        response = client.transfer_leadership(target_id, group_id)
+        elapsed = time.time() - start
+        responses.append(response)
+        
+        if response is None:
+            print(f" Error: no leader reachable for group {group_id}")
+            continue
+        print(f" Leadership transfer{f' of group {group_id}' if num_groups > 1 else ''} from {old_leader}:")
+        print(f"   Success: {response.success}")
+        print(f"   Message: {response.message}")
+        print(f"   Leader: {response.leader_id}")
+        print(f"   Took: {elapsed * 1000:.0f} ms")
+    client.close()
+    return responses
+
+
+def change_membership(action, address):
+    """Apply one membership change to every group, e.g. add_learner then promote a new node"""
+    client = RaftClient()
+    num_groups = client.groups()
+    responses = []
+    for group_id in range(num_groups):
+        response = client.change_membership(action, address, group_id)
+        responses.append(response)
+        
+        if response is None:
+            print(f" Error: no leader reachable for group {group_id}")
+            continue
+        print(f" Membership {action} {address}{f' in group {group_id}' if num_groups > 1 else ''}:")
+        print(f"   Success: {response.success}")
+        print(f"   Message: {response.message}")
+        print(f"   Voters: {', '.join(response.voters)}")
+        print(f"   Learners: {', '.join(response.learners) or '-'}")
+    client.close()
+    return responses
+
+
+def stream_benchmark(count):
+    """Pipeline count SET operations over one stream and report throughput"""
+    client = RaftClient()
+    operations = [f"SET stream_{i}={i}" for i in range(count)]
+    
+    start = time.time()
+    acks = client.submit_stream(operations)
+    elapsed = time.time() - start
+    client.close()
+    
+    committed = sum(1 for ack in acks.values() if ack.success)
+    in_order = [ack.correlation_id for ack in acks.values()] == sorted(acks)
+    leaders = sorted(set(client.leaders.values()))
+    print(f" Streamed {count} operations to leader{'s' if len(leaders) > 1 else ''} {', '.join(leaders)}")
+    print(f"   Committed: {committed}/{count} in {elapsed:.2f}s ({committed / elapsed:.0f} ops/s)")
+    print(f"   Acks in submission order: {in_order}")
+
+
+def queue_benchmark(workers, tasks):
+    """Enqueue tasks, drain them with concurrent workers and report claims per log entry
+    (claimed tasks are completed once the queue is empty, so they are not re-queued)"""
+    client = RaftClient()
+    prefix = client.client_id  # fresh task ids on every run
+    client.submit_stream([f"TASK_ENQUEUE {prefix}_{i} {i % 10} 0 work" for i in range(tasks)])
+    
+    def commit_index():
+        # Log entries written so far to the task queue's group
+        return client._stub(client.find_leader(TASK_QUEUE_GROUP)).GetLeader(
+            raft_pb2.LeaderRequest(group_id=TASK_QUEUE_GROUP), timeout=2).commit_index
+    
+    counts = {"requests": 0}
+    claimed_ids = []
+    lock = threading.Lock()
+    
+    def worker(worker_id):
+        worker_client = RaftClient(client_id=worker_id)
+        while time.time() < give_up_at:
+            claimed = worker_client.claim(worker_id, max_tasks=1, lease_ms=120000)
+            with lock:
+                counts["requests"] += 1
+                claimed_ids.extend(task["task_id"] for task in claimed)
+                if len(claimed_ids) >= tasks:
+                    break
+            if not claimed:
+                time.sleep(0.05)  # the queue is drained (or the request failed)
+        worker_client.close()
+    
+    start_index = commit_index()
+    start = time.time()
+    give_up_at = start + 60
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, [f"worker_{i}" for i in range(workers)]))
+    elapsed = time.time() - start
+    entries = max(1, commit_index() - start_index)
+    client.submit_stream([f"TASK_COMPLETE {task_id} done" for task_id in claimed_ids])
+    client.close()
+    
+    print(f" {workers} workers claimed {len(claimed_ids)}/{tasks} tasks in {elapsed:.2f}s "
+          f"({counts['requests'] / elapsed:.0f} claims/s)")
+    print(f"   {counts['requests']} claim requests in {entries} log entries "
+          f"({counts['requests'] / entries:.1f} per entry)")
+
+
 def main():
-    # Default node addresses (client ports)
-    nodes = [
-        "localhost:50151",  # node1 (index 0)
-        "localhost:50152",  # node2 (index 1)
-        "localhost:50153",  # node3 (index 2)
-        "localhost:50154",  # node4 (index 3)
-        "localhost:50155",  # node5 (index 4)
-    ]
+    nodes = list(NODES.values())  # index 0 = node1
     
     if len(sys.argv) > 1:
         # Use command line arguments
         operation = sys.argv[1]
+        if operation == "transfer":
+            transfer_leadership(sys.argv[2] if len(sys.argv) > 2 else "")
+            return
+        if operation == "member":
+            if len(sys.argv) < 4:
+                print(" Usage: client.py member add_learner|promote|remove <raft address>")
+                sys.exit(1)
+            change_membership(sys.argv[2], sys.argv[3])
+            return
+        if operation == "queue":
+            queue_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+                            int(sys.argv[3]) if len(sys.argv) > 3 else 5000)
+            return
+        if operation == "stream":
+            stream_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+            return
+        if len(sys.argv) > 2 and sys.argv[2] == "leader":
+            submit_to_leader(operation)
+            return
+        if len(sys.argv) > 2 and sys.argv[2] == "stale":
+            submit_to_leader(operation, int(sys.argv[3]) if len(sys.argv) > 3 else 2000)
+            return
         node_index = int(sys.argv[2]) if len(sys.argv) > 2 else 0
         
         # Validate node index
@@ -85,7 +520,7 @@ def main():
         
         # Get operation
         try:
-            operation = input("\nEnter operation (e.g., 'SET x=10'): ")
+            operation = input("\nEnter operation (e.g., 'SET x=10' or 'GET x'): ")
             if not operation.strip():
                 print(" Operation cannot be empty")
                 sys.exit(1)
@@ -95,7 +530,10 @@ def main():
     
     # Submit operation
     print(f"\n Targeting: Node {node_index + 1} at {target_node}")
-    submit_operation(target_node, operation)
+    if operation.upper().startswith("GET "):
+        read_key(target_node, operation[4:].strip())
+    else:
+        submit_operation(target_node, operation)
 
 
 if __name__ == "__main__":
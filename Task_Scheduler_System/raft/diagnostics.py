@@ -0,0 +1,662 @@
+"""
+Live diagnostics for a running node: a local HTTP endpoint reporting gRPC handler
+timings, thread pool queue depth, lock contention and thread stacks, plus an
+on-demand sampling profiler. Everything is standard library, so it can be left on
+in production and queried without restarting the node.
+
+    GET  /stats                       pools, locks, RPC timings and process counters
+    GET  /rpcs | /pools | /locks      one section of /stats
+    GET  /threads                     current stack of every thread
+    POST /profile/start?interval_ms=10&duration_s=60
+    POST /profile/stop                stop sampling and return the profile
+    GET  /profile?top=30              the current (or last) profile
+    GET  /profile?format=collapsed    folded stacks for flamegraph.pl / speedscope
+    POST /reset                       zero RPC, pool and lock counters
+
+The same endpoints from the command line (inside the container, DIAG_PORT is set):
+
+    python diagnostics.py stats
+    python diagnostics.py profile start --duration 30
+    python diagnostics.py profile stop --collapsed node1.folded
+
+This file is kept byte-identical in Task_Scheduler_System/raft and
+Ride_Sharing_System/two_phase_commit (each Docker build context needs its own copy);
+Task_Scheduler_System/tests/check_diagnostics_copies.sh fails when they differ.
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+
+# Upper bounds (ms) of the latency histogram buckets used for RPC percentiles
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class TimedLock:
+    """threading.Lock that records how long threads waited for it and held it.
+
+    Uncontended acquisitions take the fast path (one non-blocking acquire); only a
+    thread that actually has to wait reads the clock twice. Counters are updated
+    while the lock is held, so they need no lock of their own. Usable as the lock
+    of a threading.Condition.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            started = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            waited = time.perf_counter() - started
+            self.contended += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+        self.acquisitions += 1
+        self._acquired_at = time.perf_counter()
+        return True
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self.hold_total += held
+        if held > self.hold_max:
+            self.hold_max = held
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def _is_owned(self):
+        # threading.Condition's ownership check, without touching the counters
+        if self._lock.acquire(False):
+            self._lock.release()
+            return False
+        return True
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def stats(self):
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_total_ms": _ms(self.wait_total),
+            "wait_mean_ms": _ms(self.wait_total / self.contended) if self.contended else 0.0,
+            "wait_max_ms": _ms(self.wait_max),
+            "hold_total_ms": _ms(self.hold_total),
+            "hold_max_ms": _ms(self.hold_max),
+            "locked": self.locked(),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+
+class InstrumentedThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """ThreadPoolExecutor reporting its queue depth, busy workers and queueing delay.
+
+    A gRPC server runs every call on its executor, so a deep queue here means
+    requests are waiting for a handler thread, not for the handler itself.
+    """
+
+    def __init__(self, max_workers=None, thread_name_prefix=""):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self._reset()
+
+    def _reset(self):
+        self.completed = 0
+        self.peak_queued = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        submitted_at = time.perf_counter()
+
+        def run():
+            waited = time.perf_counter() - submitted_at
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+                self.queue_wait_total += waited
+                self.queue_wait_max = max(self.queue_wait_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        with self._stats_lock:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        return super().submit(run)
+
+    def stats(self):
+        with self._stats_lock:
+            started = self.completed + self.active
+            return {
+                "max_workers": self._max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "peak_queued": self.peak_queued,
+                "queue_wait_mean_ms": _ms(self.queue_wait_total / started) if started else 0.0,
+                "queue_wait_max_ms": _ms(self.queue_wait_max),
+            }
+
+    def reset(self):
+        with self._stats_lock:
+            self._reset()
+
+
+class RpcTimer(grpc.ServerInterceptor):
+    """gRPC server interceptor timing every handler, per method.
+
+    Streaming handlers are timed until their last response. Latency percentiles
+    come from a fixed histogram (LATENCY_BUCKETS_MS), so memory does not grow
+    with the number of calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}  # method -> counters
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self._wrap(handler_call_details.method, handler)
+
+    def _wrap(self, method, handler):
+        if handler.response_streaming:
+            behavior = handler.stream_stream or handler.unary_stream
+
+            def timed(request, context):
+                started = self._begin(method)
+                failed = True
+                try:
+                    yield from behavior(request, context)
+                    failed = False
+                finally:
+                    self._end(method, started, failed)
+        else:
+            behavior = handler.stream_unary or handler.unary_unary
+
+            def timed(request, context):
+                started = self._begin(method)
+                failed = True
+                try:
+                    response = behavior(request, context)
+                    failed = False
+                    return response
+                finally:
+                    self._end(method, started, failed)
+
+        if handler.request_streaming and handler.response_streaming:
+            make = grpc.stream_stream_rpc_method_handler
+        elif handler.request_streaming:
+            make = grpc.stream_unary_rpc_method_handler
+        elif handler.response_streaming:
+            make = grpc.unary_stream_rpc_method_handler
+        else:
+            make = grpc.unary_unary_rpc_method_handler
+        return make(timed, request_deserializer=handler.request_deserializer,
+                    response_serializer=handler.response_serializer)
+
+    def _begin(self, method):
+        with self._lock:
+            counters = self._methods.get(method)
+            if counters is None:
+                counters = self._methods[method] = self._new_counters()
+            counters["in_flight"] += 1
+        return time.perf_counter()
+
+    def _end(self, method, started, failed):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            counters = self._methods[method]
+            counters["in_flight"] -= 1
+            counters["calls"] += 1
+            counters["errors"] += failed
+            counters["total"] += elapsed
+            counters["max"] = max(counters["max"], elapsed)
+            counters["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+    @staticmethod
+    def _new_counters():
+        return {"calls": 0, "errors": 0, "in_flight": 0, "total": 0.0, "max": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+    @staticmethod
+    def _percentile_ms(buckets, calls, p):
+        # Upper bound of the bucket holding the p-th percentile call (None: above the last bound)
+        rank = max(1, int(round(p / 100.0 * calls)))
+        seen = 0
+        for i, count in enumerate(buckets):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def stats(self):
+        with self._lock:
+            methods = {method: dict(counters, buckets=list(counters["buckets"]))
+                       for method, counters in self._methods.items()}
+        report = {}
+        for method, counters in sorted(methods.items(), key=lambda item: -item[1]["total"]):
+            calls = counters["calls"]
+            report[method] = {
+                "calls": calls,
+                "errors": counters["errors"],
+                "in_flight": counters["in_flight"],
+                "total_ms": _ms(counters["total"]),
+                "mean_ms": _ms(counters["total"] / calls) if calls else 0.0,
+                "max_ms": _ms(counters["max"]),
+                # Histogram bucket bounds: "p99_ms": 25 means 99% of calls took at most 25 ms
+                **{f"p{p}_ms": self._percentile_ms(counters["buckets"], calls, p) if calls else 0.0
+                   for p in (50, 90, 99)},
+            }
+        return report
+
+    def reset(self):
+        with self._lock:
+            for method, counters in self._methods.items():
+                in_flight = counters["in_flight"]
+                self._methods[method] = self._new_counters()
+                self._methods[method]["in_flight"] = in_flight
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over every thread of the process.
+
+    A background thread records the Python stack of each thread every interval.
+    Blocked threads are sampled too (waiting on a lock, a queue or the network),
+    which is what makes stalls visible; a hot spot is a function that shows up in
+    many samples of threads that should be busy. Samples are aggregated per
+    thread group (worker numbers stripped from thread names) and stack.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.started_at = None
+        self.stopped_at = None
+        self.rounds = 0
+        self._stacks = {}  # (thread group, (code, ...) root first) -> samples
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01, duration=60.0):
+        """Start sampling every interval seconds for at most duration seconds; False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.rounds = 0
+            self._stacks = {}
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,), name="diagnostics-profiler",
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, duration):
+        me = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: re.sub(r"[-_]\d+", "", thread.name) for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    while stack and stack[-1].co_filename == threading.__file__:
+                        stack.pop()  # Thread._bootstrap / run, the root of every thread
+                    key = (names.get(ident, "unknown"), tuple(reversed(stack)))
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                self.rounds += 1
+            del frames
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def collapsed(self):
+        """Folded stacks, one "thread;root;...;leaf samples" line per distinct stack"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        return "".join(f"{';'.join([thread] + [self._label(code) for code in codes])} {samples}\n"
+                       for (thread, codes), samples in sorted(stacks, key=lambda item: -item[1]))
+
+    def report(self, top=30):
+        with self._lock:
+            stacks = list(self._stacks.items())
+            rounds = self.rounds
+        self_samples, total_samples, threads = {}, {}, {}
+        for (thread, codes), samples in stacks:
+            threads[thread] = threads.get(thread, 0) + samples
+            if codes:
+                self_samples[codes[-1]] = self_samples.get(codes[-1], 0) + samples
+            for code in set(codes):  # recursion counts once per stack
+                total_samples[code] = total_samples.get(code, 0) + samples
+        total = sum(threads.values())
+
+        def ranking(counts):
+            return [{"function": self._label(code), "samples": samples,
+                     "percent": round(100.0 * samples / total, 1) if total else 0.0}
+                    for code, samples in sorted(counts.items(), key=lambda item: -item[1])[:top]]
+
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval_ms": _ms(self.interval),
+            "duration_s": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "rounds": rounds,
+            "samples": total,
+            "threads": dict(sorted(threads.items(), key=lambda item: -item[1])),
+            "top_self": ranking(self_samples),
+            "top_total": ranking(total_samples),
+        }
+
+
+def thread_stacks():
+    """Current stack of every thread, innermost frame last"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    return {f"{names.get(ident, 'unknown')} ({ident})": traceback.format_stack(frame)
+            for ident, frame in sys._current_frames().items()}
+
+
+class DiagnosticsServer:
+    """Collects a process's instrumented pools, locks and RPC timer and serves them over HTTP.
+
+    Build the gRPC servers with thread_pool() and rpc_timer, register hot locks with
+    add_lock(), then start(). The endpoint binds to localhost by default: it exposes
+    stacks and a profiler, so it is meant for `docker exec`, not for the network.
+    """
+
+    MAX_PROFILE_S = 600
+
+    def __init__(self):
+        self.rpc_timer = RpcTimer()
+        self.profiler = SamplingProfiler()
+        self.pools = {}  # name -> InstrumentedThreadPoolExecutor
+        self.locks = {}  # name -> TimedLock
+        self.started_at = time.time()
+        self._httpd = None
+
+    def thread_pool(self, name, max_workers):
+        """A gRPC server executor reported under name"""
+        pool = self.pools[name] = InstrumentedThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return pool
+
+    def add_lock(self, name, lock):
+        self.locks[name] = lock
+
+    def stats(self):
+        cpu = os.times()
+        return {
+            "process": {
+                "pid": os.getpid(),
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "threads": threading.active_count(),
+                "cpu_user_s": cpu.user,
+                "cpu_system_s": cpu.system,
+            },
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+            "locks": {name: lock.stats() for name, lock in self.locks.items()},
+            "rpcs": self.rpc_timer.stats(),
+        }
+
+    def reset(self):
+        self.rpc_timer.reset()
+        for pool in self.pools.values():
+            pool.reset()
+        for lock in self.locks.values():
+            lock.reset()
+
+    def start(self, host, port):
+        """Serve the endpoints on host:port from a daemon thread (port 0 disables them)"""
+        if not port:
+            return None
+        diagnostics = self
+
+        class Handler(DiagnosticsHandler):
+            server_diagnostics = diagnostics
+
+        self._httpd = ThreadingHTTPServer((host, int(port)), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="diagnostics-http", daemon=True).start()
+        return self._httpd.server_address
+
+    def stop(self):
+        self.profiler.stop()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+
+class DiagnosticsHandler(BaseHTTPRequestHandler):
+    server_diagnostics = None  # set per server by DiagnosticsServer.start()
+
+    def do_GET(self):
+        path, query = self._parse()
+        diagnostics = self.server_diagnostics
+        if path == "/stats":
+            self._reply(200, diagnostics.stats())
+        elif path in ("/rpcs", "/pools", "/locks"):
+            self._reply(200, diagnostics.stats()[path[1:]])
+        elif path == "/threads":
+            self._reply(200, thread_stacks())
+        elif path == "/profile":
+            self._profile(query)
+        else:
+            self._reply(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self):
+        path, query = self._parse()
+        diagnostics = self.server_diagnostics
+        if path == "/profile/start":
+            try:
+                interval = float(query.get("interval_ms", 10)) / 1000.0
+                duration = min(float(query.get("duration_s", 60)), DiagnosticsServer.MAX_PROFILE_S)
+            except ValueError as e:
+                self._reply(400, {"error": str(e)})
+                return
+            if interval <= 0 or duration <= 0:
+                self._reply(400, {"error": "interval_ms and duration_s must be positive"})
+            elif diagnostics.profiler.start(interval, duration):
+                self._reply(200, {"running": True, "interval_ms": _ms(interval), "duration_s": duration})
+            else:
+                self._reply(409, {"error": "profiler already running"})
+        elif path == "/profile/stop":
+            diagnostics.profiler.stop()
+            self._profile(query)
+        elif path == "/reset":
+            diagnostics.reset()
+            self._reply(200, {"reset": True})
+        else:
+            self._reply(404, {"error": f"unknown path {path}"})
+
+    def _parse(self):
+        url = urllib.parse.urlsplit(self.path)
+        return url.path.rstrip("/") or "/", dict(urllib.parse.parse_qsl(url.query))
+
+    def _profile(self, query):
+        profiler = self.server_diagnostics.profiler
+        if query.get("format") == "collapsed":
+            self._reply(200, profiler.collapsed(), content_type="text/plain")
+        else:
+            self._reply(200, profiler.report(top=int(query.get("top", 30))))
+
+    def _reply(self, status, body, content_type="application/json"):
+        data = (body if isinstance(body, str) else json.dumps(body, indent=2)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep the node's own log readable
+
+
+def _request(base_url, method, path, query=None):
+    url = base_url + path + ("?" + urllib.parse.urlencode(query) if query else "")
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            body = response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        body = e.read().decode("utf-8")
+        sys.exit(f"{method} {path} failed ({e.code}): {body}")
+    except urllib.error.URLError as e:
+        sys.exit(f"Cannot reach {base_url}: {e.reason}")
+    return body if query and query.get("format") == "collapsed" else json.loads(body)
+
+
+def print_stats(stats):
+    process = stats["process"]
+    print(f"pid {process['pid']}, up {process['uptime_s']}s, {process['threads']} threads, "
+          f"cpu {process['cpu_user_s']:.1f}s user / {process['cpu_system_s']:.1f}s system")
+
+    print("\nThread pools     queued  active  peak  wait mean/max ms   completed")
+    for name, pool in stats["pools"].items():
+        print(f"  {name:14} {pool['queued']:6}{pool['active']:8}{pool['peak_queued']:6}"
+              f"{pool['queue_wait_mean_ms']:10.2f} /{pool['queue_wait_max_ms']:8.1f}{pool['completed']:12}")
+
+    if stats["locks"]:
+        print("\nLocks               acquired  contended  wait mean/max ms   hold max ms")
+        for name, lock in stats["locks"].items():
+            print(f"  {name:16}{lock['acquisitions']:11}{lock['contended']:11}"
+                  f"{lock['wait_mean_ms']:10.2f} /{lock['wait_max_ms']:8.1f}{lock['hold_max_ms']:12.1f}")
+
+    print("\nRPC handlers                                  calls  errors  mean ms    p50    p99    max ms")
+    for method, rpc in stats["rpcs"].items():
+        p50 = rpc["p50_ms"] if rpc["p50_ms"] is not None else "inf"
+        p99 = rpc["p99_ms"] if rpc["p99_ms"] is not None else "inf"
+        name = method.rsplit(".", 1)[-1]  # "/package.Service/Method" -> "Service/Method"
+        print(f"  {name:44}{rpc['calls']:8}{rpc['errors']:8}{rpc['mean_ms']:9.2f}"
+              f"{'<=' + str(p50):>7}{'<=' + str(p99):>7}{rpc['max_ms']:9.1f}")
+
+
+def print_profile(report):
+    state = "running" if report["running"] else "stopped"
+    print(f"Profile ({state}): {report['samples']} samples from {report['rounds']} rounds "
+          f"every {report['interval_ms']} ms over {report['duration_s']}s")
+    print("\nSamples per thread group")
+    for thread, samples in report["threads"].items():
+        print(f"  {samples:8}  {thread}")
+    for title, key in (("Self (leaf frame)", "top_self"), ("Total (anywhere on the stack)", "top_total")):
+        print(f"\n{title}")
+        for row in report[key]:
+            print(f"  {row['samples']:8} {row['percent']:5.1f}%  {row['function']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a node's diagnostics endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=os.environ.get("DIAG_PORT"),
+                        required=not os.environ.get("DIAG_PORT"), help="diagnostics port (default: $DIAG_PORT)")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("stats", "rpcs", "pools", "locks", "threads", "reset"):
+        commands.add_parser(name)
+    profile = commands.add_parser("profile", help="start / stop / show the sampling profiler")
+    profile.add_argument("action", choices=["start", "stop", "show"])
+    profile.add_argument("--interval-ms", type=float, default=10)
+    profile.add_argument("--duration", type=float, default=60, help="seconds before sampling stops by itself")
+    profile.add_argument("--top", type=int, default=30)
+    profile.add_argument("--collapsed", metavar="FILE", help="also write folded stacks to FILE")
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.command == "profile":
+        if args.action == "start":
+            result = _request(base_url, "POST", "/profile/start",
+                              {"interval_ms": args.interval_ms, "duration_s": args.duration})
+            print(json.dumps(result, indent=2))
+            return
+        method, path = ("POST", "/profile/stop") if args.action == "stop" else ("GET", "/profile")
+        result = _request(base_url, method, path, {"top": args.top})
+        if args.collapsed:
+            with open(args.collapsed, "w") as f:
+                f.write(_request(base_url, "GET", "/profile", {"format": "collapsed"}))
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_profile(result)
+        if args.collapsed:
+            print(f"\nFolded stacks written to {args.collapsed}")
+        return
+
+    if args.command == "reset":
+        result = _request(base_url, "POST", "/reset")
+    elif args.command == "threads":
+        result = _request(base_url, "GET", "/threads")
+        if not args.json:
+            for thread, stack in result.items():
+                print(f"--- {thread}\n{''.join(stack)}")
+            return
+    else:
+        result = _request(base_url, "GET", "/" + args.command)
+    if args.command == "stats" and not args.json:
+        print_stats(result)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,186 +1,302 @@
 import grpc
 import threading
-import time
 import random
 import raft_pb2
 import raft_pb2_grpc
+from diagnostics import TimedLock
+from log_storage import HardStateStore
+from membership import node_id_of
+from transport import ChannelPool
 
 
-def safe_grpc_call(stub_function, request, node_id, target_id, rpc_name, retries=3, delay=1):
-    """Safely call gRPC with retries and proper logging"""
-    for i in range(retries):
-        try:
-            # Client-side logging 
-            print(f"Node {node_id} sends RPC {rpc_name} to Node {target_id}")
-            return stub_function(request, timeout=2)
-        except grpc.RpcError as e:
-            if i < retries - 1:
-                time.sleep(delay)
-            else:
-                pass  # Silent failure after retries
-    return None
+def spawn_thread(target, **kwargs):
+    """Default ElectionManager.spawn: run target on a new daemon thread"""
+    threading.Thread(target=target, kwargs=kwargs, daemon=True).start()
 
 
 class ElectionManager:
-    def __init__(self, node_id, all_nodes, port):
+    # Q3 Requirement: Election timeout = [1.5, 3] seconds
+    MIN_ELECTION_TIMEOUT = 1.5
+    MAX_ELECTION_TIMEOUT = 3.0
+    VOTE_RPC_TIMEOUT = 1.0
+    
+    def __init__(self, node_id, membership, port, data_dir, log_store, scheduler, pre_vote=True,
+                 group_id=0, channels=None, group_tag="", spawn=spawn_thread, rng=random):
         self.node_id = node_id
-        self.all_nodes = all_nodes
+        self.group_id = group_id
+        self.group_tag = group_tag  # log prefix when the node hosts several groups
+        self.channels = channels or ChannelPool()
+        self.membership = membership  # voters are taken from the configuration in use
         self.port = port
-        self.current_term = 0
-        self.voted_for = None
+        self.log_store = log_store
+        self.hard_state = HardStateStore(data_dir)
+        self.current_term, self.voted_for = self.hard_state.load()
         self.votes_received = 0
         self.running = True
         self.role = "follower"
-        self.vote_lock = threading.Lock()
+        self.vote_lock = TimedLock()
+        self.scheduler = scheduler
         self.election_timer = None
-        self.last_heartbeat = time.time()
+        self.stopped = threading.Event()
+        self.pre_vote = pre_vote
+        self.last_heartbeat = 0
+        self.leader_id = None  # leader of current_term as learned from AppendEntries
+        self.on_become_leader = None
+        # Injectable for the simulator: how elections are run off the timer thread, and
+        # the randomness of election timeouts
+        self.spawn = spawn
+        self.rng = rng
+    
+    def persist_state(self):
+        """Flush current_term/voted_for to disk before they are acted upon"""
+        self.hard_state.save(self.current_term, self.voted_for)
+    
+    def candidate_log_is_current(self, request):
+        """Election restriction: only vote for candidates whose log is at least as up-to-date"""
+        my_last_term = self.log_store.last_term()
+        if request.last_log_term != my_last_term:
+            return request.last_log_term > my_last_term
+        return request.last_log_index >= self.log_store.last_index()
     
     def start_election_loop(self):
-        """Main loop to keep node alive and trigger elections."""
-        print(f" Node {self.node_id}: Election loop started (role: {self.role})")
+        """Arm the election timer and block until the node stops."""
+        print(f" {self.group_tag}Node {self.node_id}: Election loop started (role: {self.role})")
         self.reset_election_timer()
-        
-        while self.running:
-            time.sleep(0.1)
+        self.stopped.wait()
     
     def reset_election_timer(self):
         """Resets randomized election timeout (1.5-3 seconds as required)"""
-        if hasattr(self, "election_timer") and self.election_timer:
-            self.election_timer.cancel()
+        timeout = self.rng.uniform(self.MIN_ELECTION_TIMEOUT, self.MAX_ELECTION_TIMEOUT)
+        if self.election_timer is None:
+            self.election_timer = self.scheduler.schedule(timeout, self._on_election_timeout)
+        else:
+            self.election_timer.reset(timeout)  # O(1) when the deadline moves later
+    
+    def _on_election_timeout(self):
+        # The scheduler thread must not block on vote RPCs
+        self.spawn(self.start_election)
+    
+    def leader_recently_seen(self):
+        """True while we are leader or heard from one within the minimum election timeout.
         
-        # Q3 Requirement: Election timeout = [1.5, 3] seconds
-        timeout = random.uniform(1.5, 3)
-        self.election_timer = threading.Timer(timeout, self.start_election)
-        self.election_timer.start()
+        Such a node ignores PreVote/RequestVote for higher terms, so a node returning
+        from a partition cannot disrupt a leader that still has a working quorum.
+        """
+        if self.role == "leader":
+            return True
+        return (self.leader_id is not None
+                and self.scheduler.clock() - self.last_heartbeat < self.MIN_ELECTION_TIMEOUT)
+    
+    def handle_pre_vote(self, request):
+        """Would we vote for this candidate in request.term? Changes no local state."""
+        print(f"{self.group_tag}Node {self.node_id} runs RPC PreVote called by Node {request.candidate_id}")
+        
+        with self.vote_lock:
+            granted = (request.term > self.current_term
+                       and not self.leader_recently_seen()
+                       and self.candidate_log_is_current(request))
+            return raft_pb2.VoteResponse(term=request.term if granted else self.current_term,
+                                         vote_granted=granted)
     
     def handle_vote_request(self, request):
         """Handles RequestVote RPC calls."""
         # Server-side logging (as required)
-        print(f"Node {self.node_id} runs RPC RequestVote called by Node {request.candidate_id}")
+        print(f"{self.group_tag}Node {self.node_id} runs RPC RequestVote called by Node {request.candidate_id}")
         
         with self.vote_lock:
             response = raft_pb2.VoteResponse(term=self.current_term, vote_granted=False)
+            state_changed = False
+            
+            if (request.term > self.current_term and self.pre_vote and self.leader_recently_seen()
+                    and not request.leadership_transfer):
+                return response
             
             if request.term > self.current_term:
                 self.current_term = request.term
                 self.voted_for = None
+                self.leader_id = None
                 self.role = "follower"
+                state_changed = True
             
-            if request.term >= self.current_term and (self.voted_for is None or self.voted_for == request.candidate_id):
+            if (request.term >= self.current_term
+                    and (self.voted_for is None or self.voted_for == request.candidate_id)
+                    and self.candidate_log_is_current(request)):
+                state_changed = state_changed or self.voted_for != request.candidate_id
                 self.voted_for = request.candidate_id
                 response.vote_granted = True
-                response.term = self.current_term
-                print(f" Node {self.node_id}: Voted for {request.candidate_id} in term {self.current_term}")
+                print(f" {self.group_tag}Node {self.node_id}: Voted for {request.candidate_id} in term {self.current_term}")
                 self.reset_election_timer()
             
+            if state_changed:
+                self.persist_state()
+            response.term = self.current_term
             return response
     
     def handle_heartbeat(self, request):
         """Handles leader heartbeat RPCs."""
         # Server-side logging
-        print(f"Node {self.node_id} runs RPC AppendEntries called by Node {request.leader_id}")
+        print(f"{self.group_tag}Node {self.node_id} runs RPC AppendEntries called by Node {request.leader_id}")
         
-        if request.term >= self.current_term:
-            self.current_term = request.term
-            self.role = "follower"
-            self.voted_for = None
-            self.last_heartbeat = time.time()
-            self.reset_election_timer()
-            print(f"Node {self.node_id}: Heartbeat received from leader {request.leader_id}")
+        if self.accept_leader(request.term, request.leader_id):
+            print(f"{self.group_tag}Node {self.node_id}: Heartbeat received from leader {request.leader_id}")
             return raft_pb2.AppendEntriesResponse(term=self.current_term, success=True, match_index=0)
         
         return raft_pb2.AppendEntriesResponse(term=self.current_term, success=False, match_index=0)
     
-    def start_election(self):
-        """Starts a new election round."""
+    def accept_leader(self, term, leader_id):
+        """Term/role bookkeeping for any AppendEntries; False if the sender is a stale leader"""
+        with self.vote_lock:
+            if term < self.current_term:
+                return False
+            
+            if term > self.current_term:
+                self.current_term = term
+                self.voted_for = None
+                self.persist_state()
+            self.role = "follower"
+            self.leader_id = leader_id
+            self.last_heartbeat = self.scheduler.clock()
+        self.reset_election_timer()
+        return True
+    
+    def step_down(self, term):
+        """Revert to follower after seeing a higher term in an RPC response"""
+        with self.vote_lock:
+            if term <= self.current_term:
+                return
+            print(f"{self.group_tag}Node {self.node_id}: Saw higher term {term}, stepping down")
+            self.current_term = term
+            self.voted_for = None
+            self.leader_id = None
+            self.role = "follower"
+            self.persist_state()
+        self.reset_election_timer()
+    
+    def resign(self, reason):
+        """Leader gives up leadership without a term change (e.g. lost its quorum)"""
+        with self.vote_lock:
+            if self.role != "leader":
+                return
+            print(f"{self.group_tag}Node {self.node_id}: Stepping down as leader: {reason}")
+            self.role = "follower"
+            self.leader_id = None
+        self.reset_election_timer()
+    
+    def handle_timeout_now(self, request):
+        """Leadership transfer: our leader asks us to campaign immediately"""
+        print(f"{self.group_tag}Node {self.node_id} runs RPC TimeoutNow called by Node {request.leader_id}")
+        
+        if request.term != self.current_term or request.leader_id != self.leader_id:
+            return raft_pb2.TimeoutNowResponse(term=self.current_term, success=False)
+        
+        self.spawn(self.start_election, transfer=True)
+        return raft_pb2.TimeoutNowResponse(term=self.current_term, success=True)
+    
+    def _request_votes(self, rpc_name, term, transfer=False):
+        """Send PreVote/RequestVote for term to all peers in parallel; returns votes granted"""
+        request = raft_pb2.VoteRequest(
+            term=term,
+            candidate_id=self.node_id,
+            last_log_index=self.log_store.last_index(),
+            last_log_term=self.log_store.last_term(),
+            leadership_transfer=transfer,
+            group_id=self.group_id
+        )
+        
+        calls = []
+        for peer in self.membership.current().voters:
+            target_id = node_id_of(peer)
+            if target_id == self.node_id:
+                continue
+            channel = self.channels.get(peer)
+            # Client-side logging
+            print(f"{self.group_tag}Node {self.node_id} sends RPC {rpc_name} to Node {target_id}")
+            stub_method = getattr(raft_pb2_grpc.RaftStub(channel), rpc_name)
+            calls.append(stub_method.future(request, timeout=self.VOTE_RPC_TIMEOUT))
+        
+        granted = 0
+        highest_term = term
+        for call in calls:
+            try:
+                response = call.result()
+                if response.vote_granted and response.term == term:
+                    granted += 1
+                highest_term = max(highest_term, response.term)
+            except grpc.RpcError:
+                pass
+        
+        if highest_term > term:
+            self.step_down(highest_term)
+        return granted
+    
+    def _win_pre_vote(self):
+        """Pre-vote phase: could we win the next term? Our own term is not bumped, so a
+        node cut off from the cluster does not inflate its term while it keeps retrying."""
+        proposed_term = self.current_term + 1
+        print(f"\n{self.group_tag}Node {self.node_id}: Starting pre-vote for term {proposed_term}")
+        
+        granted = 1 + self._request_votes("PreVote", proposed_term)
+        config = self.membership.current()
+        if granted < config.majority() or self.current_term >= proposed_term:
+            print(f"{self.group_tag}Node {self.node_id}: Pre-vote for term {proposed_term} failed ({granted}/{len(config.voters)})")
+            return False
+        return True
+    
+    def start_election(self, transfer=False):
+        """Starts a new election round.
+        
+        transfer: started by TimeoutNow, so the pre-vote is skipped and voters that
+        still see the old leader grant the vote anyway.
+        """
         if self.role == "leader":
             return
+        
+        # Learners (and nodes removed from the cluster) never campaign
+        if not self.membership.is_voter(self.node_id):
+            self.reset_election_timer()
+            return
+        
+        if self.pre_vote and not transfer and not self._win_pre_vote():
+            self.reset_election_timer()
+            return
 
         with self.vote_lock:
             self.current_term += 1
             self.voted_for = self.node_id
+            self.leader_id = None
             self.role = "candidate"
             self.votes_received = 1
+            self.persist_state()
+            election_term = self.current_term
 
-        print(f"\nNode {self.node_id}: Starting election for term {self.current_term}")
-
-        for peer in self.all_nodes:
-            if peer == f"raft_{self.node_id}:{self.port}":
-                continue
-
-            host, port = peer.split(":")
-            target_id = host.replace("raft_", "")
-
-            try:
-                with grpc.insecure_channel(f"{host}:{port}") as channel:
-                    stub = raft_pb2_grpc.RaftStub(channel)
-                    request = raft_pb2.VoteRequest(
-                        term=self.current_term,
-                        candidate_id=self.node_id
-                    )
+        print(f"\n{self.group_tag}Node {self.node_id}: Starting election for term {self.current_term}")
 
-                    response = safe_grpc_call(
-                        stub.RequestVote,
-                        request,
-                        self.node_id,
-                        target_id,
-                        "RequestVote"
-                    )
+        self.votes_received += self._request_votes("RequestVote", election_term, transfer)
 
-                    if response and response.vote_granted:
-                        self.votes_received += 1
-            except:
-                pass
+        # Checked and promoted in one section: a step_down() or vote for a higher term
+        # in between would otherwise make us leader of a term we did not win
+        config = self.membership.current()
+        with self.vote_lock:
+            # A higher term (or another leader) showed up while we were collecting votes
+            still_candidate = self.role == "candidate" and self.current_term == election_term
+            won = still_candidate and self.votes_received >= config.majority()
+            if won:
+                self.role = "leader"
+                self.leader_id = self.node_id
+            elif still_candidate:
+                self.role = "follower"
 
-        majority = (len(self.all_nodes) // 2) + 1
-        if self.votes_received >= majority:
-            self.role = "leader"
-            print(f"Node {self.node_id}: Became LEADER in term {self.current_term} with {self.votes_received}/{len(self.all_nodes)} votes")
-            self.send_heartbeats()
-        else:
-            self.role = "follower"
+        if not won:
             self.reset_election_timer()
-    
-    def send_heartbeats(self):
-        """Continuously sends heartbeats when leader."""
-        def heartbeat_loop():
-            while self.role == "leader" and self.running:
-                for peer in self.all_nodes:
-                    if peer == f"raft_{self.node_id}:{self.port}":
-                        continue
-                    
-                    host, port = peer.split(":")
-                    target_id = host.replace("raft_", "")
-                    
-                    try:
-                        with grpc.insecure_channel(f"{host}:{port}") as channel:
-                            stub = raft_pb2_grpc.RaftStub(channel)
-                            request = raft_pb2.AppendEntriesRequest(
-                                term=self.current_term,
-                                leader_id=self.node_id,
-                                entries=[],
-                                prev_log_index=0,
-                                prev_log_term=0,
-                                leader_commit=0
-                            )
-                            
-                            safe_grpc_call(
-                                stub.AppendEntries,
-                                request,
-                                self.node_id,
-                                target_id,
-                                "AppendEntries"
-                            )
-                    except:
-                        pass
-                
-                # Q3 Requirement: Heartbeat timeout = 1 second
-                time.sleep(1)
-        
-        threading.Thread(target=heartbeat_loop, daemon=True).start()
+            return
+        print(f"{self.group_tag}Node {self.node_id}: Became LEADER in term {election_term} with {self.votes_received}/{len(config.voters)} votes")
+        # Replication senders take over from here; they double as heartbeats
+        if self.on_become_leader:
+            self.on_become_leader()
     
     def stop(self):
         """Stop election loop."""
         self.running = False
-        if hasattr(self, "election_timer") and self.election_timer:
-            self.election_timer.cancel()
\ No newline at end of file
+        if self.election_timer:
+            self.election_timer.cancel()
+        self.stopped.set()
\ No newline at end of file
@@ -1,211 +1,1110 @@
+import collections
 import grpc
+import os
+import queue
 import time
 import threading
 import raft_pb2
 import raft_pb2_grpc
+from diagnostics import TimedLock
+from log_storage import entry_command
+from membership import ClusterConfig, is_config_command, node_id_of
+from sessions import is_session_command, session_command
+from task_queue import TaskBatcher, is_task_batch_command, is_worker_request
+from transport import ChannelPool
+
+
+def raw_append_entries(channel):
+    """AppendEntries callable that sends an already-serialized request as-is"""
+    return channel.unary_unary(
+        "/Raft/AppendEntries",
+        request_serializer=None,
+        response_deserializer=raft_pb2.AppendEntriesResponse.FromString
+    )
 
 
 class LogReplicationManager:
-    def __init__(self, node_id, peers, election_mgr):
+    # Rejections carry conflict hints, so a lagging follower is re-probed right away
+    # (up to this many round trips) instead of once per replication tick
+    MAX_PROBES_PER_ROUND = 32
+    
+    # Per-follower replication states: probe sends one batch at a time until the
+    # follower's match point is known, replicate pipelines up to max_inflight batches
+    PROBE = "probe"
+    REPLICATE = "replicate"
+    
+    # Pipelined batches can overtake each other in the follower's server thread pool;
+    # a batch that arrives before its predecessor waits this long for the gap to fill
+    PIPELINE_GAP_WAIT = 0.05
+    
+    def __init__(self, node_id, membership, election_mgr, log_store, snapshot_store, state_machine, scheduler,
+                 snapshot_threshold=1000, snapshot_chunk_bytes=1024 * 1024,
+                 max_append_entries=512, max_append_bytes=1024 * 1024, max_inflight=4,
+                 lease_reads=False, lease_duration=1.0, apply_batch_size=256, heartbeat_interval=1.0,
+                 check_quorum=True, group_id=0, channels=None, group_tag="",
+                 compression=grpc.Compression.Gzip, compress_min_bytes=4096, task_batch_ops=1024):
         self.node_id = node_id
-        self.peers = peers
+        self.membership = membership  # shared with election_mgr
         self.election_mgr = election_mgr
         
-        self.log = [{"term": 0, "command": "INIT", "index": 0}]
+        # Raft group this manager replicates; peer connections are shared by all groups
+        self.group_id = group_id
+        self.group_tag = group_tag
+        self.channels = channels or ChannelPool()
+        
+        # Durable segmented log (index 0 is the implicit INIT sentinel)
+        self.log = log_store
         self.commit_index = 0
         self.last_applied = 0
         
+        # Snapshots: taken every snapshot_threshold applied entries, then the log prefix is dropped
+        self.snapshots = snapshot_store
+        self.state_machine = state_machine
+        self.snapshot_threshold = snapshot_threshold
+        self.snapshot_chunk_bytes = snapshot_chunk_bytes
+        
+        # Flow control: each AppendEntries is capped well below gRPC's 4MB message limit,
+        # and at most max_inflight unacknowledged batches are outstanding to a follower
+        self.max_append_entries = max_append_entries
+        self.max_append_bytes = max_append_bytes
+        self.max_inflight = max_inflight
+        
+        # Wire compression: AppendEntries batches and snapshot transfers of at least
+        # compress_min_bytes are sent with gRPC message compression (None: never)
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        
+        # next_index runs ahead of match_index while batches are in flight: inflight maps
+        # peer_id -> deque of (future, term, prev_log_index, entry_count, leader_commit, sent_at),
+        # oldest first
         self.next_index = {}
         self.match_index = {}
+        self.progress_state = {}
+        self.inflight = {}
+        
+        # One sender thread per follower (see _peer_sender); an empty AppendEntries is only
+        # sent after heartbeat_interval without any other traffic to that follower. Heartbeat
+        # deadlines are timers on the node's shared scheduler, whose clock is also used for
+        # acks and the leader lease
+        self.scheduler = scheduler
+        self.heartbeat_interval = heartbeat_interval
+        # Senders follow the configuration: started/stopped by _sync_senders()
+        self.peer_wakeups = {}
+        self.senders_started = False
+        self.senders_lock = threading.Lock()
+        
+        # Reads: ReadIndex by default; with lease_reads the leader answers without any RPC
+        # while a majority acknowledged it within lease_duration (kept below the
+        # minimum election timeout so no other leader can exist meanwhile)
+        self.lease_reads = lease_reads
+        self.lease_duration = lease_duration
+        self.last_ack = {}
+        self.lease_revoked_at = 0  # acks of heartbeats sent before this never extend the lease
+        
+        # Bounded-staleness reads on followers: (leader_commit, scheduler time) of the last
+        # AppendEntries accepted from the leader
+        self.leader_commit_seen = (0, 0)
         
-        self.log_lock = threading.Lock()
+        # Check-quorum: a leader that has not been acknowledged by a majority within the
+        # minimum election timeout steps down instead of serving as a stale leader
+        self.leader_since = 0
         
-        print(f" Node {self.node_id}: Log Replication Manager initialized")
+        # Leadership transfer in progress: target peer id, writes are refused meanwhile.
+        # progress_cond is notified whenever a follower's match_index advances
+        self.transferring_to = None
+        self.progress_cond = threading.Condition()
+        
+        # Membership changes are serialized: one configuration entry in flight at a time
+        self.config_change_lock = threading.Lock()
+        
+        if check_quorum:
+            scheduler.schedule_periodic(election_mgr.MIN_ELECTION_TIMEOUT, self._check_quorum)
+        
+        # Apply pipeline: commit paths only bump commit_index and signal commit_cond; the
+        # apply thread applies committed ranges in batches of apply_batch_size and
+        # signals applied_cond. pending_results maps index -> (term, callback) for leader
+        # proposals waiting on the outcome of their command
+        self.apply_batch_size = apply_batch_size
+        self.commit_cond = threading.Condition()
+        self.applied_cond = threading.Condition()
+        self.pending_results = {}
+        
+        # Leader-side batching: proposals from all clients/streams are queued and appended
+        # (and fsynced) together, then the follower senders are woken
+        self.proposals = queue.Queue()
+        # Worker claims / lease heartbeats are combined into TASK_BATCH entries (task_queue.py)
+        self.task_batcher = TaskBatcher(self, max_ops=task_batch_ops)
+        
+        self.log_lock = TimedLock()  # contention is reported by the diagnostics endpoint
+        self.log_appended = threading.Condition(self.log_lock)  # followers: entries were appended
+        self.apply_lock = threading.Lock()
+        
+        self._restore_snapshot()
+        self._load_membership()
+        election_mgr.on_become_leader = self.become_leader
+        
+        print(f" {self.group_tag}Node {self.node_id}: Log Replication Manager initialized")
+    
+    def start(self):
+        """Start the apply, proposal and per-follower sender threads.
+        
+        The simulator (tests/raft_sim.py) never calls this: it drives the same steps
+        (_append_proposals, _send_append_entries, _apply_committed_entries) itself.
+        """
+        threading.Thread(target=self._apply_loop, daemon=True).start()
+        threading.Thread(target=self._proposal_loop, daemon=True).start()
+        self.task_batcher.start()
+        self.replicate_to_followers()
+    
+    def _restore_snapshot(self):
+        """Load the latest snapshot on startup instead of replaying the whole history"""
+        latest = self.snapshots.latest()
+        if latest is None:
+            return
+        
+        last_index, last_term, path = latest
+        self.state_machine.restore(self.snapshots.load(path))
+        self.log.compact(last_index, last_term)
+        self.commit_index = self.last_applied = last_index
+        print(f" {self.group_tag}Node {self.node_id}: Restored snapshot at index {last_index} (term {last_term})")
+    
+    def _load_membership(self):
+        """Configuration in use after a restart or an installed snapshot: the snapshot's
+        (or the bootstrap one) plus any CONFIG entries in the log after it"""
+        start = self.log.snapshot_index() + 1
+        entries = self.log.entries(start, self.log.last_index()) if start <= self.log.last_index() else []
+        self.membership.reset(self.state_machine.config,
+                              [(index, command) for index, _, command in entries if is_config_command(command)])
     
-    def append_entry(self, command, client_id):
-        """Leader receives client request and appends to log."""
+    def _track_config(self, first_index, commands):
+        """Appended commands take effect immediately if they are configurations"""
+        changed = False
+        for offset, command in enumerate(commands):
+            if is_config_command(command):
+                self.membership.appended(first_index + offset, command)
+                changed = True
+        if changed:
+            print(f" {self.group_tag}Node {self.node_id}: Configuration now {self.membership.current().to_dict()}")
+            self._sync_senders()
+    
+    def _peer_ids(self):
+        """(address, peer_id) of every other member, voters and learners"""
+        for peer in self.membership.current().members():
+            peer_id = node_id_of(peer)
+            if peer_id != self.node_id:
+                yield peer, peer_id
+    
+    def _voter_ids(self):
+        """peer_id of every other voter; learners never count towards a majority"""
+        return [node_id_of(peer) for peer in self.membership.current().voters if node_id_of(peer) != self.node_id]
+    
+    def _self_votes(self):
+        """1 while we are a voter; a leader removing itself keeps leading without counting"""
+        return 1 if self.membership.is_voter(self.node_id) else 0
+    
+    def _majority(self):
+        return self.membership.current().majority()
+    
+    def become_leader(self):
+        """Reset follower progress and append a no-op so an entry of the new term gets committed"""
+        with self.log_lock:
+            if self.election_mgr.role != "leader":
+                return  # stepped down right after winning
+            for _, peer_id in self._peer_ids():
+                self.next_index[peer_id] = self.log.last_index() + 1
+                self.match_index[peer_id] = 0
+                self.progress_state[peer_id] = self.PROBE
+            self.last_ack = {}
+            self.transferring_to = None
+            self.leader_since = self.scheduler.clock()
+            self.log.append([(self.election_mgr.current_term, "NOOP")])
+        self.log.sync()
+        self._sync_senders()
+        self._wake_senders()
+    
+    def append_entry(self, command, client_id, timeout=5, allow_config=False, sequence=0):
+        """Leader receives client request and appends to log.
+        
+        Returns (success, message, leader_id, result of applying the command, log index).
+        """
+        done = threading.Event()
+        outcome = {}
+        
+        def on_done(success, message, result, index):
+            outcome.update(success=success, message=message, result=result, index=index)
+            done.set()
+        
+        self.propose(command, on_done, allow_config, client_id, sequence)
+        
+        if not done.wait(timeout):
+            return False, "Failed to replicate to majority", self.node_id, "", 0
+        if outcome["message"] == "NOT_LEADER":
+            return False, "NOT_LEADER", self.leader_hint(), "", 0
+        return outcome["success"], outcome["message"], self.node_id, outcome["result"], outcome["index"]
+    
+    def propose(self, command, callback, allow_config=False, client_id="", sequence=0, internal=False):
+        """Queue a command for the leader's next append batch.
+        
+        callback(success, message, result, index) runs once the entry is applied
+        (or immediately with message NOT_LEADER); it must not block.
+        With a sequence number (> 0) the command is exactly-once for client_id: a retry of
+        an applied command is answered from the client's session without touching the log.
+        Worker requests (TASK_CLAIM / TASK_HEARTBEAT) go to the task batcher instead.
+        """
+        if is_config_command(command) and not allow_config:
+            callback(False, "Configuration entries are only written by ChangeMembership", "", 0)
+            return
+        if is_task_batch_command(command) and not internal:
+            callback(False, "TASK_BATCH entries are only written by the leader", "", 0)
+            return
+        if is_session_command(command) and not internal:
+            callback(False, "SESSION entries are only written by the leader (send a sequence number)", "", 0)
+            return
         if self.election_mgr.role != "leader":
-            return False, "Not the leader", self.election_mgr.voted_for
+            callback(False, "NOT_LEADER", "", 0)
+            return
+        if self.transferring_to is not None:
+            callback(False, "NOT_LEADER", "", 0)  # leader_hint() points at the transfer target
+            return
+        if is_worker_request(command):
+            self.task_batcher.submit(command, callback)
+            return
+        if sequence > 0:
+            if not client_id or len(client_id.split()) != 1:
+                callback(False, "Sequenced requests need a client_id without whitespace", "", 0)
+                return
+            applied, result = self.state_machine.lookup_session(client_id, sequence)
+            if applied:
+                if result is None:
+                    callback(False, "Request is older than the results kept for its session", "", 0)
+                else:
+                    # Applied at or before last_applied, so that index is safe for read-your-writes
+                    callback(True, "Duplicate request, answered from the client session", result,
+                             self.last_applied)
+                return
+            # Stamped with leader time so every node expires idle sessions identically
+            command = session_command(client_id, sequence, int(time.time() * 1000), command)
+        self.proposals.put((command, callback))
+    
+    def leader_hint(self):
+        """Where clients should send writes: the transfer target while a transfer is running"""
+        return self.transferring_to or self.election_mgr.leader_id or ""
+    
+    def _proposal_loop(self):
+        """Drain queued proposals into one log append + one fsync per batch"""
+        while True:
+            self._append_proposals(self._take_proposals())
+    
+    def _take_proposals(self, block=True):
+        """Next batch of queued (command, callback) proposals; may be empty if not block"""
+        batch = []
+        if block:
+            batch.append(self.proposals.get())
+        while len(batch) < self.max_append_entries:
+            try:
+                batch.append(self.proposals.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _append_proposals(self, batch):
+        if not batch:
+            return
+        
+        if self.election_mgr.role != "leader":
+            for _, callback in batch:
+                callback(False, "NOT_LEADER", "", 0)
+            return
         
         with self.log_lock:
-            new_index = len(self.log)
-            new_entry = {
-                "term": self.election_mgr.current_term,
-                "command": command,
-                "index": new_index
-            }
-            self.log.append(new_entry)
-            
-            print(f"Node {self.node_id} (LEADER): Appended entry at index {new_index}: {command}")
+            term = self.election_mgr.current_term
+            last_index = self.log.append([(term, command) for command, _ in batch])
+            first_index = last_index - len(batch) + 1
+            with self.applied_cond:
+                for offset, (_, callback) in enumerate(batch):
+                    self.pending_results[first_index + offset] = (term, callback)
+            self._track_config(first_index, [command for command, _ in batch])
         
-        success = self._wait_for_majority_ack(new_index)
+        if len(batch) == 1:
+            print(f"{self.group_tag}Node {self.node_id} (LEADER): Appended entry at index {last_index}: {batch[0][0]}")
+        else:
+            print(f"{self.group_tag}Node {self.node_id} (LEADER): Appended entries {first_index}-{last_index} ({len(batch)} commands)")
         
-        if success:
-            with self.log_lock:
-                self.commit_index = new_index
-            print(f"Node {self.node_id} (LEADER): Committed entry at index {new_index}")
+        # Leader counts itself towards the majority, so its copy must be durable
+        self.log.sync()
+        self._wake_senders()
+        self._advance_commit_index()
+    
+    def _notify_commit(self):
+        """Wake the apply thread; called whenever commit_index may have advanced"""
+        with self.commit_cond:
+            self.commit_cond.notify()
+    
+    def _apply_loop(self):
+        """Dedicated apply thread, so replication and RPC handlers never run the state machine"""
+        while True:
+            with self.commit_cond:
+                while self.last_applied >= self.commit_index:
+                    self.commit_cond.wait()
             self._apply_committed_entries()
-            return True, "Operation committed successfully", self.node_id
-        else:
-            return False, "Failed to replicate to majority", self.node_id
     
-    def _wait_for_majority_ack(self, index, timeout=5):
-        """Wait for majority of followers to acknowledge replication"""
-        start_time = time.time()
-        majority = (len(self.peers) // 2) + 1
+    def _apply_committed_entries(self):
+        """Apply committed entries to state machine, one batch at a time"""
+        with self.apply_lock:
+            while True:
+                with self.log_lock:
+                    if self.last_applied >= self.commit_index:
+                        return
+                    end = min(self.commit_index, self.last_applied + self.apply_batch_size)
+                    entries = self.log.entries(self.last_applied + 1, end)
+                
+                for index, term, command in entries:
+                    print(f" {self.group_tag}Node {self.node_id}: Applying entry {index}: {command}")
+                results = self.state_machine.apply_batch([command for _, _, command in entries])
+                
+                done = []
+                with self.applied_cond:
+                    for (index, term, _), result in zip(entries, results):
+                        pending = self.pending_results.pop(index, None)
+                        if pending:
+                            done.append((pending, term, result, index))
+                    self.last_applied = end
+                    self.applied_cond.notify_all()
+                
+                for (proposed_term, callback), term, result, index in done:
+                    # A different term means a new leader overwrote the proposed entry
+                    if term == proposed_term:
+                        callback(True, "Operation committed successfully", result, index)
+                    else:
+                        callback(False, "Entry was overwritten by a new leader", "", index)
+                
+                # A leader that committed its own removal hands over to the remaining voters
+                if (any(is_config_command(command) for _, _, command in entries)
+                        and self.membership.latest_index() <= self.commit_index
+                        and not self.membership.is_voter(self.node_id)):
+                    self.election_mgr.resign("removed from the configuration")
+                
+                if self.last_applied - self.log.snapshot_index() >= self.snapshot_threshold:
+                    self._take_snapshot()
+    
+    def _take_snapshot(self):
+        """Snapshot the state machine at last_applied and compact the log (apply_lock held)"""
+        last_index = self.last_applied
+        last_term = self.log.term_at(last_index)
+        data = self.state_machine.snapshot()
+        
+        self.snapshots.save(last_index, last_term, data)
+        with self.log_lock:
+            self.log.compact(last_index, last_term)
         
-        while time.time() - start_time < timeout:
-            ack_count = 1
+        print(f" {self.group_tag}Node {self.node_id}: Snapshot taken at index {last_index} (term {last_term}, "
+              f"{len(data)} bytes), log now starts at {self.log.first_index()}")
+    
+    def replicate_to_followers(self):
+        """Start one sender thread per follower (voter or learner)"""
+        self.senders_started = True
+        self._sync_senders()
+    
+    def _sync_senders(self):
+        """Start senders for new members and stop those of removed ones"""
+        if not self.senders_started:
+            return
+        with self.senders_lock:
+            members = dict((peer_id, peer) for peer, peer_id in self._peer_ids())
+            for peer_id, peer in members.items():
+                if peer_id not in self.peer_wakeups:
+                    self.peer_wakeups[peer_id] = threading.Event()
+                    threading.Thread(target=self._peer_sender, args=(peer, peer_id), daemon=True).start()
+            for peer_id in [peer_id for peer_id in self.peer_wakeups if peer_id not in members]:
+                self.peer_wakeups.pop(peer_id).set()  # its sender sees it is gone and exits
+    
+    def _wake_senders(self):
+        for wakeup in list(self.peer_wakeups.values()):
+            wakeup.set()
+    
+    def _peer_sender(self, peer_address, peer_id):
+        """Replication and heartbeats for one follower over the pooled channel to it.
+        
+        New entries are shipped as soon as they are proposed; every AppendEntries
+        doubles as a heartbeat and carries the real commit index, so an empty one is
+        only sent when the follower has seen nothing for heartbeat_interval, or to
+        announce a commit index the follower has not been sent yet (keeps follower
+        reads fresh without waiting for the next heartbeat).
+        """
+        wakeup = self.peer_wakeups[peer_id]
+        heartbeat_due = self.scheduler.schedule(self.heartbeat_interval, wakeup.set)
+        channel = self.channels.get(peer_address)
+        last_sent = None
+        sent_commit = 0
+        retry_at = 0
+        
+        while self.election_mgr.running and self.peer_wakeups.get(peer_id) is wakeup:
+            wakeup.wait()
+            wakeup.clear()
+            if self.election_mgr.role != "leader":
+                last_sent = None  # become_leader() wakes us to announce the new term at once
+                continue
+            
+            now = self.scheduler.clock()
+            if self.inflight.get(peer_id):
+                if not self._collect_acks(peer_id):
+                    retry_at = now + self.heartbeat_interval
+                if len(self.inflight[peer_id]) >= self.max_inflight:
+                    continue  # window full: the next completed batch wakes us
             
-            for peer in self.peers:
-                peer_id = peer.split(":")[0].replace("raft_", "")
-                if peer_id == self.node_id:
+            heartbeat_needed = last_sent is None or now - last_sent >= self.heartbeat_interval
+            # Unreachable follower: new entries are retried on the heartbeat cadence, not per proposal
+            entries_pending = self.next_index.get(peer_id, 0) <= self.log.last_index() and now >= retry_at
+            commit_pending = self.commit_index > sent_commit and now >= retry_at
+            if not (heartbeat_needed or entries_pending or commit_pending):
+                continue
+            
+            last_sent = now
+            sent_commit = self.commit_index
+            reached = self._send_append_entries(peer_address, peer_id, channel)
+            retry_at = 0 if reached else now + self.heartbeat_interval
+            heartbeat_due.reset(self.heartbeat_interval)
+            if reached and not self.inflight.get(peer_id) and self.next_index.get(peer_id, 0) <= self.log.last_index():
+                wakeup.set()  # probe budget used up with more to send: go again
+        
+        heartbeat_due.cancel()
+        self._drop_window(peer_id)
+    
+    def _send_append_entries(self, peer_address, peer_id, channel):
+        """Send AppendEntries to one follower (entries if it is behind, else a heartbeat).
+        
+        A follower in probe state gets one batch at a time. In replicate state batches
+        are pipelined: next_index advances as soon as a batch is sent, and sending stops
+        once max_inflight batches are unacknowledged; their acks are processed by
+        _collect_acks as they complete. Only full batches are pipelined: a partial one
+        waits for the batch in flight (so entries keep accumulating into it, as without
+        pipelining) unless it carries a newer commit index.
+        
+        Returns False if the follower could not be reached.
+        """
+        if peer_id not in self.next_index:
+            self.next_index[peer_id] = self.log.last_index() + 1
+            self.match_index[peer_id] = 0
+            self.progress_state[peer_id] = self.PROBE
+        
+        inflight = self.inflight.setdefault(peer_id, collections.deque())
+        wakeup = self.peer_wakeups.get(peer_id)
+        probes = 0
+        
+        try:
+            while probes < self.MAX_PROBES_PER_ROUND and self.election_mgr.role == "leader":
+                if not self._collect_acks(peer_id):
+                    return False
+                pipelined = self.progress_state[peer_id] == self.REPLICATE
+                if pipelined and len(inflight) >= self.max_inflight:
+                    return True  # the next completed batch wakes the sender
+                
+                next_idx = self.next_index[peer_id]
+                
+                if next_idx <= self.log.snapshot_index():
+                    # Entries the follower needs were compacted away
+                    self._drop_window(peer_id)
+                    self._send_snapshot(peer_id, channel)
+                    return True
+                
+                # Entries are stored pre-serialized: a capped range is one byte slice read
+                # under the log store's own lock, log_lock is not held while building
+                prev_log_index = next_idx - 1
+                prev_log_term, entry_frames, entry_count = self.log.read_batch(
+                    next_idx, self.max_append_entries, self.max_append_bytes
+                )
+                
+                # Partial batch behind one in flight that already carries the commit index:
+                # let it grow until that batch is acked
+                if pipelined and inflight and next_idx + entry_count > self.log.last_index() \
+                        and inflight[-1][4] >= self.commit_index:
+                    return True
+                
+                term = self.election_mgr.current_term
+                header = raft_pb2.AppendEntriesRequest(
+                    term=term,
+                    leader_id=self.node_id,
+                    prev_log_index=prev_log_index,
+                    prev_log_term=prev_log_term,
+                    leader_commit=self.commit_index,
+                    group_id=self.group_id
+                )
+                
+                if entry_count > 0:
+                    print(f"{self.group_tag}Node {self.node_id} sends RPC AppendEntries to Node {peer_id} (entries: {entry_count})")
+                else:
+                    print(f"{self.group_tag}Node {self.node_id} sends RPC AppendEntries to Node {peer_id}")
+                
+                sent_at = self.scheduler.clock()
+                request = header.SerializeToString() + entry_frames
+                
+                if pipelined:
+                    future = raw_append_entries(channel).future(request, timeout=2,
+                                                                compression=self._compression_for(len(entry_frames)))
+                    inflight.append((future, term, prev_log_index, entry_count, header.leader_commit, sent_at))
+                    self.next_index[peer_id] = prev_log_index + entry_count + 1
+                    if wakeup is not None:
+                        future.add_done_callback(lambda _: wakeup.set())
+                    if self.next_index[peer_id] > self.log.last_index():
+                        return self._collect_acks(peer_id)
                     continue
                 
-                if self.match_index.get(peer_id, 0) >= index:
-                    ack_count += 1
-            
-            if ack_count >= majority:
+                response = raw_append_entries(channel)(request, timeout=2,
+                                                       compression=self._compression_for(len(entry_frames)))
+                
+                if response.success:
+                    self._on_append_success(peer_id, prev_log_index + entry_count, sent_at)
+                    if self.next_index[peer_id] > self.log.last_index():
+                        return True
+                    continue  # match point found: the rest is pipelined
+                
+                if response.term > self.election_mgr.current_term:
+                    self.election_mgr.step_down(response.term)
+                    return True
+                
+                probes += 1
+                self._on_append_rejected(peer_id, prev_log_index, response)
+        
+        except grpc.RpcError:
+            return False
+        except Exception as e:
+            # Keep the sender thread alive whatever happens in one round
+            print(f"{self.group_tag}Node {self.node_id}: AppendEntries to Node {peer_id} failed: {e}")
+            self._drop_window(peer_id)
+            return False
+        
+        return True
+    
+    def _collect_acks(self, peer_id):
+        """Process the completed pipelined AppendEntries to one follower, oldest first.
+        
+        A rejection or a failed call drops the rest of the window (those batches were
+        sent past a point the follower may not have) and puts the follower back in
+        probe state. Returns False if a call failed.
+        """
+        inflight = self.inflight.get(peer_id)
+        while inflight and inflight[0][0].done():
+            future, term, prev_log_index, entry_count, _, sent_at = inflight.popleft()
+            if term != self.election_mgr.current_term:
+                self._drop_window(peer_id)  # sent in an earlier term; become_leader() reset the progress
                 return True
+            try:
+                response = future.result()
+            except grpc.RpcError:
+                self._drop_window(peer_id)
+                self.progress_state[peer_id] = self.PROBE
+                self.next_index[peer_id] = self.match_index[peer_id] + 1
+                return False
             
-            time.sleep(0.1)
+            if response.success:
+                self._on_append_success(peer_id, prev_log_index + entry_count, sent_at)
+                continue
+            
+            self._drop_window(peer_id)
+            if response.term > self.election_mgr.current_term:
+                self.election_mgr.step_down(response.term)
+            else:
+                self._on_append_rejected(peer_id, prev_log_index, response)
+        return True
+    
+    def _compression_for(self, size):
+        if self.compression is None or size < self.compress_min_bytes:
+            return None
+        return self.compression
+    
+    def _drop_window(self, peer_id):
+        inflight = self.inflight.get(peer_id, ())
+        for future, _, _, _, _, _ in inflight:
+            future.cancel()
+        if inflight:
+            inflight.clear()
+    
+    def _on_append_success(self, peer_id, match_index, sent_at):
+        self.match_index[peer_id] = max(self.match_index[peer_id], match_index)
+        self.next_index[peer_id] = max(self.next_index[peer_id], self.match_index[peer_id] + 1)
+        self.progress_state[peer_id] = self.REPLICATE
+        self._record_ack(peer_id, sent_at)
+        self._advance_commit_index()
+        if self.transferring_to == peer_id:
+            with self.progress_cond:
+                self.progress_cond.notify_all()
+    
+    def _on_append_rejected(self, peer_id, prev_log_index, response):
+        self.progress_state[peer_id] = self.PROBE
+        self.next_index[peer_id] = self._next_index_from_hint(response)
+        print(f"{self.group_tag}Node {self.node_id}: Node {peer_id} rejected AppendEntries at {prev_log_index}, "
+              f"next_index -> {self.next_index[peer_id]}")
+    
+    def _advance_commit_index(self):
+        """Commit the highest index stored on a majority, if it belongs to the current term"""
+        with self.log_lock:
+            matches = [self.match_index.get(peer_id, 0) for peer_id in self._voter_ids()]
+            if self._self_votes():
+                matches.append(self.log.last_index())
+            matches.sort(reverse=True)
+            if len(matches) < self._majority():
+                return
+            candidate = matches[self._majority() - 1]
+            if candidate <= self.commit_index or self.log.term_at(candidate) != self.election_mgr.current_term:
+                return
+            self.commit_index = candidate
         
-        return False
+        self._notify_commit()
+        self._wake_senders()  # followers learn the new commit index right away
     
-    def _apply_committed_entries(self):
-        """Apply committed entries to state machine"""
+    # ------------------------------------------------------------------
+    # Linearizable reads
+    # ------------------------------------------------------------------
+    
+    def read(self, key, timeout=5):
+        """Serve a read without appending to the log.
+        
+        ReadIndex: remember commit_index, confirm we are still leader with one
+        heartbeat round (skipped while the leader lease holds), wait until the
+        state machine has applied up to that index, then read locally.
+        Returns (success, value, found, message, read_index).
+        """
+        term = self.election_mgr.current_term
+        if self.election_mgr.role != "leader":
+            return False, "", False, "NOT_LEADER", 0
+        
         with self.log_lock:
-            while self.last_applied < self.commit_index:
-                self.last_applied += 1
-                entry = self.log[self.last_applied]
-                print(f" Node {self.node_id}: Applying entry {self.last_applied}: {entry['command']}")
+            read_index = self.commit_index
+            # Until an entry of this term commits, commit_index may lag the previous leader's
+            ready = self.log.term_at(read_index) == term
+        
+        if not ready:
+            return False, "", False, "Leader has not committed an entry in its term yet", read_index
+        
+        # During a transfer the target may win an election while our lease still runs
+        if not (self.lease_reads and self.transferring_to is None and self._lease_valid()):
+            if not self._confirm_leadership(term):
+                return False, "", False, "Could not confirm leadership with a majority", read_index
+        
+        deadline = time.monotonic() + timeout
+        with self.applied_cond:
+            while self.last_applied < read_index:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, "", False, "Timed out waiting for apply", read_index
+                self.applied_cond.wait(remaining)
+        
+        value = self.state_machine.query(key)
+        return True, value or "", value is not None, "OK", read_index
     
-    def replicate_to_followers(self):
-        """Leader continuously replicates log to followers"""
-        def replication_loop():
-            while True:
-                if self.election_mgr.role == "leader":
-                    for peer in self.peers:
-                        peer_id = peer.split(":")[0].replace("raft_", "")
-                        if peer_id == self.node_id:
-                            continue
-                        
-                        self._send_append_entries(peer, peer_id)
-                
-                time.sleep(0.5)
+    def read_stale(self, key, min_index=0, max_staleness=None, wait=1.0):
+        """Bounded-staleness read from the local applied state; works on any node.
+        
+        Served once last_applied reaches min_index and, with max_staleness (seconds), the
+        leader's commit index as of at most max_staleness ago. A follower knows the
+        latter from leader_commit in AppendEntries; the leader from its last majority ack.
+        Returns (success, value, found, message, applied_index), or None if the bound
+        cannot be met within wait seconds (the caller then reads through the leader).
+        """
+        target = min_index
+        if max_staleness is not None:
+            if self.election_mgr.role == "leader":
+                fresh_at, commit_seen = self._quorum_ack_time(), self.commit_index
+            else:
+                commit_seen, fresh_at = self.leader_commit_seen
+            if self.scheduler.clock() - fresh_at > max_staleness:
+                return None
+            target = max(target, commit_seen)
+        
+        deadline = time.monotonic() + wait
+        with self.applied_cond:
+            while self.last_applied < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.applied_cond.wait(remaining)
+            applied_index = self.last_applied
         
-        threading.Thread(target=replication_loop, daemon=True).start()
+        value = self.state_machine.query(key)
+        return True, value or "", value is not None, "OK", applied_index
     
-    def _send_append_entries(self, peer_address, peer_id):
-        """Send AppendEntries RPC to a specific follower"""
+    def _record_ack(self, peer_id, sent_at):
+        """A follower accepted an AppendEntries we sent at sent_at (scheduler clock)"""
+        self.last_ack[peer_id] = max(self.last_ack.get(peer_id, 0), sent_at)
+    
+    # ------------------------------------------------------------------
+    # Leadership transfer
+    # ------------------------------------------------------------------
+    
+    def transfer_leadership(self, target_id="", timeout=None):
+        """Hand leadership to target_id (default: the most up-to-date follower).
+        
+        New writes are refused, the target is brought fully up to date by its sender,
+        then told to campaign at once with TimeoutNow. Gives up (and resumes writes)
+        if the target has not taken over within timeout (default: min election timeout).
+        Returns (success, message, leader_id).
+        """
+        timeout = timeout or self.election_mgr.MIN_ELECTION_TIMEOUT
+        if self.election_mgr.role != "leader":
+            return False, "NOT_LEADER", self.election_mgr.leader_id or ""
+        
+        peers = dict((peer_id, peer) for peer, peer_id in self._peer_ids() if peer_id in self._voter_ids())
+        if target_id == self.node_id:
+            return True, "Already the leader", self.node_id
+        if not target_id:
+            if not peers:
+                return False, "No transfer target available", self.node_id
+            target_id = max(peers, key=lambda peer_id: self.match_index.get(peer_id, 0))
+        if target_id not in peers:
+            return False, f"Unknown transfer target {target_id}", self.node_id
+        if self.transferring_to is not None:
+            return False, f"Leadership transfer to {self.transferring_to} already in progress", self.node_id
+        
+        term = self.election_mgr.current_term
+        self.transferring_to = target_id
+        print(f"{self.group_tag}Node {self.node_id} (LEADER): Transferring leadership to {target_id}")
+        deadline = self.scheduler.clock() + timeout
+        
         try:
-            if peer_id not in self.next_index:
-                self.next_index[peer_id] = len(self.log)
-                self.match_index[peer_id] = 0
+            # Let the target's sender ship everything still missing
+            self.peer_wakeups[target_id].set()
+            with self.progress_cond:
+                while self.match_index.get(target_id, 0) < self.log.last_index():
+                    remaining = deadline - self.scheduler.clock()
+                    if remaining <= 0 or self.election_mgr.current_term != term:
+                        return False, f"{target_id} did not catch up in time", self.election_mgr.leader_id or ""
+                    self.progress_cond.wait(remaining)
             
-            next_idx = self.next_index[peer_id]
+            # The target campaigns without waiting out leader stickiness: give up the lease first
+            self.lease_revoked_at = self.scheduler.clock()
+            print(f"{self.group_tag}Node {self.node_id} sends RPC TimeoutNow to Node {target_id}")
+            response = raft_pb2_grpc.RaftStub(self.channels.get(peers[target_id])).TimeoutNow(
+                raft_pb2.TimeoutNowRequest(term=term, leader_id=self.node_id, group_id=self.group_id),
+                timeout=max(0.1, deadline - self.scheduler.clock())
+            )
+            if not response.success:
+                return False, f"{target_id} refused TimeoutNow", self.node_id
             
+            # The target's RequestVote (higher term) makes us step down
+            while self.election_mgr.role == "leader" and self.scheduler.clock() < deadline:
+                time.sleep(0.01)
+            if self.election_mgr.role == "leader":
+                return False, f"{target_id} did not win the election in time", self.node_id
+            return True, f"Leadership transferred to {target_id}", target_id
+        
+        except grpc.RpcError as e:
+            return False, f"TimeoutNow to {target_id} failed: {e.code()}", self.node_id
+        finally:
+            self.transferring_to = None
+    
+    # ------------------------------------------------------------------
+    # Membership changes
+    # ------------------------------------------------------------------
+    
+    def change_membership(self, action, address, timeout=5):
+        """Single-server configuration change, replicated as a CONFIG log entry.
+        
+        add_learner: address starts receiving the log without voting or counting for commit.
+        promote: a caught-up learner becomes a voter. remove: drop a voter or learner
+        (possibly the leader itself, which steps down once the change commits).
+        Returns (success, message, leader_id).
+        """
+        if self.election_mgr.role != "leader":
+            return False, "NOT_LEADER", self.leader_hint()
+        
+        with self.config_change_lock:
             with self.log_lock:
-                entries_to_send = self.log[next_idx:]
-                prev_log_index = next_idx - 1
-                prev_log_term = self.log[prev_log_index]["term"] if prev_log_index >= 0 else 0
-                
-                log_entries = [
-                    raft_pb2.LogEntry(
-                        term=entry["term"],
-                        command=entry["command"],
-                        index=entry["index"]
-                    )
-                    for entry in entries_to_send
-                ]
+                if self.membership.latest_index() > self.commit_index:
+                    return False, "Previous membership change has not committed yet", self.node_id
+                # Until an entry of its term commits, the leader may not know the latest configuration
+                if self.log.term_at(self.commit_index) != self.election_mgr.current_term:
+                    return False, "Leader has not committed an entry in its term yet", self.node_id
             
-            host, port = peer_address.split(":")
+            config = self.membership.current()
+            peer_id = node_id_of(address)
+            if action == "add_learner":
+                if address in config.members():
+                    return False, f"{address} is already a member", self.node_id
+                new_config = ClusterConfig(config.voters, config.learners + [address])
+            elif action == "promote":
+                if address not in config.learners:
+                    return False, f"{address} is not a learner", self.node_id
+                if self.match_index.get(peer_id, 0) < self.commit_index:
+                    return False, (f"{address} is still catching up (match index {self.match_index.get(peer_id, 0)}, "
+                                   f"commit index {self.commit_index})"), self.node_id
+                new_config = ClusterConfig(config.voters + [address],
+                                           [learner for learner in config.learners if learner != address])
+            elif action == "remove":
+                if address not in config.members():
+                    return False, f"{address} is not a member", self.node_id
+                new_config = ClusterConfig([voter for voter in config.voters if voter != address],
+                                           [learner for learner in config.learners if learner != address])
+                if not new_config.voters:
+                    return False, "Cannot remove the last voter", self.node_id
+            else:
+                return False, f"Unknown membership action {action}", self.node_id
             
-            with grpc.insecure_channel(f"{host}:{port}") as channel:
-                stub = raft_pb2_grpc.RaftStub(channel)
-                
-                request = raft_pb2.AppendEntriesRequest(
-                    term=self.election_mgr.current_term,
+            print(f"{self.group_tag}Node {self.node_id} (LEADER): Membership change {action} {address}")
+            success, message, leader_id, _, _ = self.append_entry(new_config.to_command(), "membership",
+                                                                  timeout, allow_config=True)
+            return success, message, leader_id
+    
+    def _check_quorum(self):
+        """Periodic (scheduler thread): resign if a majority has gone silent"""
+        if self.election_mgr.role != "leader":
+            return
+        window = self.election_mgr.MIN_ELECTION_TIMEOUT
+        now = self.scheduler.clock()
+        if now - self.leader_since < window:
+            return
+        
+        voters = self._voter_ids()
+        active = self._self_votes() + sum(1 for peer_id in voters if now - self.last_ack.get(peer_id, 0) < window)
+        if active < self._majority():
+            self.election_mgr.resign(f"only {active}/{len(self.membership.current().voters)} voters "
+                                     f"acknowledged in the last {window}s")
+    
+    def _lease_valid(self):
+        """Leader lease: a majority acknowledged us less than lease_duration ago (and since
+        the lease was last revoked by a leadership transfer)"""
+        acked_at = self._quorum_ack_time()
+        return acked_at > self.lease_revoked_at and self.scheduler.clock() < acked_at + self.lease_duration
+    
+    def _quorum_ack_time(self):
+        """Latest time by which a majority (counting us) had acknowledged us; 0 if never"""
+        needed = self._majority() - self._self_votes()  # the leader counts itself while a voter
+        if needed <= 0:
+            return self.scheduler.clock()
+        acks = sorted((self.last_ack.get(peer_id, 0) for peer_id in self._voter_ids()), reverse=True)
+        if len(acks) < needed:
+            return 0
+        return acks[needed - 1]
+    
+    def _confirm_leadership(self, term):
+        """ReadIndex round: one parallel heartbeat; True if a majority still follows us in term"""
+        request = raft_pb2.AppendEntriesRequest(
+            term=term,
+            leader_id=self.node_id,
+            entries=[],
+            prev_log_index=0,
+            prev_log_term=0,
+            leader_commit=0,
+            group_id=self.group_id
+        )
+        
+        sent_at = self.scheduler.clock()
+        calls = []
+        voters = self._voter_ids()
+        for peer, peer_id in self._peer_ids():
+            if peer_id not in voters:
+                continue
+            channel = self.channels.get(peer)
+            print(f"{self.group_tag}Node {self.node_id} sends RPC AppendEntries to Node {peer_id}")
+            calls.append((peer_id, raft_pb2_grpc.RaftStub(channel).AppendEntries.future(request, timeout=1)))
+        
+        acks = self._self_votes()
+        for peer_id, call in calls:
+            try:
+                response = call.result()
+            except grpc.RpcError:
+                continue
+            if response.success and response.term == term:
+                acks += 1
+                self._record_ack(peer_id, sent_at)
+            elif response.term > term:
+                self.election_mgr.step_down(response.term)
+        
+        return acks >= self._majority() and self.election_mgr.current_term == term
+    
+    def _next_index_from_hint(self, response):
+        """Jump next_index past a whole conflicting term instead of stepping back one entry"""
+        if response.conflict_term > 0:
+            last_of_term = self.log.last_index_of_term(response.conflict_term)
+            if last_of_term > 0:
+                return last_of_term + 1
+        return max(1, response.conflict_index)
+    
+    def _send_snapshot(self, peer_id, channel):
+        """Stream the latest snapshot to a lagging follower in chunks"""
+        latest = self.snapshots.latest()
+        if latest is None:
+            return
+        
+        last_index, last_term, path = latest
+        term = self.election_mgr.current_term
+        
+        def chunks():
+            for offset, data, done in self.snapshots.read_chunks(path, self.snapshot_chunk_bytes):
+                yield raft_pb2.InstallSnapshotChunk(
+                    term=term,
                     leader_id=self.node_id,
-                    entries=log_entries,
-                    prev_log_index=prev_log_index,
-                    prev_log_term=prev_log_term,
-                    leader_commit=self.commit_index
+                    last_included_index=last_index,
+                    last_included_term=last_term,
+                    offset=offset,
+                    data=data,
+                    done=done,
+                    group_id=self.group_id
                 )
+        
+        stub = raft_pb2_grpc.RaftStub(channel)
+        print(f"{self.group_tag}Node {self.node_id} sends RPC InstallSnapshot to Node {peer_id} (last index: {last_index})")
+        
+        # Every chunk is compressed on its own (gRPC compresses per message)
+        compression = self._compression_for(os.path.getsize(path))
+        response = stub.InstallSnapshot(chunks(), timeout=30, compression=compression)
+        
+        if response.term > self.election_mgr.current_term:
+            self.election_mgr.step_down(response.term)
+        elif response.success:
+            self.match_index[peer_id] = max(self.match_index.get(peer_id, 0), last_index)
+            self.next_index[peer_id] = last_index + 1
+    
+    def handle_install_snapshot(self, request_iterator):
+        """Follower assembles a chunked snapshot from the leader and replaces its state"""
+        first = None
+        writer = None
+        
+        try:
+            for chunk in request_iterator:
+                if first is None:
+                    first = chunk
+                    print(f"{self.group_tag}Node {self.node_id} runs RPC InstallSnapshot called by Node {chunk.leader_id}")
+                    if not self.election_mgr.accept_leader(chunk.term, chunk.leader_id):
+                        return raft_pb2.InstallSnapshotResponse(term=self.election_mgr.current_term, success=False)
+                    writer = self.snapshots.begin_receive()
                 
-                if len(log_entries) > 0:
-                    print(f"Node {self.node_id} sends RPC AppendEntries to Node {peer_id} (entries: {len(log_entries)})")
+                self.election_mgr.reset_election_timer()
+                writer.write(chunk.offset, chunk.data)
+                if chunk.done:
+                    break
+            else:
+                # Stream ended before the last chunk
+                if writer:
+                    writer.abort()
+                return raft_pb2.InstallSnapshotResponse(term=self.election_mgr.current_term, success=False)
+            
+            last_index, last_term = first.last_included_index, first.last_included_term
+            
+            with self.apply_lock:
+                if last_index <= self.last_applied:
+                    writer.abort()
+                    return raft_pb2.InstallSnapshotResponse(term=self.election_mgr.current_term, success=True)
                 
-                response = stub.AppendEntries(request, timeout=2)
+                path = writer.commit(last_index, last_term)
+                self.state_machine.restore(self.snapshots.load(path))
                 
-                if response.success:
-                    self.match_index[peer_id] = prev_log_index + len(log_entries)
-                    self.next_index[peer_id] = self.match_index[peer_id] + 1
-                else:
-                    self.next_index[peer_id] = max(1, self.next_index[peer_id] - 1)
+                with self.log_lock:
+                    self.log.compact(last_index, last_term)
+                    self.commit_index = max(self.commit_index, last_index)
+                    self._load_membership()
+                with self.applied_cond:
+                    self.last_applied = last_index
+                    self.applied_cond.notify_all()
+            self._sync_senders()
+            
+            print(f" {self.group_tag}Node {self.node_id} (FOLLOWER): Installed snapshot at index {last_index} (term {last_term})")
+            return raft_pb2.InstallSnapshotResponse(term=self.election_mgr.current_term, success=True)
         
-        except:
-            pass
+        except ValueError as e:
+            print(f" {self.group_tag}Node {self.node_id}: Rejected snapshot chunk: {e}")
+            if writer:
+                writer.abort()
+            return raft_pb2.InstallSnapshotResponse(term=self.election_mgr.current_term, success=False)
     
     def handle_append_entries(self, request):
         """Follower handles AppendEntries RPC from leader"""
         if len(request.entries) > 0:
-            print(f"Node {self.node_id} runs RPC AppendEntries called by Node {request.leader_id} (entries: {len(request.entries)})")
+            print(f"{self.group_tag}Node {self.node_id} runs RPC AppendEntries called by Node {request.leader_id} (entries: {len(request.entries)})")
+        else:
+            print(f"{self.group_tag}Node {self.node_id} runs RPC AppendEntries called by Node {request.leader_id}")
+        
+        if not self.election_mgr.accept_leader(request.term, request.leader_id):
+            return raft_pb2.AppendEntriesResponse(
+                term=self.election_mgr.current_term,
+                success=False,
+                match_index=0
+            )
+        
+        received_at = self.scheduler.clock()
+        if len(request.entries) == 0:
+            print(f"{self.group_tag}Node {self.node_id}: Heartbeat received from leader {request.leader_id}")
         
         with self.log_lock:
-            if request.term < self.election_mgr.current_term:
-                return raft_pb2.AppendEntriesResponse(
-                    term=self.election_mgr.current_term,
-                    success=False,
-                    match_index=0
-                )
+            if request.prev_log_index > self.log.last_index():
+                # Probably a pipelined batch that overtook the one before it
+                self.log_appended.wait_for(lambda: request.prev_log_index <= self.log.last_index(),
+                                           self.PIPELINE_GAP_WAIT)
+                if request.term != self.election_mgr.current_term:
+                    return raft_pb2.AppendEntriesResponse(
+                        term=self.election_mgr.current_term,
+                        success=False,
+                        match_index=0
+                    )
+            
+            prev_log_index = request.prev_log_index
+            prev_log_term = request.prev_log_term
+            entries = request.entries
+            last_new_index = prev_log_index + len(entries)
             
-            if request.prev_log_index > 0:
-                if request.prev_log_index >= len(self.log):
+            # Entries covered by our snapshot are committed, hence identical: skip them
+            snapshot_index = self.log.snapshot_index()
+            if prev_log_index < snapshot_index:
+                skip = min(snapshot_index - prev_log_index, len(entries))
+                entries = entries[skip:]
+                prev_log_index += skip
+                prev_log_term = self.log.term_at(prev_log_index)
+            
+            if prev_log_index > 0 and prev_log_index >= snapshot_index:
+                if prev_log_index > self.log.last_index():
                     return raft_pb2.AppendEntriesResponse(
                         term=self.election_mgr.current_term,
                         success=False,
-                        match_index=len(self.log) - 1
+                        match_index=self.log.last_index(),
+                        conflict_term=0,
+                        conflict_index=self.log.last_index() + 1
                     )
                 
-                if self.log[request.prev_log_index]["term"] != request.prev_log_term:
+                if self.log.term_at(prev_log_index) != prev_log_term:
                     return raft_pb2.AppendEntriesResponse(
                         term=self.election_mgr.current_term,
                         success=False,
-                        match_index=request.prev_log_index - 1
+                        match_index=prev_log_index - 1,
+                        conflict_term=self.log.term_at(prev_log_index),
+                        conflict_index=self.log.first_index_of_term(prev_log_index)
                     )
             
-            if len(request.entries) > 0:
-                insert_index = request.prev_log_index + 1
+            if len(entries) > 0:
+                insert_index = prev_log_index + 1
                 
-                for i, entry in enumerate(request.entries):
+                for i, entry in enumerate(entries):
                     log_index = insert_index + i
                     
-                    entry_dict = {
-                        "term": entry.term,
-                        "command": entry.command,
-                        "index": entry.index
-                    }
+                    if log_index <= self.log.last_index():
+                        if self.log.term_at(log_index) == entry.term:
+                            continue  # already have this entry
+                        # Conflicting suffix from a deposed leader: drop it
+                        self.log.truncate_suffix(log_index)
+                        self.membership.truncated(log_index)
                     
-                    if log_index < len(self.log):
-                        if self.log[log_index]["term"] != entry.term:
-                            self.log[log_index] = entry_dict
-                    else:
-                        self.log.append(entry_dict)
+                    self.log.append([(e.term, entry_command(e)) for e in entries[i:]])
+                    self._track_config(log_index, [entry_command(e) for e in entries[i:]])
+                    self.log_appended.notify_all()
+                    break
                 
-                print(f" Node {self.node_id} (FOLLOWER): Replicated {len(request.entries)} entries from leader")
+                print(f" {self.group_tag}Node {self.node_id} (FOLLOWER): Replicated {len(request.entries)} entries from leader")
             
             if request.leader_commit > self.commit_index:
                 old_commit = self.commit_index
-                self.commit_index = min(request.leader_commit, len(self.log) - 1)
+                self.commit_index = max(self.commit_index, min(request.leader_commit, last_new_index))
                 
                 if self.commit_index > old_commit:
-                    print(f" Node {self.node_id} (FOLLOWER): Updated commit_index to {self.commit_index}")
+                    print(f" {self.group_tag}Node {self.node_id} (FOLLOWER): Updated commit_index to {self.commit_index}")
             
-            self._apply_committed_entries()
-            
-            return raft_pb2.AppendEntriesResponse(
-                term=self.election_mgr.current_term,
-                success=True,
-                match_index=len(self.log) - 1
-            )
\ No newline at end of file
+            # A pipelined batch handled late carries an older leader_commit: keep the highest
+            commit_seen, fresh_at = self.leader_commit_seen
+            self.leader_commit_seen = (max(commit_seen, request.leader_commit), max(fresh_at, received_at))
+        
+        # Entries must be durable before they are acknowledged
+        self.log.sync()
+        self._notify_commit()
+        
+        return raft_pb2.AppendEntriesResponse(
+            term=self.election_mgr.current_term,
+            success=True,
+            match_index=last_new_index
+        )
\ No newline at end of file
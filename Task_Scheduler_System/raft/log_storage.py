@@ -0,0 +1,632 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import bisect
+import tempfile
+import threading
+from array import array
+
+import raft_pb2
+
+
+def _fsync_dir(path):
+    """fsync a directory so file creations/renames/deletions are durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class HardStateStore:
+    """Durable Raft hard state (current_term, voted_for)"""
+
+    def __init__(self, data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, "hard_state.json")
+
+    def load(self):
+        """Returns (current_term, voted_for); (0, None) on first boot"""
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            return state.get("current_term", 0), state.get("voted_for")
+        except (FileNotFoundError, ValueError):
+            return 0, None
+
+    def save(self, current_term, voted_for):
+        """Atomically replace the state file (write tmp + fsync + rename)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"current_term": current_term, "voted_for": voted_for}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.data_dir)
+
+
+class _Segment:
+    """One append-only segment file holding a contiguous run of entries"""
+
+    def __init__(self, path, first_index):
+        self.path = path
+        self.first_index = first_index
+        self.file = open(path, "a+b")
+        self.size = self.file.seek(0, os.SEEK_END)
+        self._view = None
+
+    def view(self, end_offset):
+        """Read-only mmap covering at least end_offset bytes"""
+        if self._view is None or len(self._view) < end_offset:
+            self.close_view()
+            self.file.flush()
+            self._view = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._view
+
+    def close_view(self):
+        if self._view is not None:
+            self._view.close()
+            self._view = None
+
+    def close(self):
+        self.close_view()
+        self.file.close()
+
+
+# Wire tag of AppendEntriesRequest.entries (field 3, length-delimited)
+_ENTRIES_TAG = bytes([(3 << 3) | 2])
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def encode_entry(index, term, command):
+    """Serialize one entry exactly as it appears inside AppendEntriesRequest.entries.
+
+    Concatenating frames yields a valid encoding of the repeated field, so a
+    range of the log can be spliced into a request without building protos.
+    A bytes command goes in the binary payload field.
+    """
+    if isinstance(command, bytes):
+        entry = raft_pb2.LogEntry(term=term, payload=command, index=index)
+    else:
+        entry = raft_pb2.LogEntry(term=term, command=command, index=index)
+    body = entry.SerializeToString()
+    return _ENTRIES_TAG + _varint(len(body)) + body
+
+
+def decode_entries(frames):
+    """Parse concatenated entry frames back into LogEntry messages"""
+    return raft_pb2.AppendEntriesRequest.FromString(frames).entries
+
+
+def entry_command(entry):
+    """Command of a LogEntry: bytes for a binary entry, else the string"""
+    return entry.payload or entry.command
+
+
+class SegmentedLog:
+    """Disk-backed Raft log split into segment files.
+
+    Each record is: crc32 | frame length | term | frame, where the frame is the
+    entry pre-serialized as an AppendEntriesRequest.entries element.
+
+    In memory the log is a handful of flat arrays indexed by (index - first_index):
+    the term of every live entry and its file offset, so lookups are O(1).
+    The most recent entries (up to cache_bytes) are also kept as one contiguous
+    bytearray of frames plus an offset array; any range of them is a single
+    slice that is already valid protobuf. Older ranges are read through mmap.
+
+    Index 0 is the implicit empty-log sentinel with term 0; after compaction
+    the snapshot's (last_included_index, last_included_term) takes its place.
+    """
+
+    HEADER = struct.Struct("<IIi")
+    DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+    DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, log_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, cache_bytes=DEFAULT_CACHE_BYTES):
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_dir = log_dir
+        self.segment_bytes = segment_bytes
+        self.cache_bytes = cache_bytes
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+        self._segments = []
+        self._segment_starts = []
+        self._first_index = 1
+        self._terms = array("i")
+        self._offsets = array("Q")
+        self._snapshot_index = 0
+        self._snapshot_term = 0
+
+        # Frame arena for entries [_cache_first, last_index]
+        self._cache = bytearray()
+        self._cache_offsets = array("Q", [0])
+        self._cache_first = 1
+
+        self._durable_index = 0
+        self._recover()
+
+    # ------------------------------------------------------------------
+    # Recovery
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, first_index):
+        return os.path.join(self.log_dir, f"{first_index:020d}.seg")
+
+    def _recover(self):
+        """Rebuild the in-memory index, cutting off any torn tail record"""
+        names = sorted(n for n in os.listdir(self.log_dir) if n.endswith(".seg"))
+
+        for pos, name in enumerate(names):
+            first_index = int(name.split(".")[0])
+            expected = self._first_index + len(self._terms)
+            if self._segments and first_index != expected:
+                # Gap between segments: everything from here on is unusable
+                for stale in names[pos:]:
+                    os.remove(os.path.join(self.log_dir, stale))
+                break
+
+            if not self._segments:
+                self._first_index = self._cache_first = first_index
+
+            segment = _Segment(os.path.join(self.log_dir, name), first_index)
+            valid_size = self._scan_segment(segment)
+
+            if valid_size < segment.size:
+                print(f" Log: truncating torn tail of {name} at byte {valid_size}")
+                segment.file.truncate(valid_size)
+                segment.size = valid_size
+                os.fsync(segment.file.fileno())
+                self._attach(segment)
+                for stale in names[pos + 1:]:
+                    os.remove(os.path.join(self.log_dir, stale))
+                break
+
+            self._attach(segment)
+
+        if not self._segments:
+            self._attach(_Segment(self._segment_path(self._first_index), self._first_index))
+            _fsync_dir(self.log_dir)
+
+        self._durable_index = self.last_index()
+
+    def _scan_segment(self, segment):
+        """Index every intact record of a segment; returns the valid byte length"""
+        segment.file.seek(0)
+        data = segment.file.read()
+        offset = 0
+        while offset + self.HEADER.size <= len(data):
+            crc, length, term = self.HEADER.unpack_from(data, offset)
+            end = offset + self.HEADER.size + length
+            if end > len(data):
+                break
+            if zlib.crc32(data[offset + 4:end]) != crc:
+                break
+            self._terms.append(term)
+            self._offsets.append(offset)
+            self._cache_append(data[offset + self.HEADER.size:end])
+            offset = end
+        return offset
+
+    def _attach(self, segment):
+        self._segments.append(segment)
+        self._segment_starts.append(segment.first_index)
+
+    # ------------------------------------------------------------------
+    # Frame cache
+    # ------------------------------------------------------------------
+
+    def _cache_append(self, frame):
+        self._cache += frame
+        self._cache_offsets.append(len(self._cache))
+        if len(self._cache) > self.cache_bytes:
+            # Keep the newest half: followers in steady state only need the tail
+            keep_from = bisect.bisect_left(self._cache_offsets, len(self._cache) - self.cache_bytes // 2)
+            self._cache_drop_before(self._cache_first + keep_from)
+
+    def _cache_drop_before(self, index):
+        """Forget cached frames of entries older than index"""
+        count = index - self._cache_first
+        if count <= 0:
+            return
+        if count >= len(self._cache_offsets) - 1:
+            self._cache_reset(index)
+            return
+        shift = self._cache_offsets[count]
+        del self._cache[:shift]
+        self._cache_offsets = array("Q", (o - shift for o in self._cache_offsets[count:]))
+        self._cache_first = index
+
+    def _cache_truncate(self, index):
+        """Forget cached frames of entries >= index"""
+        count = index - self._cache_first
+        if count <= 0:
+            self._cache_reset(index)
+            return
+        if count < len(self._cache_offsets) - 1:
+            del self._cache[self._cache_offsets[count]:]
+            del self._cache_offsets[count + 1:]
+
+    def _cache_reset(self, next_index):
+        self._cache = bytearray()
+        self._cache_offsets = array("Q", [0])
+        self._cache_first = next_index
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def first_index(self):
+        return self._first_index
+
+    def last_index(self):
+        return self._first_index + len(self._terms) - 1
+
+    def last_term(self):
+        return self.term_at(self.last_index())
+
+    def snapshot_index(self):
+        return self._snapshot_index
+
+    def term_at(self, index):
+        """Term of the entry at index (0 for the sentinel / unknown indices)"""
+        pos = index - self._first_index
+        if 0 <= pos < len(self._terms):
+            return self._terms[pos]
+        if index == self._snapshot_index:
+            return self._snapshot_term
+        return 0
+
+    def first_index_of_term(self, index):
+        """First index of the run of entries sharing index's term (terms never decrease)"""
+        term = self.term_at(index)
+        pos = bisect.bisect_left(self._terms, term, 0, max(0, index - self._first_index))
+        return max(self._first_index + pos, self._snapshot_index + 1)
+
+    def last_index_of_term(self, term):
+        """Last index holding term, or 0 if the log has no entry of that term"""
+        pos = bisect.bisect_right(self._terms, term)
+        if pos > 0 and self._terms[pos - 1] == term:
+            return self._first_index + pos - 1
+        if term == self._snapshot_term and self._snapshot_index:
+            return self._snapshot_index
+        return 0
+
+    def _segment_pos(self, index):
+        return bisect.bisect_right(self._segment_starts, index) - 1
+
+    def entry_frames(self, start, end=None):
+        """Pre-serialized entries start..end, ready to splice into an AppendEntriesRequest"""
+        with self._lock:
+            last = self.last_index()
+            end = last if end is None else min(end, last)
+            start = max(start, self._first_index)
+            if start > end:
+                return b""
+
+            parts = []
+            if start < self._cache_first:
+                parts.append(self._disk_frames(start, min(end, self._cache_first - 1)))
+                start = self._cache_first
+            if start <= end:
+                begin = self._cache_offsets[start - self._cache_first]
+                stop = self._cache_offsets[end - self._cache_first + 1]
+                parts.append(bytes(self._cache[begin:stop]))
+            return b"".join(parts)
+
+    def read_batch(self, start, max_entries, max_bytes):
+        """(prev_log_term, frames, count) for the next AppendEntries to send from start.
+
+        The batch is capped at max_entries and max_bytes of frames, but always
+        carries at least one entry so an oversized entry cannot stall replication.
+        """
+        with self._lock:
+            prev_log_term = self.term_at(start - 1)
+            last = min(self.last_index(), start + max_entries - 1)
+            if last < start:
+                return prev_log_term, b"", 0
+
+            end = self._batch_end(start, last, max_bytes)
+            return prev_log_term, self.entry_frames(start, end), end - start + 1
+
+    def _batch_end(self, start, last, max_bytes):
+        """Last index in [start, last] whose frames from start fit in max_bytes"""
+        if start >= self._cache_first:
+            # Arena offsets are prefix sums: binary search instead of summing sizes
+            base = start - self._cache_first
+            limit = self._cache_offsets[base] + max_bytes
+            fit = bisect.bisect_right(self._cache_offsets, limit, base + 1, last - self._cache_first + 2)
+            return max(start, self._cache_first + fit - 2)
+
+        size = 0
+        index = start
+        while index <= last:
+            size += self._disk_frame_size(index)
+            if size > max_bytes and index > start:
+                return index - 1
+            index += 1
+        return last
+
+    def _disk_frame_size(self, index):
+        pos = index - self._first_index
+        segment = self._segments[self._segment_pos(index)]
+        if pos + 1 < len(self._offsets) and index + 1 < segment.first_index + self._segment_len(segment):
+            record_end = self._offsets[pos + 1]
+        else:
+            record_end = segment.size
+        return record_end - self._offsets[pos] - self.HEADER.size
+
+    def _segment_len(self, segment):
+        pos = self._segment_pos(segment.first_index)
+        if pos + 1 < len(self._segments):
+            return self._segments[pos + 1].first_index - segment.first_index
+        return self.last_index() + 1 - segment.first_index
+
+    def _disk_frames(self, start, end):
+        """Frames of entries that fell out of the cache, read via mmap"""
+        parts = []
+        index = start
+        while index <= end:
+            pos = self._segment_pos(index)
+            segment = self._segments[pos]
+            if pos + 1 < len(self._segments):
+                seg_last = min(end, self._segments[pos + 1].first_index - 1)
+            else:
+                seg_last = end
+            view = segment.view(segment.size)
+            for i in range(index, seg_last + 1):
+                offset = self._offsets[i - self._first_index]
+                _, length, _ = self.HEADER.unpack_from(view, offset)
+                body_start = offset + self.HEADER.size
+                parts.append(view[body_start:body_start + length])
+            index = seg_last + 1
+        return b"".join(parts)
+
+    def entries(self, start, end=None):
+        """Returns [(index, term, command)] for start <= index <= end (command is bytes for binary entries)"""
+        return [(e.index, e.term, entry_command(e)) for e in decode_entries(self.entry_frames(start, end))]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, entries):
+        """Append [(term, command)] after the last index; returns the new last index.
+
+        Records are written to the page cache only; call sync() to make them durable.
+        """
+        with self._lock:
+            for term, command in entries:
+                segment = self._segments[-1]
+                if segment.size >= self.segment_bytes:
+                    segment = self._roll()
+
+                frame = encode_entry(self.last_index() + 1, term, command)
+                tail = struct.pack("<Ii", len(frame), term) + frame
+                record = struct.pack("<I", zlib.crc32(tail)) + tail
+
+                segment.file.write(record)
+                self._terms.append(term)
+                self._offsets.append(segment.size)
+                self._cache_append(frame)
+                segment.size += len(record)
+            return self.last_index()
+
+    def _roll(self):
+        """Seal the active segment and start a new one"""
+        sealed = self._segments[-1]
+        sealed.file.flush()
+        os.fsync(sealed.file.fileno())
+
+        next_index = self.last_index() + 1
+        segment = _Segment(self._segment_path(next_index), next_index)
+        self._attach(segment)
+        _fsync_dir(self.log_dir)
+        return segment
+
+    def sync(self):
+        """Make every appended entry durable.
+
+        Group commit: concurrent callers share one fsync, so a burst of
+        appends costs a single disk flush instead of one per entry.
+        """
+        target = self.last_index()
+        if self._durable_index >= target:
+            return
+
+        with self._sync_lock:
+            if self._durable_index >= target:
+                return  # another caller's fsync already covered us
+
+            with self._lock:
+                segment = self._segments[-1]
+                segment.file.flush()
+                upto = self.last_index()
+                fd = segment.file.fileno()
+
+            os.fsync(fd)
+            self._durable_index = max(self._durable_index, upto)
+
+    def truncate_suffix(self, index):
+        """Delete every entry with index >= index (conflicting follower suffix)"""
+        with self._sync_lock, self._lock:  # same order as sync()
+            if index > self.last_index():
+                return
+            index = max(index, self._first_index)
+
+            keep = index - self._first_index
+            pos = self._segment_pos(index)
+            if pos > 0 and self._segments[pos].first_index == index:
+                pos -= 1  # index starts a segment: drop it whole, nothing to cut before it
+                cut_offset = self._segments[pos].size
+            else:
+                cut_offset = self._offsets[keep]
+
+            while len(self._segments) > pos + 1:
+                segment = self._segments.pop()
+                self._segment_starts.pop()
+                segment.close()
+                os.remove(segment.path)
+
+            segment = self._segments[-1]
+            segment.close_view()
+            segment.file.flush()
+            segment.file.truncate(cut_offset)
+            segment.size = cut_offset
+            os.fsync(segment.file.fileno())
+            _fsync_dir(self.log_dir)
+
+            del self._terms[keep:]
+            del self._offsets[keep:]
+            self._cache_truncate(index)
+            self._durable_index = min(self._durable_index, self.last_index())
+
+    def compact(self, snapshot_index, snapshot_term):
+        """Discard the log prefix covered by a snapshot.
+
+        Whole segments whose entries are all <= snapshot_index are deleted.
+        If the log does not contain the snapshot's last entry (a follower that
+        just installed a snapshot from the leader) the entire log is dropped.
+        """
+        with self._sync_lock, self._lock:  # same order as sync()
+            if snapshot_index <= self._snapshot_index:
+                return
+
+            conflicting = (snapshot_index >= self._first_index
+                           and self.term_at(snapshot_index) != snapshot_term)
+
+            if snapshot_index > self.last_index() or conflicting:
+                for segment in self._segments:
+                    segment.close()
+                    os.remove(segment.path)
+                self._segments = []
+                self._segment_starts = []
+                self._first_index = snapshot_index + 1
+                self._terms = array("i")
+                self._offsets = array("Q")
+                self._cache_reset(self._first_index)
+                self._attach(_Segment(self._segment_path(self._first_index), self._first_index))
+            else:
+                while len(self._segments) > 1 and self._segments[1].first_index <= snapshot_index + 1:
+                    segment = self._segments.pop(0)
+                    self._segment_starts.pop(0)
+                    segment.close()
+                    os.remove(segment.path)
+
+                drop = self._segments[0].first_index - self._first_index
+                if drop > 0:
+                    del self._terms[:drop]
+                    del self._offsets[:drop]
+                    self._first_index = self._segments[0].first_index
+                    self._cache_drop_before(self._first_index)
+
+            _fsync_dir(self.log_dir)
+            self._snapshot_index = snapshot_index
+            self._snapshot_term = snapshot_term
+            self._durable_index = max(self._durable_index, self.last_index())
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.file.flush()
+                segment.close()
+
+
+class SnapshotStore:
+    """State-machine snapshots stored as snapshot-<last_index>-<last_term>.snap files"""
+
+    def __init__(self, snapshot_dir):
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.snapshot_dir = snapshot_dir
+        # Partially received snapshots from before a crash are useless
+        for name in os.listdir(snapshot_dir):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(snapshot_dir, name))
+
+    def _path(self, last_index, last_term):
+        return os.path.join(self.snapshot_dir, f"snapshot-{last_index:020d}-{last_term}.snap")
+
+    def latest(self):
+        """Returns (last_index, last_term, path) of the newest snapshot, or None"""
+        names = sorted(n for n in os.listdir(self.snapshot_dir)
+                       if n.startswith("snapshot-") and n.endswith(".snap"))
+        if not names:
+            return None
+        _, index, term = names[-1][:-len(".snap")].split("-")
+        return int(index), int(term), os.path.join(self.snapshot_dir, names[-1])
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def save(self, last_index, last_term, data):
+        """Durably write a snapshot and delete the ones it supersedes"""
+        writer = self.begin_receive()
+        writer.write(0, data)
+        return writer.commit(last_index, last_term)
+
+    def read_chunks(self, path, chunk_bytes):
+        """Yields (offset, data, done) pieces of a snapshot file"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while True:
+                data = f.read(chunk_bytes)
+                done = offset + len(data) >= size
+                yield offset, data, done
+                if done:
+                    return
+                offset += len(data)
+
+    def begin_receive(self):
+        return _SnapshotWriter(self)
+
+    def _prune(self, keep_path):
+        for name in os.listdir(self.snapshot_dir):
+            path = os.path.join(self.snapshot_dir, name)
+            if path != keep_path and name.endswith(".snap"):
+                os.remove(path)
+
+
+class _SnapshotWriter:
+    """Assembles a snapshot (possibly from InstallSnapshot chunks) in a temp file"""
+
+    def __init__(self, store):
+        self.store = store
+        fd, self.tmp_path = tempfile.mkstemp(suffix=".tmp", dir=store.snapshot_dir)
+        self.file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, offset, data):
+        if offset != self.size:
+            raise ValueError(f"snapshot chunk at offset {offset}, expected {self.size}")
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self, last_index, last_term):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        path = self.store._path(last_index, last_term)
+        os.replace(self.tmp_path, path)
+        _fsync_dir(self.store.snapshot_dir)
+        self.store._prune(path)
+        return path
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
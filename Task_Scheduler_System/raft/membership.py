@@ -0,0 +1,109 @@
+import json
+import threading
+
+# Log entries carrying a cluster configuration: "CONFIG {"voters": [...], "learners": [...]}"
+CONFIG_PREFIX = "CONFIG "
+
+
+def node_id_of(address):
+    """Node id of a raft address ("raft_node3:50053" -> "node3")"""
+    return address.split(":")[0].replace("raft_", "")
+
+
+def is_config_command(command):
+    return isinstance(command, str) and command.startswith(CONFIG_PREFIX)
+
+
+class ClusterConfig:
+    """Voting members and non-voting learners, by raft address"""
+
+    def __init__(self, voters, learners=()):
+        self.voters = list(voters)
+        self.learners = [address for address in learners if address not in self.voters]
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state.get("voters", []), state.get("learners", []))
+
+    @classmethod
+    def from_command(cls, command):
+        """ValueError if the entry does not hold {"voters": [address, ...], "learners": [...]}"""
+        state = json.loads(command[len(CONFIG_PREFIX):])
+        if not isinstance(state, dict):
+            raise ValueError("malformed CONFIG entry")
+        for field in ("voters", "learners"):
+            addresses = state.get(field, [])
+            if not isinstance(addresses, list) or not all(isinstance(address, str) for address in addresses):
+                raise ValueError(f"malformed CONFIG entry: bad {field}")
+        return cls.from_dict(state)
+
+    def to_dict(self):
+        return {"voters": self.voters, "learners": self.learners}
+
+    def to_command(self):
+        return CONFIG_PREFIX + json.dumps(self.to_dict(), sort_keys=True)
+
+    def members(self):
+        return self.voters + self.learners
+
+    def majority(self):
+        return (len(self.voters) // 2) + 1
+
+    def is_voter(self, node_id):
+        return any(node_id_of(address) == node_id for address in self.voters)
+
+
+class Membership:
+    """Configuration a node uses: the one in its latest CONFIG log entry, committed or not.
+
+    Changes are single-server (one voter added or removed per entry), so any two
+    consecutive configurations have overlapping majorities. A configuration is used as
+    soon as its entry is in the log; if the entry is truncated away (it came from a
+    deposed leader) the previous configuration applies again.
+    """
+
+    def __init__(self, bootstrap):
+        self.bootstrap = bootstrap  # from ALL_NODE_IDS, used until the log holds a CONFIG entry
+        self.base = bootstrap
+        self.entries = []  # (index, ClusterConfig) of the CONFIG entries in the log
+        self.lock = threading.Lock()
+
+    def current(self):
+        with self.lock:
+            return self.entries[-1][1] if self.entries else self.base
+
+    def latest_index(self):
+        """Log index of the configuration in use (0 if it predates the log)"""
+        with self.lock:
+            return self.entries[-1][0] if self.entries else 0
+
+    def is_voter(self, node_id):
+        return self.current().is_voter(node_id)
+
+    def reset(self, base, entries):
+        """base: configuration as of the snapshot (None: bootstrap); entries: (index, command) after it"""
+        with self.lock:
+            self.base = ClusterConfig.from_dict(base) if base else self.bootstrap
+            self.entries = _parsed(entries)
+
+    def appended(self, index, command):
+        with self.lock:
+            self.entries += _parsed([(index, command)])
+
+    def truncated(self, index):
+        """Log entries from index on were removed"""
+        with self.lock:
+            while self.entries and self.entries[-1][0] >= index:
+                self.entries.pop()
+
+
+def _parsed(entries):
+    """(index, ClusterConfig) of (index, command) CONFIG entries; a malformed one never takes
+    effect (the state machine applies it as INVALID)"""
+    configs = []
+    for index, command in entries:
+        try:
+            configs.append((index, ClusterConfig.from_command(command)))
+        except ValueError:
+            print(f" Ignoring malformed configuration entry at index {index}")
+    return configs
@@ -1,119 +1,406 @@
 import grpc
+import itertools
+import json
 import os
-import time
+import queue
 import socket
 import threading
-from concurrent import futures
 
 import raft_pb2
 import raft_pb2_grpc
+from diagnostics import DiagnosticsServer
 from election import ElectionManager
 from log_replication import LogReplicationManager
+from log_storage import SegmentedLog, SnapshotStore
+from membership import ClusterConfig, Membership, node_id_of
+from scheduler import TimerScheduler
+from sharding import group_for_command, group_for_read, is_cross_group_read
+from state_machine import TaskSchedulerStateMachine
+from transport import ChannelPool
+
+# Metadata key set on requests a follower forwards to the leader, so they are never forwarded twice
+FORWARDED_HEADER = "x-raft-forwarded-by"
+# Metadata key pinning a forwarded Read to one group (per-group leg of a cross-group read)
+GROUP_HEADER = "x-raft-group"
+# RAFT_COMPRESSION values
+COMPRESSION = {"gzip": grpc.Compression.Gzip, "deflate": grpc.Compression.Deflate, "none": None}
+
+
+def operation_of(request):
+    """ClientRequest / StreamRequest operation: the binary payload if set, else the text"""
+    return request.payload or request.operation
+
+
+def value_fields(value):
+    """ReadResponse fields for a state machine value (binary values go in payload)"""
+    return {"payload": value} if isinstance(value, bytes) else {"value": value}
 
 
 class RaftService(raft_pb2_grpc.RaftServicer):
-    #gRPC Service Implementation for Raft RPCs
+    #gRPC Service Implementation for Raft RPCs, dispatched to the request's group
 
-    def __init__(self, election_mgr, log_replicator):
-        self.election_mgr = election_mgr
-        self.log_replicator = log_replicator
+    def __init__(self, groups):
+        self.groups = groups  # group_id -> LogReplicationManager
+
+    def _group(self, group_id, context):
+        log_replicator = self.groups.get(group_id)
+        if log_replicator is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown Raft group {group_id}")
+        return log_replicator
 
     def RequestVote(self, request, context):
-        return self.election_mgr.handle_vote_request(request)
+        return self._group(request.group_id, context).election_mgr.handle_vote_request(request)
+
+    def PreVote(self, request, context):
+        return self._group(request.group_id, context).election_mgr.handle_pre_vote(request)
+
+    def TimeoutNow(self, request, context):
+        return self._group(request.group_id, context).election_mgr.handle_timeout_now(request)
 
     def AppendEntries(self, request, context):
-        if len(request.entries) == 0:
-            return self.election_mgr.handle_heartbeat(request) # Heartbeat
+        log_replicator = self._group(request.group_id, context)
+        if len(request.entries) == 0 and request.prev_log_index == 0:
+            return log_replicator.election_mgr.handle_heartbeat(request) # Heartbeat
         else:
-            return self.log_replicator.handle_append_entries(request) # Log replication
+            return log_replicator.handle_append_entries(request) # Log replication / consistency probe
+
+    def InstallSnapshot(self, request_iterator, context):
+        # The group is only known once the first chunk has arrived
+        first = next(request_iterator, None)
+        if first is None:
+            return raft_pb2.InstallSnapshotResponse(term=0, success=False)
+        log_replicator = self._group(first.group_id, context)
+        return log_replicator.handle_install_snapshot(itertools.chain([first], request_iterator))
 
 
 class RaftClientService(raft_pb2_grpc.RaftClientServicer):
-    #gRPC Service for client operations
+    #gRPC Service for client operations; each one is routed to the group owning its key
     
-    def __init__(self, node_id, election_mgr, log_replicator, all_nodes):
+    FORWARD_TIMEOUT = 5
+    LEADER_CHECK_INTERVAL = 0.02  # how often a forwarded call checks whether the leader changed
+    
+    def __init__(self, node_id, groups, all_nodes, stream_ack_timeout=10, channels=None):
         self.node_id = node_id
-        self.election_mgr = election_mgr
-        self.log_replicator = log_replicator
+        self.groups = groups  # group_id -> LogReplicationManager
         self.all_nodes = all_nodes
+        self.stream_ack_timeout = stream_ack_timeout
+        # Forwarding to leaders: client addresses by node id and stubs over pooled channels
+        self.channels = channels or ChannelPool()
+        self.client_addresses = {}
+        self.client_stubs = {}
+    
+    def _route_command(self, operation):
+        return self.groups[group_for_command(operation, len(self.groups))]
+    
+    def _route_read(self, key):
+        return self.groups[group_for_read(key, len(self.groups))]
     
     def SubmitOperation(self, request, context):
         #Handle client operation submission
         print(f"\n Node {self.node_id}: Received client request")
-        print(f"   Operation: {request.operation}")
+        operation = operation_of(request)
+        print(f"   Operation: {operation if isinstance(operation, str) else f'<{len(operation)} bytes>'}")
         print(f"   Client ID: {request.client_id}")
         
-        #if not leader, forward to leader
-        if self.election_mgr.role != "leader":
-            leader_id = self._find_leader()
-            
-            if leader_id and leader_id != self.node_id:
-                print(f" Node {self.node_id}: Not leader, forwarding to {leader_id}")
-                return self._forward_to_leader(request, leader_id)
-            else:
-                return raft_pb2.ClientResponse(
-                    success=False,
-                    message="No leader currently available",
-                    leader_id=""
-                )
+        log_replicator = self._route_command(operation)
+        
+        #if not leader of the key's group, forward to its leader (or tell the client where it is)
+        if log_replicator.election_mgr.role != "leader":
+            return self._redirect(request, context, log_replicator, "SubmitOperation", raft_pb2.ClientResponse)
         
         # Process as leader
-        print(f" Node {self.node_id}: Processing as leader")
-        success, message, leader = self.log_replicator.append_entry(
-            request.operation,
-            request.client_id
+        print(f" {log_replicator.group_tag}Node {self.node_id}: Processing as leader")
+        success, message, leader, result, index = log_replicator.append_entry(
+            operation,
+            request.client_id,
+            sequence=request.sequence
         )
         
         return raft_pb2.ClientResponse(
             success=success,
             message=message,
-            leader_id=leader
+            leader_id=leader,
+            result=result,
+            index=index
         )
     
-    def _find_leader(self):
-        """Try to find current leader"""
-        if self.election_mgr.voted_for and self.election_mgr.voted_for != self.node_id:
-            return self.election_mgr.voted_for
+    def Read(self, request, context):
+        """Linearizable read of a key (ReadIndex / leader lease on the leader)"""
+        pinned = dict(context.invocation_metadata()).get(GROUP_HEADER)
+        if pinned is not None:
+            try:
+                log_replicator = self.groups.get(int(pinned))
+            except ValueError:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid {GROUP_HEADER} {pinned!r}")
+            if log_replicator is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown Raft group {pinned}")
+        elif is_cross_group_read(request.key) and len(self.groups) > 1:
+            return self._read_all_groups(request)
+        else:
+            log_replicator = self._route_read(request.key)
         
-        for peer in self.all_nodes:
-            peer_id = peer.split(":")[0].replace("raft_", "")
-            if peer_id == self.node_id:
-                continue
-            
+        # Bounded staleness: served from this node's applied state if fresh enough
+        # (a pinned read is one leg of a cross-group read, where min_index does not apply)
+        served = self._read_stale(log_replicator, request, request.min_index if pinned is None else 0)
+        if served is not None:
+            return served
+        
+        if log_replicator.election_mgr.role != "leader":
+            return self._redirect(request, context, log_replicator, "Read", raft_pb2.ReadResponse)
+        
+        success, value, found, message, read_index = log_replicator.read(request.key)
+        return raft_pb2.ReadResponse(
+            success=success,
+            found=found,
+            message=message,
+            leader_id=self.node_id,
+            read_index=read_index,
+            **value_fields(value)
+        )
+    
+    def _read_all_groups(self, request):
+        """"tasks:<STATUS>" spans every group: one read per group (locally or on that group's
+        leader; bounded-staleness reads locally when fresh enough), and the task id lists are merged"""
+        task_ids = []
+        for group_id, log_replicator in self.groups.items():
+            # min_index is per group, so only max_staleness_ms applies across groups
+            served = self._read_stale(log_replicator, request, 0)
+            if served is not None:
+                success, value, message = served.success, served.value, served.message
+            elif log_replicator.election_mgr.role == "leader":
+                success, value, _, message, _ = log_replicator.read(request.key)
+            else:
+                leader_id = log_replicator.election_mgr.leader_id or ""
+                response = self._forward_to_leader(request, log_replicator, leader_id, "Read",
+                                                   raft_pb2.ReadResponse, group_id)
+                success, value, message = response.success, response.value, response.message
+            if not success:
+                return raft_pb2.ReadResponse(success=False, message=f"Group {group_id}: {message}",
+                                             leader_id=self.node_id)
+            task_ids.extend(json.loads(value))
+        
+        return raft_pb2.ReadResponse(
+            success=True,
+            value=json.dumps(sorted(task_ids)),
+            found=True,
+            message="OK",
+            leader_id=self.node_id
+        )
+    
+    def _read_stale(self, log_replicator, request, min_index):
+        """ReadResponse for a bounded-staleness read this node can serve itself, else None"""
+        if min_index <= 0 and request.max_staleness_ms <= 0:
+            return None
+        max_staleness = request.max_staleness_ms / 1000.0 if request.max_staleness_ms > 0 else None
+        served = log_replicator.read_stale(request.key, min_index, max_staleness)
+        if served is None:
+            return None
+        success, value, found, message, applied_index = served
+        return raft_pb2.ReadResponse(
+            success=success,
+            found=found,
+            message=message,
+            leader_id=log_replicator.election_mgr.leader_id or "",
+            read_index=applied_index,
+            **value_fields(value)
+        )
+    
+    def GetLeader(self, request, context):
+        """Cheap leader lookup: answered from local state, never touches the log"""
+        log_replicator = self.groups.get(request.group_id)
+        if log_replicator is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown Raft group {request.group_id}")
+        election_mgr = log_replicator.election_mgr
+        leader_id = election_mgr.leader_id or ""
+        config = log_replicator.membership.current()
+        return raft_pb2.LeaderInfo(
+            node_id=self.node_id,
+            role=election_mgr.role,
+            term=election_mgr.current_term,
+            leader_id=leader_id,
+            leader_address=self._client_address(leader_id) or "",
+            commit_index=log_replicator.commit_index,
+            last_applied=log_replicator.last_applied,
+            group_id=request.group_id,
+            num_groups=len(self.groups),
+            voters=config.voters,
+            learners=config.learners
+        )
+    
+    def SubmitStream(self, request_iterator, context):
+        """Pipelined submissions: every request is proposed as soon as it arrives and acked
+        when its entry is applied, so acks can overtake each other. Only the leader of an
+        operation's group accepts it; other nodes ack it with NOT_LEADER and a leader hint."""
+        acks = queue.Queue()
+        outstanding = {}  # correlation_id -> group's LogReplicationManager
+        outstanding_lock = threading.Lock()
+        
+        def make_callback(correlation_id, log_replicator):
+            def on_done(success, message, result, index):
+                acks.put(raft_pb2.StreamResponse(
+                    correlation_id=correlation_id,
+                    success=success,
+                    message=message,
+                    result=result,
+                    index=index,
+                    leader_id=log_replicator.leader_hint()
+                ))
+            return on_done
+        
+        def read_requests():
             try:
-                host, port = peer.split(":")
-                client_port = str(int(port) + 90)  # Client port offset
-                with grpc.insecure_channel(f"{host}:{client_port}") as channel:
-                    stub = raft_pb2_grpc.RaftClientStub(channel)
-                    response = stub.SubmitOperation(
-                        raft_pb2.ClientRequest(operation="ping", client_id="test"),
-                        timeout=1
-                    )
-                    if response.leader_id:
-                        return response.leader_id
-            except:
+                for request in request_iterator:
+                    operation = operation_of(request)
+                    log_replicator = self._route_command(operation)
+                    with outstanding_lock:
+                        outstanding[request.correlation_id] = log_replicator
+                    log_replicator.propose(operation, make_callback(request.correlation_id, log_replicator),
+                                           client_id=request.client_id, sequence=request.sequence)
+            except grpc.RpcError:
+                pass  # client went away
+            finally:
+                acks.put(None)
+        
+        print(f" Node {self.node_id}: Client submission stream opened")
+        threading.Thread(target=read_requests, daemon=True).start()
+        
+        input_done = False
+        while context.is_active():
+            with outstanding_lock:
+                if input_done and not outstanding:
+                    break
+            try:
+                ack = acks.get(timeout=self.stream_ack_timeout)
+            except queue.Empty:
+                if not input_done:
+                    continue
+                break  # remaining entries never committed (e.g. lost leadership)
+            
+            if ack is None:
+                input_done = True
                 continue
+            with outstanding_lock:
+                outstanding.pop(ack.correlation_id, None)
+            yield ack
         
-        return None
+        with outstanding_lock:
+            remaining = sorted(outstanding.items())
+        for correlation_id, log_replicator in remaining:
+            yield raft_pb2.StreamResponse(
+                correlation_id=correlation_id,
+                success=False,
+                message="Timed out waiting for commit",
+                leader_id=log_replicator.election_mgr.leader_id or ""
+            )
     
-    def _forward_to_leader(self, request, leader_id):
-        """Forward client request to leader"""
-        for peer in self.all_nodes:
-            if leader_id in peer:
-                try:
-                    host, port = peer.split(":")
-                    client_port = str(int(port) + 90)
-                    with grpc.insecure_channel(f"{host}:{client_port}") as channel:
-                        stub = raft_pb2_grpc.RaftClientStub(channel)
-                        return stub.SubmitOperation(request, timeout=5)
-                except Exception as e:
-                    print(f" Failed to forward to leader: {e}")
+    def TransferLeadership(self, request, context):
+        """Admin: move leadership of one group to request.target_id (or the most caught-up follower)"""
+        print(f"\n Node {self.node_id}: Received leadership transfer request "
+              f"(group: {request.group_id}, target: {request.target_id or 'auto'})")
+        log_replicator = self.groups.get(request.group_id)
+        if log_replicator is None:
+            return raft_pb2.TransferResponse(success=False, message=f"Unknown Raft group {request.group_id}")
+        if log_replicator.election_mgr.role != "leader":
+            return self._redirect(request, context, log_replicator, "TransferLeadership", raft_pb2.TransferResponse)
         
-        return raft_pb2.ClientResponse(
-            success=False,
-            message=f"Failed to contact leader {leader_id}",
-            leader_id=leader_id
+        success, message, leader_id = log_replicator.transfer_leadership(request.target_id)
+        print(f" {log_replicator.group_tag}Node {self.node_id}: {message}")
+        return raft_pb2.TransferResponse(success=success, message=message, leader_id=leader_id)
+    
+    def ChangeMembership(self, request, context):
+        """Admin: single-server membership change of one group"""
+        print(f"\n Node {self.node_id}: Received membership change {request.action} {request.address} "
+              f"(group: {request.group_id})")
+        log_replicator = self.groups.get(request.group_id)
+        if log_replicator is None:
+            return raft_pb2.MembershipResponse(success=False, message=f"Unknown Raft group {request.group_id}")
+        if log_replicator.election_mgr.role != "leader":
+            return self._redirect(request, context, log_replicator, "ChangeMembership", raft_pb2.MembershipResponse)
+        
+        success, message, leader_id = log_replicator.change_membership(request.action, request.address)
+        print(f" {log_replicator.group_tag}Node {self.node_id}: {message}")
+        config = log_replicator.membership.current()
+        return raft_pb2.MembershipResponse(
+            success=success,
+            message=message,
+            leader_id=leader_id,
+            voters=config.voters,
+            learners=config.learners
         )
+    
+    def _redirect(self, request, context, log_replicator, method, response_type):
+        """Follower path: forward once to the group's known leader, or answer NOT_LEADER with a hint"""
+        leader_id = log_replicator.election_mgr.leader_id
+        forwarded = any(key == FORWARDED_HEADER for key, _ in context.invocation_metadata())
+        
+        if not leader_id or leader_id == self.node_id:
+            return response_type(success=False, message="NOT_LEADER", leader_id="")
+        
+        # Clients that handle redirects themselves, and requests already forwarded once
+        # (our view of the leader may be stale), get the hint instead of another hop
+        if request.redirect or forwarded:
+            return response_type(success=False, message="NOT_LEADER", leader_id=leader_id)
+        
+        print(f" Node {self.node_id}: Not leader, forwarding to {leader_id}")
+        return self._forward_to_leader(request, log_replicator, leader_id, method, response_type)
+    
+    def _client_address(self, node_id):
+        """Client-port address of a node (raft port + 90), including nodes added at runtime"""
+        address = self.client_addresses.get(node_id)
+        if address is not None:
+            return address
+        peers = list(self.all_nodes)
+        for log_replicator in self.groups.values():
+            peers.extend(log_replicator.membership.current().members())
+        for peer in peers:
+            host, port = peer.split(":")
+            if node_id_of(peer) == node_id:
+                address = self.client_addresses[node_id] = f"{host}:{int(port) + 90}"
+                return address
+        return None
+    
+    def _client_stub(self, address):
+        stub = self.client_stubs.get(address)
+        if stub is None:
+            stub = self.client_stubs[address] = raft_pb2_grpc.RaftClientStub(self.channels.get(address))
+        return stub
+    
+    def _forward_to_leader(self, request, log_replicator, leader_id, method, response_type, group_id=None):
+        """Forward client request to leader (pinned to group_id if given).
+        
+        Forwarded calls from all clients share one pooled channel to the leader, so they
+        are pipelined over its connection instead of each dialing a new one. If this node
+        sees leadership move while the call is in flight, the call is cancelled and the
+        client gets NOT_LEADER with the new leader hint rather than waiting it out.
+        """
+        address = self._client_address(leader_id)
+        if address is None:
+            return response_type(success=False, message=f"Unknown leader address for {leader_id}",
+                                 leader_id=leader_id)
+        metadata = [(FORWARDED_HEADER, self.node_id)]
+        if group_id is not None:
+            metadata.append((GROUP_HEADER, str(group_id)))
+        
+        election_mgr = log_replicator.election_mgr
+        term = election_mgr.current_term
+        call = getattr(self._client_stub(address), method).future(request, timeout=self.FORWARD_TIMEOUT,
+                                                                 metadata=metadata)
+        while True:
+            try:
+                return call.result(timeout=self.LEADER_CHECK_INTERVAL)
+            except grpc.FutureTimeoutError:
+                if election_mgr.leader_id != leader_id or election_mgr.current_term != term:
+                    call.cancel()
+                    print(f" Node {self.node_id}: Leader changed while forwarding to {leader_id}")
+                    return response_type(success=False, message="NOT_LEADER",
+                                         leader_id=log_replicator.leader_hint())
+            except grpc.RpcError as e:
+                print(f" Failed to forward to leader: {e.code()}")
+                return response_type(
+                    success=False,
+                    message=f"Failed to contact leader {leader_id}",
+                    leader_id=log_replicator.leader_hint()
+                )
 
 
 def serve():
@@ -124,50 +411,146 @@ def serve():
     
     all_nodes_str = os.environ.get("ALL_NODE_IDS", "")
     all_nodes = [n.strip() for n in all_nodes_str.split(",") if n.strip()]
+    data_dir = os.environ.get("DATA_DIR", os.path.join("data", node_id))
+    segment_bytes = int(os.environ.get("RAFT_SEGMENT_BYTES", SegmentedLog.DEFAULT_SEGMENT_BYTES))
+    log_cache_bytes = int(os.environ.get("RAFT_LOG_CACHE_BYTES", SegmentedLog.DEFAULT_CACHE_BYTES))
+    snapshot_threshold = int(os.environ.get("RAFT_SNAPSHOT_THRESHOLD", "1000"))
+    snapshot_chunk_bytes = int(os.environ.get("RAFT_SNAPSHOT_CHUNK_BYTES", str(1024 * 1024)))
+    max_append_entries = int(os.environ.get("RAFT_MAX_APPEND_ENTRIES", "512"))
+    max_append_bytes = int(os.environ.get("RAFT_MAX_APPEND_BYTES", str(1024 * 1024)))
+    max_inflight = int(os.environ.get("RAFT_MAX_INFLIGHT", "4"))
+    lease_reads = os.environ.get("RAFT_LEASE_READS", "false").lower() in ("1", "true", "yes")
+    lease_ms = int(os.environ.get("RAFT_LEASE_MS", "1000"))
+    apply_batch_size = int(os.environ.get("RAFT_APPLY_BATCH", "256"))
+    heartbeat_ms = int(os.environ.get("RAFT_HEARTBEAT_MS", "1000"))
+    pre_vote = os.environ.get("RAFT_PRE_VOTE", "true").lower() in ("1", "true", "yes")
+    check_quorum = os.environ.get("RAFT_CHECK_QUORUM", "true").lower() in ("1", "true", "yes")
+    num_groups = int(os.environ.get("RAFT_GROUPS", "1"))
+    # Client sessions are replicated state: these must be the same on every node
+    max_sessions = int(os.environ.get("RAFT_MAX_SESSIONS", "10000"))
+    session_ttl_s = int(os.environ.get("RAFT_SESSION_TTL_S", "3600"))
+    # Wire compression of AppendEntries batches / snapshot transfers at least this large
+    compression = COMPRESSION[os.environ.get("RAFT_COMPRESSION", "gzip").lower()]
+    compress_min_bytes = int(os.environ.get("RAFT_COMPRESS_MIN_BYTES", "4096"))
+    # Max worker claims / lease heartbeats combined into one TASK_BATCH log entry
+    task_batch_ops = int(os.environ.get("RAFT_TASK_BATCH_OPS", "1024"))
+    # Client RPC threads; a waiting SubmitOperation (e.g. a worker's claim) holds one
+    client_threads = int(os.environ.get("RAFT_CLIENT_THREADS", "10"))
+    # A joining node starts without a configuration: it neither votes nor campaigns until
+    # the leader adds it (as a learner, then promotes it) through ChangeMembership
+    join = os.environ.get("RAFT_JOIN", "false").lower() in ("1", "true", "yes")
+    # Local HTTP diagnostics endpoint (RPC timings, pools, locks, profiler); 0 disables it
+    diag_host = os.environ.get("DIAG_HOST", "127.0.0.1")
+    diag_port = int(os.environ.get("DIAG_PORT", str(int(client_port) + 1000)))
 
     print(f" Node {node_id}: Initializing...")
     print(f"   Raft Port: {port}")
     print(f"   Client Port: {client_port}")
     print(f"   Peers: {all_nodes}")
+    print(f"   Data Dir: {data_dir}")
+    print(f"   Raft Groups: {num_groups}")
+    if join:
+        print("   Joining an existing cluster (waiting to be added)")
+
+    # One scheduler thread drives every timer (election timeouts, heartbeats) of every group
+    scheduler = TimerScheduler()
+    scheduler.start()
+    
+    # One channel per peer, shared by every group
+    channels = ChannelPool()
+
+    # Multi-Raft: num_groups independent groups, each with its own log, snapshots, hard
+    # state and state machine. Group 0 keeps the single-group layout of data_dir
+    groups = {}
+    log_stores = []
+    for group_id in range(num_groups):
+        group_dir = data_dir if group_id == 0 else os.path.join(data_dir, f"group-{group_id}")
+        group_tag = f"[g{group_id}] " if num_groups > 1 else ""
+        
+        # Durable log (survives restarts, so a rejoining node only needs the missing suffix)
+        log_store = SegmentedLog(os.path.join(group_dir, "log"), segment_bytes=segment_bytes,
+                                 cache_bytes=log_cache_bytes)
+        log_stores.append(log_store)
+        print(f" {group_tag}Node {node_id}: Recovered log up to index {log_store.last_index()} (term {log_store.last_term()})")
+
+        # Initialize managers; membership starts from ALL_NODE_IDS, later CONFIG log entries override it
+        membership = Membership(ClusterConfig([] if join else all_nodes))
+        election_mgr = ElectionManager(node_id=node_id, membership=membership, port=port,
+                                       data_dir=group_dir, log_store=log_store, scheduler=scheduler,
+                                       pre_vote=pre_vote, group_id=group_id, channels=channels,
+                                       group_tag=group_tag)
+        groups[group_id] = LogReplicationManager(
+            node_id, membership, election_mgr, log_store,
+            snapshot_store=SnapshotStore(os.path.join(group_dir, "snapshot")),
+            state_machine=TaskSchedulerStateMachine(max_sessions, session_ttl_s * 1000),
+            scheduler=scheduler,
+            snapshot_threshold=snapshot_threshold,
+            snapshot_chunk_bytes=snapshot_chunk_bytes,
+            max_append_entries=max_append_entries,
+            max_append_bytes=max_append_bytes,
+            max_inflight=max_inflight,
+            lease_reads=lease_reads,
+            lease_duration=lease_ms / 1000.0,
+            apply_batch_size=apply_batch_size,
+            heartbeat_interval=heartbeat_ms / 1000.0,
+            check_quorum=check_quorum,
+            group_id=group_id,
+            channels=channels,
+            group_tag=group_tag,
+            compression=compression,
+            compress_min_bytes=compress_min_bytes,
+            task_batch_ops=task_batch_ops
+        )
 
-    # Initialize managers
-    election_mgr = ElectionManager(node_id=node_id, all_nodes=all_nodes, port=port)
-    log_replicator = LogReplicationManager(node_id, all_nodes, election_mgr)
+    diagnostics = DiagnosticsServer()
+    for group_id, log_replicator in groups.items():
+        diagnostics.add_lock(f"g{group_id}.log_lock", log_replicator.log_lock)
+        diagnostics.add_lock(f"g{group_id}.vote_lock", log_replicator.election_mgr.vote_lock)
 
-    # Start gRPC servers
-    raft_server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # Start gRPC servers (shared by all groups; RPCs are dispatched on group_id)
+    raft_server = grpc.server(diagnostics.thread_pool("raft-rpc", max_workers=10 * num_groups),
+                              interceptors=[diagnostics.rpc_timer])
     raft_pb2_grpc.add_RaftServicer_to_server(
-        RaftService(election_mgr, log_replicator),
+        RaftService(groups),
         raft_server
     )
     raft_server.add_insecure_port(f"[::]:{port}")
     raft_server.start()
     
-    client_server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    client_server = grpc.server(diagnostics.thread_pool("client-rpc", max_workers=client_threads),
+                                interceptors=[diagnostics.rpc_timer])
     raft_pb2_grpc.add_RaftClientServicer_to_server(
-        RaftClientService(node_id, election_mgr, log_replicator, all_nodes),
+        RaftClientService(node_id, groups, all_nodes, channels=channels),
         client_server
     )
     client_server.add_insecure_port(f"[::]:{client_port}")
     client_server.start()
 
     print(f" Node {node_id}: Raft node started")
+    if diagnostics.start(diag_host, diag_port):
+        print(f"   Diagnostics: http://{diag_host}:{diag_port}/stats")
 
     # Background threads
-    election_thread = threading.Thread(target=election_mgr.start_election_loop, daemon=True)
-    election_thread.start()
+    for log_replicator in groups.values():
+        election_thread = threading.Thread(target=log_replicator.election_mgr.start_election_loop, daemon=True)
+        election_thread.start()
 
-    replication_thread = threading.Thread(target=log_replicator.replicate_to_followers, daemon=True)
-    replication_thread.start()
+        # Apply, proposal and follower sender threads
+        log_replicator.start()
 
     try:
-        while True:
-            time.sleep(1)
+        raft_server.wait_for_termination()
     except KeyboardInterrupt:
         print(f" Node {node_id}: Shutting down...")
-        election_mgr.stop()
+        for log_replicator in groups.values():
+            log_replicator.election_mgr.stop()
+        scheduler.stop()
+        diagnostics.stop()
         raft_server.stop(0)
         client_server.stop(0)
+        channels.close()
+        for log_store in log_stores:
+            log_store.close()
 
 
 if __name__ == "__main__":
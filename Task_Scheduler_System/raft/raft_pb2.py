@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
 # source: raft.proto
-# Protobuf Python Version: 4.25.0
+# Protobuf Python Version: 5.27.2
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
 from google.protobuf import symbol_database as _symbol_database
 from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    27,
+    2,
+    '',
+    'raft.proto'
+)
 # @@protoc_insertion_point(imports)
 
 _sym_db = _symbol_database.Default()
@@ -14,29 +24,57 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nraft.proto\"1\n\x0bVoteRequest\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x14\n\x0c\x63\x61ndidate_id\x18\x02 \x01(\t\"2\n\x0cVoteResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x14\n\x0cvote_granted\x18\x02 \x01(\x08\"8\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\t\x12\r\n\x05index\x18\x03 \x01(\x05\"\x99\x01\n\x14\x41ppendEntriesRequest\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x1a\n\x07\x65ntries\x18\x03 \x03(\x0b\x32\t.LogEntry\x12\x16\n\x0eprev_log_index\x18\x04 \x01(\x05\x12\x15\n\rprev_log_term\x18\x05 \x01(\x05\x12\x15\n\rleader_commit\x18\x06 \x01(\x05\"K\n\x15\x41ppendEntriesResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x13\n\x0bmatch_index\x18\x03 \x01(\x05\"5\n\rClientRequest\x12\x11\n\toperation\x18\x01 \x01(\t\x12\x11\n\tclient_id\x18\x02 \x01(\t\"E\n\x0e\x43lientResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tleader_id\x18\x03 \x01(\t2r\n\x04Raft\x12*\n\x0bRequestVote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12>\n\rAppendEntries\x12\x15.AppendEntriesRequest\x1a\x16.AppendEntriesResponse2@\n\nRaftClient\x12\x32\n\x0fSubmitOperation\x12\x0e.ClientRequest\x1a\x0f.ClientResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nraft.proto\"\x8f\x01\n\x0bVoteRequest\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x14\n\x0c\x63\x61ndidate_id\x18\x02 \x01(\t\x12\x16\n\x0elast_log_index\x18\x03 \x01(\x05\x12\x15\n\rlast_log_term\x18\x04 \x01(\x05\x12\x1b\n\x13leadership_transfer\x18\x05 \x01(\x08\x12\x10\n\x08group_id\x18\x06 \x01(\x05\"2\n\x0cVoteResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x14\n\x0cvote_granted\x18\x02 \x01(\x08\"I\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\t\x12\r\n\x05index\x18\x03 \x01(\x05\x12\x0f\n\x07payload\x18\x04 \x01(\x0c\"\xab\x01\n\x14\x41ppendEntriesRequest\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x1a\n\x07\x65ntries\x18\x03 \x03(\x0b\x32\t.LogEntry\x12\x16\n\x0eprev_log_index\x18\x04 \x01(\x05\x12\x15\n\rprev_log_term\x18\x05 \x01(\x05\x12\x15\n\rleader_commit\x18\x06 \x01(\x05\x12\x10\n\x08group_id\x18\x07 \x01(\x05\"z\n\x15\x41ppendEntriesResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x13\n\x0bmatch_index\x18\x03 \x01(\x05\x12\x15\n\rconflict_term\x18\x04 \x01(\x05\x12\x16\n\x0e\x63onflict_index\x18\x05 \x01(\x05\"\xae\x01\n\x14InstallSnapshotChunk\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x1b\n\x13last_included_index\x18\x03 \x01(\x05\x12\x1a\n\x12last_included_term\x18\x04 \x01(\x05\x12\x0e\n\x06offset\x18\x05 \x01(\x03\x12\x0c\n\x04\x64\x61ta\x18\x06 \x01(\x0c\x12\x0c\n\x04\x64one\x18\x07 \x01(\x08\x12\x10\n\x08group_id\x18\x08 \x01(\x05\"8\n\x17InstallSnapshotResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"j\n\rClientRequest\x12\x11\n\toperation\x18\x01 \x01(\t\x12\x11\n\tclient_id\x18\x02 \x01(\t\x12\x10\n\x08redirect\x18\x03 \x01(\x08\x12\x10\n\x08sequence\x18\x04 \x01(\x04\x12\x0f\n\x07payload\x18\x05 \x01(\x0c\"d\n\x0e\x43lientResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tleader_id\x18\x03 \x01(\t\x12\x0e\n\x06result\x18\x04 \x01(\t\x12\r\n\x05index\x18\x05 \x01(\x05\"l\n\x0bReadRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x11\n\tclient_id\x18\x02 \x01(\t\x12\x10\n\x08redirect\x18\x03 \x01(\x08\x12\x11\n\tmin_index\x18\x04 \x01(\x05\x12\x18\n\x10max_staleness_ms\x18\x05 \x01(\x05\"\x86\x01\n\x0cReadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05value\x18\x02 \x01(\t\x12\r\n\x05\x66ound\x18\x03 \x01(\x08\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x11\n\tleader_id\x18\x05 \x01(\t\x12\x12\n\nread_index\x18\x06 \x01(\x05\x12\x0f\n\x07payload\x18\x07 \x01(\x0c\"!\n\rLeaderRequest\x12\x10\n\x08group_id\x18\x01 \x01(\x05\"\xd8\x01\n\nLeaderInfo\x12\x0f\n\x07node_id\x18\x01 \x01(\t\x12\x0c\n\x04role\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x05\x12\x11\n\tleader_id\x18\x04 \x01(\t\x12\x16\n\x0eleader_address\x18\x05 \x01(\t\x12\x14\n\x0c\x63ommit_index\x18\x06 \x01(\x05\x12\x14\n\x0clast_applied\x18\x07 \x01(\x05\x12\x10\n\x08group_id\x18\x08 \x01(\x05\x12\x12\n\nnum_groups\x18\t \x01(\x05\x12\x0e\n\x06voters\x18\n \x03(\t\x12\x10\n\x08learners\x18\x0b \x03(\t\"p\n\rStreamRequest\x12\x16\n\x0e\x63orrelation_id\x18\x01 \x01(\x04\x12\x11\n\toperation\x18\x02 \x01(\t\x12\x11\n\tclient_id\x18\x03 \x01(\t\x12\x10\n\x08sequence\x18\x04 \x01(\x04\x12\x0f\n\x07payload\x18\x05 \x01(\x0c\"|\n\x0eStreamResponse\x12\x16\n\x0e\x63orrelation_id\x18\x01 \x01(\x04\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x0e\n\x06result\x18\x04 \x01(\t\x12\r\n\x05index\x18\x05 \x01(\x05\x12\x11\n\tleader_id\x18\x06 \x01(\t\"F\n\x11TimeoutNowRequest\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x10\n\x08group_id\x18\x03 \x01(\x05\"3\n\x12TimeoutNowResponse\x12\x0c\n\x04term\x18\x01 \x01(\x05\x12\x0f\n\x07success\x18\x02 \x01(\x08\"H\n\x0fTransferRequest\x12\x11\n\ttarget_id\x18\x01 \x01(\t\x12\x10\n\x08redirect\x18\x02 \x01(\x08\x12\x10\n\x08group_id\x18\x03 \x01(\x05\"G\n\x10TransferResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tleader_id\x18\x03 \x01(\t\"X\n\x11MembershipRequest\x12\x0e\n\x06\x61\x63tion\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x10\n\x08redirect\x18\x03 \x01(\x08\x12\x10\n\x08group_id\x18\x04 \x01(\x05\"k\n\x12MembershipResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tleader_id\x18\x03 \x01(\t\x12\x0e\n\x06voters\x18\x04 \x03(\t\x12\x10\n\x08learners\x18\x05 \x03(\t2\x97\x02\n\x04Raft\x12*\n\x0bRequestVote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12>\n\rAppendEntries\x12\x15.AppendEntriesRequest\x1a\x16.AppendEntriesResponse\x12\x44\n\x0fInstallSnapshot\x12\x15.InstallSnapshotChunk\x1a\x18.InstallSnapshotResponse(\x01\x12&\n\x07PreVote\x12\x0c.VoteRequest\x1a\r.VoteResponse\x12\x35\n\nTimeoutNow\x12\x12.TimeoutNowRequest\x1a\x13.TimeoutNowResponse2\xbc\x02\n\nRaftClient\x12\x32\n\x0fSubmitOperation\x12\x0e.ClientRequest\x1a\x0f.ClientResponse\x12#\n\x04Read\x12\x0c.ReadRequest\x1a\r.ReadResponse\x12(\n\tGetLeader\x12\x0e.LeaderRequest\x1a\x0b.LeaderInfo\x12\x33\n\x0cSubmitStream\x12\x0e.StreamRequest\x1a\x0f.StreamResponse(\x01\x30\x01\x12\x39\n\x12TransferLeadership\x12\x10.TransferRequest\x1a\x11.TransferResponse\x12;\n\x10\x43hangeMembership\x12\x12.MembershipRequest\x1a\x13.MembershipResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'raft_pb2', _globals)
-if _descriptor._USE_C_DESCRIPTORS == False:
-  DESCRIPTOR._options = None
-  _globals['_VOTEREQUEST']._serialized_start=14
-  _globals['_VOTEREQUEST']._serialized_end=63
-  _globals['_VOTERESPONSE']._serialized_start=65
-  _globals['_VOTERESPONSE']._serialized_end=115
-  _globals['_LOGENTRY']._serialized_start=117
-  _globals['_LOGENTRY']._serialized_end=173
-  _globals['_APPENDENTRIESREQUEST']._serialized_start=176
-  _globals['_APPENDENTRIESREQUEST']._serialized_end=329
-  _globals['_APPENDENTRIESRESPONSE']._serialized_start=331
-  _globals['_APPENDENTRIESRESPONSE']._serialized_end=406
-  _globals['_CLIENTREQUEST']._serialized_start=408
-  _globals['_CLIENTREQUEST']._serialized_end=461
-  _globals['_CLIENTRESPONSE']._serialized_start=463
-  _globals['_CLIENTRESPONSE']._serialized_end=532
-  _globals['_RAFT']._serialized_start=534
-  _globals['_RAFT']._serialized_end=648
-  _globals['_RAFTCLIENT']._serialized_start=650
-  _globals['_RAFTCLIENT']._serialized_end=714
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_VOTEREQUEST']._serialized_start=15
+  _globals['_VOTEREQUEST']._serialized_end=158
+  _globals['_VOTERESPONSE']._serialized_start=160
+  _globals['_VOTERESPONSE']._serialized_end=210
+  _globals['_LOGENTRY']._serialized_start=212
+  _globals['_LOGENTRY']._serialized_end=285
+  _globals['_APPENDENTRIESREQUEST']._serialized_start=288
+  _globals['_APPENDENTRIESREQUEST']._serialized_end=459
+  _globals['_APPENDENTRIESRESPONSE']._serialized_start=461
+  _globals['_APPENDENTRIESRESPONSE']._serialized_end=583
+  _globals['_INSTALLSNAPSHOTCHUNK']._serialized_start=586
+  _globals['_INSTALLSNAPSHOTCHUNK']._serialized_end=760
+  _globals['_INSTALLSNAPSHOTRESPONSE']._serialized_start=762
+  _globals['_INSTALLSNAPSHOTRESPONSE']._serialized_end=818
+  _globals['_CLIENTREQUEST']._serialized_start=820
+  _globals['_CLIENTREQUEST']._serialized_end=926
+  _globals['_CLIENTRESPONSE']._serialized_start=928
+  _globals['_CLIENTRESPONSE']._serialized_end=1028
+  _globals['_READREQUEST']._serialized_start=1030
+  _globals['_READREQUEST']._serialized_end=1138
+  _globals['_READRESPONSE']._serialized_start=1141
+  _globals['_READRESPONSE']._serialized_end=1275
+  _globals['_LEADERREQUEST']._serialized_start=1277
+  _globals['_LEADERREQUEST']._serialized_end=1310
+  _globals['_LEADERINFO']._serialized_start=1313
+  _globals['_LEADERINFO']._serialized_end=1529
+  _globals['_STREAMREQUEST']._serialized_start=1531
+  _globals['_STREAMREQUEST']._serialized_end=1643
+  _globals['_STREAMRESPONSE']._serialized_start=1645
+  _globals['_STREAMRESPONSE']._serialized_end=1769
+  _globals['_TIMEOUTNOWREQUEST']._serialized_start=1771
+  _globals['_TIMEOUTNOWREQUEST']._serialized_end=1841
+  _globals['_TIMEOUTNOWRESPONSE']._serialized_start=1843
+  _globals['_TIMEOUTNOWRESPONSE']._serialized_end=1894
+  _globals['_TRANSFERREQUEST']._serialized_start=1896
+  _globals['_TRANSFERREQUEST']._serialized_end=1968
+  _globals['_TRANSFERRESPONSE']._serialized_start=1970
+  _globals['_TRANSFERRESPONSE']._serialized_end=2041
+  _globals['_MEMBERSHIPREQUEST']._serialized_start=2043
+  _globals['_MEMBERSHIPREQUEST']._serialized_end=2131
+  _globals['_MEMBERSHIPRESPONSE']._serialized_start=2133
+  _globals['_MEMBERSHIPRESPONSE']._serialized_end=2240
+  _globals['_RAFT']._serialized_start=2243
+  _globals['_RAFT']._serialized_end=2522
+  _globals['_RAFTCLIENT']._serialized_start=2525
+  _globals['_RAFTCLIENT']._serialized_end=2841
 # @@protoc_insertion_point(module_scope)
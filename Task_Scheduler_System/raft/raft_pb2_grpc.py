@@ -1,12 +1,34 @@
 # Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
+import warnings
 
 import raft_pb2 as raft__pb2
 
+GRPC_GENERATED_VERSION = '1.66.1'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + f' but the generated code in raft_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
 
 class RaftStub(object):
-    """Missing associated documentation comment in .proto file."""
+    """Every Raft message carries the group it belongs to: a node process hosts
+    RAFT_GROUPS independent groups behind one server (group 0 when unset)
+    """
 
     def __init__(self, channel):
         """Constructor.
@@ -18,16 +40,33 @@ class RaftStub(object):
                 '/Raft/RequestVote',
                 request_serializer=raft__pb2.VoteRequest.SerializeToString,
                 response_deserializer=raft__pb2.VoteResponse.FromString,
-                )
+                _registered_method=True)
         self.AppendEntries = channel.unary_unary(
                 '/Raft/AppendEntries',
                 request_serializer=raft__pb2.AppendEntriesRequest.SerializeToString,
                 response_deserializer=raft__pb2.AppendEntriesResponse.FromString,
-                )
+                _registered_method=True)
+        self.InstallSnapshot = channel.stream_unary(
+                '/Raft/InstallSnapshot',
+                request_serializer=raft__pb2.InstallSnapshotChunk.SerializeToString,
+                response_deserializer=raft__pb2.InstallSnapshotResponse.FromString,
+                _registered_method=True)
+        self.PreVote = channel.unary_unary(
+                '/Raft/PreVote',
+                request_serializer=raft__pb2.VoteRequest.SerializeToString,
+                response_deserializer=raft__pb2.VoteResponse.FromString,
+                _registered_method=True)
+        self.TimeoutNow = channel.unary_unary(
+                '/Raft/TimeoutNow',
+                request_serializer=raft__pb2.TimeoutNowRequest.SerializeToString,
+                response_deserializer=raft__pb2.TimeoutNowResponse.FromString,
+                _registered_method=True)
 
 
 class RaftServicer(object):
-    """Missing associated documentation comment in .proto file."""
+    """Every Raft message carries the group it belongs to: a node process hosts
+    RAFT_GROUPS independent groups behind one server (group 0 when unset)
+    """
 
     def RequestVote(self, request, context):
         """Missing associated documentation comment in .proto file."""
@@ -41,6 +80,26 @@ class RaftServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def InstallSnapshot(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PreVote(self, request, context):
+        """Dry-run election for term = candidate's term + 1; the receiver changes no state
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def TimeoutNow(self, request, context):
+        """Leadership transfer: the leader tells a caught-up follower to start an election now
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RaftServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -54,15 +113,33 @@ def add_RaftServicer_to_server(servicer, server):
                     request_deserializer=raft__pb2.AppendEntriesRequest.FromString,
                     response_serializer=raft__pb2.AppendEntriesResponse.SerializeToString,
             ),
+            'InstallSnapshot': grpc.stream_unary_rpc_method_handler(
+                    servicer.InstallSnapshot,
+                    request_deserializer=raft__pb2.InstallSnapshotChunk.FromString,
+                    response_serializer=raft__pb2.InstallSnapshotResponse.SerializeToString,
+            ),
+            'PreVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.PreVote,
+                    request_deserializer=raft__pb2.VoteRequest.FromString,
+                    response_serializer=raft__pb2.VoteResponse.SerializeToString,
+            ),
+            'TimeoutNow': grpc.unary_unary_rpc_method_handler(
+                    servicer.TimeoutNow,
+                    request_deserializer=raft__pb2.TimeoutNowRequest.FromString,
+                    response_serializer=raft__pb2.TimeoutNowResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'Raft', rpc_method_handlers)
     server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('Raft', rpc_method_handlers)
 
 
  # This class is part of an EXPERIMENTAL API.
 class Raft(object):
-    """Missing associated documentation comment in .proto file."""
+    """Every Raft message carries the group it belongs to: a node process hosts
+    RAFT_GROUPS independent groups behind one server (group 0 when unset)
+    """
 
     @staticmethod
     def RequestVote(request,
@@ -75,11 +152,21 @@ class Raft(object):
             wait_for_ready=None,
             timeout=None,
             metadata=None):
-        return grpc.experimental.unary_unary(request, target, '/Raft/RequestVote',
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/RequestVote',
             raft__pb2.VoteRequest.SerializeToString,
             raft__pb2.VoteResponse.FromString,
-            options, channel_credentials,
-            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
 
     @staticmethod
     def AppendEntries(request,
@@ -92,11 +179,102 @@ class Raft(object):
             wait_for_ready=None,
             timeout=None,
             metadata=None):
-        return grpc.experimental.unary_unary(request, target, '/Raft/AppendEntries',
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/AppendEntries',
             raft__pb2.AppendEntriesRequest.SerializeToString,
             raft__pb2.AppendEntriesResponse.FromString,
-            options, channel_credentials,
-            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def InstallSnapshot(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/Raft/InstallSnapshot',
+            raft__pb2.InstallSnapshotChunk.SerializeToString,
+            raft__pb2.InstallSnapshotResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PreVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/PreVote',
+            raft__pb2.VoteRequest.SerializeToString,
+            raft__pb2.VoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def TimeoutNow(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/Raft/TimeoutNow',
+            raft__pb2.TimeoutNowRequest.SerializeToString,
+            raft__pb2.TimeoutNowResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
 
 
 class RaftClientStub(object):
@@ -113,7 +291,32 @@ class RaftClientStub(object):
                 '/RaftClient/SubmitOperation',
                 request_serializer=raft__pb2.ClientRequest.SerializeToString,
                 response_deserializer=raft__pb2.ClientResponse.FromString,
-                )
+                _registered_method=True)
+        self.Read = channel.unary_unary(
+                '/RaftClient/Read',
+                request_serializer=raft__pb2.ReadRequest.SerializeToString,
+                response_deserializer=raft__pb2.ReadResponse.FromString,
+                _registered_method=True)
+        self.GetLeader = channel.unary_unary(
+                '/RaftClient/GetLeader',
+                request_serializer=raft__pb2.LeaderRequest.SerializeToString,
+                response_deserializer=raft__pb2.LeaderInfo.FromString,
+                _registered_method=True)
+        self.SubmitStream = channel.stream_stream(
+                '/RaftClient/SubmitStream',
+                request_serializer=raft__pb2.StreamRequest.SerializeToString,
+                response_deserializer=raft__pb2.StreamResponse.FromString,
+                _registered_method=True)
+        self.TransferLeadership = channel.unary_unary(
+                '/RaftClient/TransferLeadership',
+                request_serializer=raft__pb2.TransferRequest.SerializeToString,
+                response_deserializer=raft__pb2.TransferResponse.FromString,
+                _registered_method=True)
+        self.ChangeMembership = channel.unary_unary(
+                '/RaftClient/ChangeMembership',
+                request_serializer=raft__pb2.MembershipRequest.SerializeToString,
+                response_deserializer=raft__pb2.MembershipResponse.FromString,
+                _registered_method=True)
 
 
 class RaftClientServicer(object):
@@ -126,6 +329,41 @@ class RaftClientServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Read(self, request, context):
+        """Linearizable read served by the leader without appending to the log
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetLeader(self, request, context):
+        """Who this node believes the leader is; answered locally
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SubmitStream(self, request_iterator, context):
+        """Pipelined submissions over one stream; acks come back as entries commit, in any order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def TransferLeadership(self, request, context):
+        """Admin: hand leadership to a follower (e.g. before restarting the leader)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ChangeMembership(self, request, context):
+        """Admin: add a learner, promote a learner to voter, or remove a member (one per call)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RaftClientServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -134,10 +372,36 @@ def add_RaftClientServicer_to_server(servicer, server):
                     request_deserializer=raft__pb2.ClientRequest.FromString,
                     response_serializer=raft__pb2.ClientResponse.SerializeToString,
             ),
+            'Read': grpc.unary_unary_rpc_method_handler(
+                    servicer.Read,
+                    request_deserializer=raft__pb2.ReadRequest.FromString,
+                    response_serializer=raft__pb2.ReadResponse.SerializeToString,
+            ),
+            'GetLeader': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetLeader,
+                    request_deserializer=raft__pb2.LeaderRequest.FromString,
+                    response_serializer=raft__pb2.LeaderInfo.SerializeToString,
+            ),
+            'SubmitStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.SubmitStream,
+                    request_deserializer=raft__pb2.StreamRequest.FromString,
+                    response_serializer=raft__pb2.StreamResponse.SerializeToString,
+            ),
+            'TransferLeadership': grpc.unary_unary_rpc_method_handler(
+                    servicer.TransferLeadership,
+                    request_deserializer=raft__pb2.TransferRequest.FromString,
+                    response_serializer=raft__pb2.TransferResponse.SerializeToString,
+            ),
+            'ChangeMembership': grpc.unary_unary_rpc_method_handler(
+                    servicer.ChangeMembership,
+                    request_deserializer=raft__pb2.MembershipRequest.FromString,
+                    response_serializer=raft__pb2.MembershipResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'RaftClient', rpc_method_handlers)
     server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('RaftClient', rpc_method_handlers)
 
 
  # This class is part of an EXPERIMENTAL API.
@@ -156,8 +420,153 @@ class RaftClient(object):
             wait_for_ready=None,
             timeout=None,
             metadata=None):
-        return grpc.experimental.unary_unary(request, target, '/RaftClient/SubmitOperation',
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/RaftClient/SubmitOperation',
             raft__pb2.ClientRequest.SerializeToString,
             raft__pb2.ClientResponse.FromString,
-            options, channel_credentials,
-            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Read(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/RaftClient/Read',
+            raft__pb2.ReadRequest.SerializeToString,
+            raft__pb2.ReadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetLeader(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/RaftClient/GetLeader',
+            raft__pb2.LeaderRequest.SerializeToString,
+            raft__pb2.LeaderInfo.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SubmitStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/RaftClient/SubmitStream',
+            raft__pb2.StreamRequest.SerializeToString,
+            raft__pb2.StreamResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def TransferLeadership(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/RaftClient/TransferLeadership',
+            raft__pb2.TransferRequest.SerializeToString,
+            raft__pb2.TransferResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ChangeMembership(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/RaftClient/ChangeMembership',
+            raft__pb2.MembershipRequest.SerializeToString,
+            raft__pb2.MembershipResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,122 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Timer:
+    """Handle returned by TimerScheduler.schedule(); reset() re-arms it, cancel() disarms it"""
+
+    __slots__ = ("scheduler", "callback", "interval", "deadline", "queued_at", "active")
+
+    def __init__(self, scheduler, callback, interval=None):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.interval = interval  # set for periodic timers
+        self.deadline = None
+        self.queued_at = None  # deadline of this timer's live heap entry, None if not queued
+        self.active = False
+
+    def reset(self, delay):
+        self.scheduler._arm(self, delay)
+
+    def cancel(self):
+        self.active = False
+
+
+class TimerScheduler:
+    """One thread driving every timer of a node (election timeouts, heartbeats, ...).
+
+    Timers live in a heap ordered by deadline. Pushing a deadline *later* - the
+    common case, e.g. an election timeout reset by each heartbeat - only updates
+    the handle (O(1)); the stale heap entry is re-queued at the new deadline when
+    it comes due. Callbacks run on the scheduler thread and must not block.
+
+    clock is injectable: a simulator can pass a virtual clock and call
+    run_pending() itself instead of start().
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+
+    def schedule(self, delay, callback):
+        """Run callback once after delay seconds; returns the Timer handle"""
+        timer = Timer(self, callback)
+        self._arm(timer, delay)
+        return timer
+
+    def schedule_periodic(self, interval, callback):
+        """Run callback every interval seconds until the returned Timer is cancelled"""
+        timer = Timer(self, callback, interval)
+        self._arm(timer, interval)
+        return timer
+
+    def _arm(self, timer, delay):
+        deadline = self.clock() + delay
+        with self._cond:
+            timer.deadline = deadline
+            timer.active = True
+            if timer.queued_at is None or deadline < timer.queued_at:
+                timer.queued_at = deadline
+                heapq.heappush(self._heap, (deadline, next(self._seq), timer))
+                self._cond.notify()
+
+    def _pop_due(self, now):
+        """Pop the timers whose deadline has passed (scheduler lock held)"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            queued_at, _, timer = heapq.heappop(self._heap)
+            if timer.queued_at != queued_at:
+                continue  # superseded by an earlier entry for the same timer
+            timer.queued_at = None
+            if not timer.active:
+                continue
+            if timer.deadline > now:
+                # Reset to a later deadline since it was queued: requeue lazily
+                timer.queued_at = timer.deadline
+                heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+                continue
+            if timer.interval is not None:
+                timer.deadline = timer.queued_at = now + timer.interval
+                heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+            else:
+                timer.active = False
+            due.append(timer)
+        return due
+
+    def run_pending(self):
+        """Fire every due timer; returns seconds until the next deadline (None if idle)"""
+        with self._cond:
+            due = self._pop_due(self.clock())
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception as e:
+                print(f" Timer callback failed: {e}")
+        with self._cond:
+            return self._heap[0][0] - self.clock() if self._heap else None
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while self._running:
+            self.run_pending()
+            with self._cond:
+                # Recomputed under the lock, so a timer armed meanwhile cannot be missed
+                if not self._heap:
+                    self._cond.wait()
+                else:
+                    wait = self._heap[0][0] - self.clock()
+                    if wait > 0:
+                        self._cond.wait(wait)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
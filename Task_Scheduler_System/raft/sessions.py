@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+# Log entries of client sessions: "SESSION <client_id> <sequence> <leader time ms> <command>"
+# (a binary command makes the whole entry binary)
+SESSION_PREFIX = "SESSION "
+
+
+def session_command(client_id, sequence, timestamp_ms, command):
+    header = f"{SESSION_PREFIX}{client_id} {sequence} {timestamp_ms} "
+    if isinstance(command, bytes):
+        return header.encode("utf-8") + command
+    return header + command
+
+
+def is_session_command(command):
+    prefix = SESSION_PREFIX.encode("utf-8") if isinstance(command, bytes) else SESSION_PREFIX
+    return command.startswith(prefix)
+
+
+def parse_session_command(command):
+    """(client_id, sequence, timestamp_ms, command) of a SESSION entry, None for other entries;
+    ValueError if the entry is malformed"""
+    if not is_session_command(command):
+        return None
+    separator = b" " if isinstance(command, bytes) else " "
+    fields = command[len(SESSION_PREFIX):].split(separator, 3)
+    if len(fields) != 4 or not fields[0]:
+        raise ValueError("malformed SESSION entry")
+    client_id, sequence, timestamp_ms, inner = fields
+    if isinstance(client_id, bytes):
+        client_id = client_id.decode("utf-8")  # UnicodeDecodeError is a ValueError
+    return client_id, int(sequence), int(timestamp_ms), inner  # ValueError if not integers
+
+
+class SessionTable:
+    """Per-client results of the latest sequenced commands, part of the replicated state.
+
+    A client numbers its commands 1, 2, 3, ...; a command whose (client_id, sequence)
+    was already applied is answered with the recorded result instead of being applied
+    again. Each session keeps the results of its last `results_per_session` sequence
+    numbers (enough for a pipelining client's retries). Sessions are evicted LRU once
+    there are more than max_sessions, or when idle for ttl_ms of leader time as stamped
+    in the log, so eviction is the same on every node.
+    """
+
+    def __init__(self, max_sessions=10000, ttl_ms=3600 * 1000, results_per_session=64):
+        self.max_sessions = max_sessions
+        self.ttl_ms = ttl_ms
+        self.results_per_session = results_per_session
+        self.sessions = OrderedDict()  # client_id -> {"last_active", "max_sequence", "results"}, LRU first
+
+    def lookup(self, client_id, sequence):
+        """(True, result) if the command was applied; (True, None) if it is too old to tell"""
+        session = self.sessions.get(client_id)
+        if session is None:
+            return False, None
+        if sequence in session["results"]:
+            return True, session["results"][sequence]
+        # Pipelined commands may apply out of order, so only numbers below the window are lost
+        if sequence <= session["max_sequence"] - self.results_per_session:
+            return True, None
+        return False, None
+
+    def record(self, client_id, sequence, timestamp_ms, result):
+        session = self.sessions.pop(client_id, None)
+        if session is None:
+            session = {"last_active": timestamp_ms, "max_sequence": 0, "results": {}}
+        self.sessions[client_id] = session  # most recently used
+        session["last_active"] = max(session["last_active"], timestamp_ms)
+        session["max_sequence"] = max(session["max_sequence"], sequence)
+        session["results"][sequence] = result
+        oldest_kept = session["max_sequence"] - self.results_per_session
+        for old in [seq for seq in session["results"] if seq <= oldest_kept]:
+            del session["results"][old]
+        self._evict(timestamp_ms)
+
+    def _evict(self, now_ms):
+        while self.sessions:
+            client_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and now_ms - session["last_active"] <= self.ttl_ms:
+                break
+            del self.sessions[client_id]
+
+    def to_dict(self):
+        return [[client_id, session["last_active"], session["max_sequence"],
+                 [[seq, result] for seq, result in session["results"].items()]]
+                for client_id, session in self.sessions.items()]
+
+    def restore(self, state):
+        self.sessions = OrderedDict(
+            (client_id, {"last_active": last_active, "max_sequence": max_sequence,
+                         "results": {seq: result for seq, result in results}})
+            for client_id, last_active, max_sequence, results in state or []
+        )
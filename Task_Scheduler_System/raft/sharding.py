@@ -0,0 +1,51 @@
+import zlib
+
+# Every TASK_* command and "task:<id>" read goes to this group: one queue, so any worker
+# can claim any task and priorities are ordered across all tasks
+TASK_QUEUE_GROUP = 0
+
+
+def _split(command):
+    """(upper-cased op, rest) of a command; ("", "") if empty"""
+    if isinstance(command, bytes):
+        command = command.decode("utf-8", "replace")  # binary operation: only op and key are needed
+    parts = command.strip().split(None, 1)
+    if not parts:
+        return "", ""
+    return parts[0].upper(), parts[1] if len(parts) > 1 else ""
+
+
+def command_key(command):
+    """Key a command touches: "SET k=v" / "DELETE k" -> k, "TASK_* <id> ..." -> id"""
+    op, arg = _split(command)
+    if not arg:
+        return ""
+    if op == "SET":
+        return arg.split("=", 1)[0].strip()
+    return arg.split(None, 1)[0]
+
+
+def is_cross_group_read(key):
+    """"tasks:<STATUS>" lists tasks of every group"""
+    return key.startswith("tasks:")
+
+
+def group_for_key(key, num_groups):
+    """Stable hash partitioning (crc32, identical in every process, unlike hash())"""
+    if num_groups <= 1:
+        return 0
+    return zlib.crc32(key.encode("utf-8")) % num_groups
+
+
+def group_for_command(command, num_groups):
+    """Group owning a command: the task queue group for TASK_*, else by its key"""
+    if _split(command)[0].startswith("TASK_"):
+        return TASK_QUEUE_GROUP
+    return group_for_key(command_key(command), num_groups)
+
+
+def group_for_read(key, num_groups):
+    """Group owning a read: "task:<id>" is in the task queue group, plain keys by hash"""
+    if key.startswith("task:"):
+        return TASK_QUEUE_GROUP
+    return group_for_key(key, num_groups)
@@ -0,0 +1,335 @@
+import base64
+import heapq
+import json
+import threading
+
+from membership import ClusterConfig, is_config_command
+from sessions import SessionTable, parse_session_command
+from task_queue import WORKER_OPS, parse_task_batch
+
+
+class TaskSchedulerStateMachine:
+    """Deterministic state machine that committed log entries are applied to.
+
+    Holds a key/value map plus the scheduler's task tables. Commands:
+      SET key=value | DELETE key
+      TASK_SUBMIT <task_id> <description>  (queued with priority 0, no deadline)
+      TASK_ENQUEUE <task_id> <priority> <deadline ms, 0: none> [description]
+      TASK_ASSIGN <task_id> <worker_id>
+      TASK_COMPLETE <task_id> [result] | TASK_FAIL <task_id> [reason] | TASK_CANCEL <task_id>
+      TASK_BATCH <json>  (worker claims and lease heartbeats, written by the leader, see task_queue.py)
+      CONFIG <json>  (cluster membership, written by ChangeMembership; kept for snapshots)
+      SESSION <client_id> <sequence> <time ms> <command>  (exactly-once wrapper, see sessions.py)
+
+    A command may also be binary (bytes): "SET key=" followed by a raw value, which is
+    stored as bytes; any other binary command must be valid UTF-8 and is applied as text.
+
+    Pending tasks form a work queue: a claim takes the highest priority first, then the
+    earliest deadline, then the oldest, and leases them to the worker until now + lease_ms.
+    "Now" is the leader time stamped in each TASK_BATCH (never going backwards), so
+    every node expires leases identically: a task whose lease ran out is pending again,
+    and a pending task past its deadline becomes EXPIRED.
+    """
+
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+    EXPIRED = "EXPIRED"
+
+    def __init__(self, max_sessions=10000, session_ttl_ms=3600 * 1000):
+        self.data = {}
+        self.tasks = {}
+        self.tasks_by_status = {}
+        self.tasks_by_worker = {}
+        # Work queue heaps over the task table. Entries are never removed in place: one
+        # that no longer matches its task (claimed, renewed, completed) is skipped when
+        # popped. Derived state, rebuilt from the tasks on restore
+        self.ready = []  # (-priority, deadline, seq, task_id) of PENDING tasks, in claim order
+        self.leases = []  # (lease expiry ms, task_id) of claimed tasks
+        self.deadlines = []  # (deadline ms, task_id) of PENDING tasks that have one
+        self.queue_seq = 0  # enqueue counter, the tie-break between equal priority and deadline
+        self.queue_time_ms = 0  # latest leader time applied from a TASK_BATCH
+        self.config = None  # last applied cluster configuration {"voters": [...], "learners": [...]}
+        self.sessions = SessionTable(max_sessions, session_ttl_ms)
+        self.lock = threading.Lock()
+
+    def apply(self, command):
+        """Apply one committed command; returns a result string"""
+        with self.lock:
+            return self._apply(command)
+
+    def apply_batch(self, commands):
+        """Apply a committed range under one lock acquisition; returns one result per command"""
+        with self.lock:
+            return [self._apply(command) for command in commands]
+
+    def lookup_session(self, client_id, sequence):
+        """(True, result) if the client's command was already applied (result None: no longer cached)"""
+        with self.lock:
+            return self.sessions.lookup(client_id, sequence)
+
+    def _apply(self, command):
+        try:
+            session = parse_session_command(command)
+        except ValueError:
+            return "INVALID"
+        if session is not None:
+            client_id, sequence, timestamp_ms, command = session
+            applied, result = self.sessions.lookup(client_id, sequence)
+            if applied:
+                return result if result is not None else "DUPLICATE"  # a retry that was appended again
+            result = self._apply(command)
+            self.sessions.record(client_id, sequence, timestamp_ms, result)
+            return result
+
+        if is_config_command(command):  # exactly as the leader writes it; "config ..." is not one
+            return self._apply_config(command)
+
+        if isinstance(command, bytes):
+            op, _, arg = command.partition(b" ")
+            try:
+                if op.upper() == b"SET" and b"=" in arg:
+                    key, value = arg.split(b"=", 1)
+                    self.data[key.decode("utf-8").strip()] = value
+                    return "OK"
+                command = command.decode("utf-8")
+            except UnicodeDecodeError:
+                return "IGNORED"
+
+        parts = command.strip().split(None, 1)
+        op = parts[0].upper() if parts else ""
+        arg = parts[1] if len(parts) > 1 else ""
+
+        if op == "SET" and "=" in arg:
+            key, value = arg.split("=", 1)
+            self.data[key.strip()] = value.strip()
+            return "OK"
+        if op == "DELETE":
+            return "OK" if self.data.pop(arg.strip(), None) is not None else "NOT_FOUND"
+        if op == "TASK_BATCH":
+            return self._apply_task_batch(arg)
+        if op.startswith("TASK_"):
+            return self._apply_task(op, arg)
+        return "IGNORED"
+
+    def _apply_config(self, command):
+        try:
+            self.config = ClusterConfig.from_command(command).to_dict()
+        except ValueError:
+            return "INVALID"  # membership ignores it as well
+        return "OK"
+
+    def _apply_task(self, op, arg):
+        parts = arg.split(None, 1)
+        if not parts:
+            return "INVALID"
+        task_id = parts[0]
+        rest = parts[1].strip() if len(parts) > 1 else ""
+        task = self.tasks.get(task_id)
+
+        if op in WORKER_OPS:
+            return "INVALID"  # claims and heartbeats are only applied as part of a TASK_BATCH
+
+        if op == "TASK_SUBMIT":
+            if task is not None:
+                return "EXISTS"
+            self._enqueue(task_id, rest, 0, None)
+            return "OK"
+
+        if op == "TASK_ENQUEUE":
+            if task is not None:
+                return "EXISTS"
+            fields = rest.split(None, 2)
+            try:
+                priority, deadline = int(fields[0]), int(fields[1])
+            except (IndexError, ValueError):
+                return "INVALID"
+            self._enqueue(task_id, fields[2] if len(fields) > 2 else "", priority, deadline or None)
+            return "OK"
+
+        if task is None:
+            return "NOT_FOUND"
+
+        if op == "TASK_ASSIGN":
+            if task["status"] != self.PENDING or not rest:
+                return "INVALID_STATE"
+            task["worker"] = rest
+            self.tasks_by_worker.setdefault(rest, set()).add(task_id)
+            self._set_status(task_id, self.RUNNING)
+            return "OK"
+
+        if op in ("TASK_COMPLETE", "TASK_FAIL"):
+            if task["status"] != self.RUNNING:
+                return "INVALID_STATE"
+            task["result"] = rest
+            task["lease_expires"] = None
+            self._set_status(task_id, self.COMPLETED if op == "TASK_COMPLETE" else self.FAILED)
+            return "OK"
+
+        if op == "TASK_CANCEL":
+            if task["status"] not in (self.PENDING, self.RUNNING):
+                return "INVALID_STATE"
+            self._set_status(task_id, self.CANCELLED)
+            return "OK"
+
+        return "IGNORED"
+
+    def _enqueue(self, task_id, description, priority, deadline):
+        self.tasks[task_id] = {"description": description, "status": None, "worker": None, "result": None,
+                               "priority": priority, "deadline": deadline, "seq": self.queue_seq,
+                               "attempts": 0, "lease_expires": None}
+        self.queue_seq += 1
+        self._set_status(task_id, self.PENDING)
+        self._push_pending(task_id)
+
+    def _push_pending(self, task_id):
+        task = self.tasks[task_id]
+        deadline = task["deadline"]
+        heapq.heappush(self.ready, (-task["priority"], deadline if deadline is not None else float("inf"),
+                                    task["seq"], task_id))
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, task_id))
+
+    def _apply_task_batch(self, arg):
+        """Claims and heartbeats of many workers at one leader time; JSON list of per-op results"""
+        try:
+            now, ops = parse_task_batch(arg)
+        except ValueError:
+            return "INVALID"
+        now = self.queue_time_ms = max(self.queue_time_ms, now)
+        self._expire(now)
+        results = []
+        for op in ops:
+            if op[0] == "CLAIM":
+                _, worker, max_tasks, lease_ms = op
+                results.append(self._claim(worker, max_tasks, lease_ms, now))
+            else:
+                _, worker, lease_ms = op
+                results.append(self._renew_leases(worker, lease_ms, now))
+        return json.dumps(results)
+
+    def _expire(self, now):
+        """Re-queue tasks whose lease ran out, expire pending tasks past their deadline"""
+        while self.leases and self.leases[0][0] <= now:
+            expires, task_id = heapq.heappop(self.leases)
+            task = self.tasks.get(task_id)
+            if task is None or task["status"] != self.RUNNING or task["lease_expires"] != expires:
+                continue  # finished, or renewed (its current entry is further down)
+            self.tasks_by_worker.get(task["worker"], set()).discard(task_id)
+            task["worker"] = None
+            task["lease_expires"] = None
+            if task["deadline"] is not None and task["deadline"] < now:
+                self._set_status(task_id, self.EXPIRED)
+            else:
+                self._set_status(task_id, self.PENDING)
+                self._push_pending(task_id)
+        while self.deadlines and self.deadlines[0][0] < now:
+            deadline, task_id = heapq.heappop(self.deadlines)
+            task = self.tasks.get(task_id)
+            if task is not None and task["status"] == self.PENDING and task["deadline"] == deadline:
+                self._set_status(task_id, self.EXPIRED)
+
+    def _claim(self, worker, max_tasks, lease_ms, now):
+        claimed = []
+        while self.ready and len(claimed) < max_tasks:
+            task_id = heapq.heappop(self.ready)[3]
+            task = self.tasks.get(task_id)
+            if task is None or task["status"] != self.PENDING:
+                continue  # assigned, cancelled or already expired since it was queued
+            task["worker"] = worker
+            task["attempts"] += 1
+            task["lease_expires"] = now + lease_ms
+            self.tasks_by_worker.setdefault(worker, set()).add(task_id)
+            self._set_status(task_id, self.RUNNING)
+            heapq.heappush(self.leases, (task["lease_expires"], task_id))
+            claimed.append({"task_id": task_id, "description": task["description"], "priority": task["priority"],
+                            "deadline": task["deadline"], "attempt": task["attempts"],
+                            "lease_expires": task["lease_expires"]})
+        return claimed
+
+    def _renew_leases(self, worker, lease_ms, now):
+        """Extend every lease the worker still holds; returns their task ids (a missing one was lost)"""
+        renewed = []
+        for task_id in sorted(self.tasks_by_worker.get(worker, ())):
+            task = self.tasks[task_id]
+            if task["status"] != self.RUNNING or task["lease_expires"] is None:
+                continue  # TASK_ASSIGN'ed tasks are not leased
+            task["lease_expires"] = now + lease_ms
+            heapq.heappush(self.leases, (task["lease_expires"], task_id))
+            renewed.append(task_id)
+        return renewed
+
+    def next_expiry_ms(self):
+        """Earliest leader time at which a lease or deadline may run out (None: nothing queued)"""
+        with self.lock:
+            due = [self.leases[0][0]] if self.leases else []
+            if self.deadlines:
+                due.append(self.deadlines[0][0] + 1)
+            return min(due) if due else None
+
+    def _set_status(self, task_id, status):
+        task = self.tasks[task_id]
+        if task["status"] is not None:
+            self.tasks_by_status[task["status"]].discard(task_id)
+        if status not in (self.PENDING, self.RUNNING) and task["worker"]:
+            self.tasks_by_worker.get(task["worker"], set()).discard(task_id)
+        task["status"] = status
+        self.tasks_by_status.setdefault(status, set()).add(task_id)
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def query(self, key):
+        """Read applied state: "task:<id>" and "tasks:<STATUS>" return JSON, anything else is a plain key"""
+        with self.lock:
+            if key.startswith("task:"):
+                task = self.tasks.get(key[len("task:"):])
+                return json.dumps(task, sort_keys=True) if task is not None else None
+            if key.startswith("tasks:"):
+                return json.dumps(sorted(self.tasks_by_status.get(key[len("tasks:"):].upper(), ())))
+            return self.data.get(key)
+
+    def snapshot(self):
+        """Serialize the whole state; size depends on live keys and tasks, not on log length"""
+        with self.lock:
+            # Binary values are kept apart, base64-encoded, since JSON has no bytes
+            kv = {key: value for key, value in self.data.items() if not isinstance(value, bytes)}
+            kv_binary = {key: base64.b64encode(value).decode("ascii")
+                         for key, value in self.data.items() if isinstance(value, bytes)}
+            return json.dumps({"kv": kv, "kv_binary": kv_binary, "tasks": self.tasks, "config": self.config,
+                               "sessions": self.sessions.to_dict(),
+                               "queue": {"seq": self.queue_seq, "time_ms": self.queue_time_ms}},
+                              sort_keys=True).encode("utf-8")
+
+    def restore(self, data):
+        with self.lock:
+            state = json.loads(data.decode("utf-8")) if data else {}
+            if "kv" not in state:
+                state = {"kv": state}  # snapshot written before the task tables existed
+            self.data = state["kv"]
+            self.data.update((key, base64.b64decode(value)) for key, value in state.get("kv_binary", {}).items())
+            self.tasks = state.get("tasks", {})
+            self.config = state.get("config")
+            self.sessions.restore(state.get("sessions"))
+            # Secondary tables are derived, so they are rebuilt instead of stored
+            queue = state.get("queue", {})
+            self.queue_seq = queue.get("seq", 0)
+            self.queue_time_ms = queue.get("time_ms", 0)
+            self.tasks_by_status = {}
+            self.tasks_by_worker = {}
+            self.ready, self.leases, self.deadlines = [], [], []
+            for task_id, task in self.tasks.items():
+                if "seq" not in task:  # snapshot written before the work queue existed
+                    task.update(priority=0, deadline=None, seq=self.queue_seq, attempts=0, lease_expires=None)
+                    self.queue_seq += 1
+                self.tasks_by_status.setdefault(task["status"], set()).add(task_id)
+                if task["worker"] and task["status"] == self.RUNNING:
+                    self.tasks_by_worker.setdefault(task["worker"], set()).add(task_id)
+                if task["status"] == self.PENDING:
+                    self._push_pending(task_id)
+                elif task["status"] == self.RUNNING and task["lease_expires"] is not None:
+                    self.leases.append((task["lease_expires"], task_id))
+            heapq.heapify(self.leases)
@@ -0,0 +1,170 @@
+import itertools
+import json
+import threading
+import time
+
+# Worker requests; the leader combines them into TASK_BATCH entries instead of logging each:
+#   TASK_CLAIM <worker_id> [max_tasks] [lease_ms]  -> JSON list of the tasks now leased to the worker
+#   TASK_HEARTBEAT <worker_id> [lease_ms]          -> JSON list of the task ids whose lease was renewed
+WORKER_OPS = ("TASK_CLAIM", "TASK_HEARTBEAT")
+DEFAULT_LEASE_MS = 30000
+MAX_CLAIM = 1000
+
+# Log entries of combined requests: "TASK_BATCH {"now": <leader time ms>, "ops": [...]}"
+TASK_BATCH = "TASK_BATCH"
+
+
+def _op_name(command):
+    if isinstance(command, bytes):
+        command = command.decode("utf-8", "replace")
+    parts = command.split(None, 1)
+    return parts[0].upper() if parts else ""
+
+
+def is_worker_request(command):
+    return _op_name(command) in WORKER_OPS
+
+
+def is_task_batch_command(command):
+    return _op_name(command) == TASK_BATCH
+
+
+def parse_worker_request(command):
+    """["CLAIM", worker_id, max_tasks, lease_ms] or ["HEARTBEAT", worker_id, lease_ms]; ValueError if malformed"""
+    if isinstance(command, bytes):
+        command = command.decode("utf-8")  # UnicodeDecodeError is a ValueError
+    parts = command.split()
+    if len(parts) < 2:
+        raise ValueError("missing worker id")
+    numbers = [int(part) for part in parts[2:]]  # ValueError if not integers
+    if parts[0].upper() == "TASK_CLAIM":
+        if len(numbers) > 2:
+            raise ValueError("usage: TASK_CLAIM <worker_id> [max_tasks] [lease_ms]")
+        max_tasks = numbers[0] if numbers else 1
+        lease_ms = numbers[1] if len(numbers) > 1 else DEFAULT_LEASE_MS
+        if not 1 <= max_tasks <= MAX_CLAIM:
+            raise ValueError(f"max_tasks must be between 1 and {MAX_CLAIM}")
+        request = ["CLAIM", parts[1], max_tasks, lease_ms]
+    else:
+        if len(numbers) > 1:
+            raise ValueError("usage: TASK_HEARTBEAT <worker_id> [lease_ms]")
+        lease_ms = numbers[0] if numbers else DEFAULT_LEASE_MS
+        request = ["HEARTBEAT", parts[1], lease_ms]
+    if lease_ms <= 0:
+        raise ValueError("lease_ms must be positive")
+    return request
+
+
+def task_batch_command(now_ms, ops):
+    return f"{TASK_BATCH} " + json.dumps({"now": now_ms, "ops": ops}, separators=(",", ":"))
+
+
+def parse_task_batch(arg):
+    """(now_ms, ops) of a TASK_BATCH entry's argument; ValueError if malformed"""
+    batch = json.loads(arg)
+    try:
+        now, ops = int(batch["now"]), batch["ops"]
+        for op in ops:
+            shape = (str, str, int, int) if op[0] == "CLAIM" else (str, str, int)
+            if op[0] not in ("CLAIM", "HEARTBEAT") or len(op) != len(shape) or \
+                    not all(isinstance(value, kind) for value, kind in zip(op, shape)):
+                raise ValueError(f"bad operation {op}")
+    except (KeyError, TypeError, IndexError) as e:
+        raise ValueError(f"bad task batch: {e}")
+    return now, ops
+
+
+class TaskBatcher:
+    """Leader side of worker requests: TASK_CLAIM / TASK_HEARTBEAT of every worker are
+    combined into TASK_BATCH log entries, so thousands of polling workers cost one entry
+    (one fsync, one replication round) per batch instead of one per request.
+
+    One batch is in flight at a time; requests arriving meanwhile wait (up to max_ops
+    per entry) and go out together when it is applied, so batches grow with the load.
+    A batch carries the leader's clock, which leases are measured against. While a lease
+    or deadline is due and no worker request comes in, the leader writes an empty batch
+    every reap_interval so expired tasks are still re-queued.
+
+    Worker requests are not exactly-once: tasks claimed by a request whose answer was
+    lost (timeout, leader change) simply go back to the queue when their lease runs out.
+    """
+
+    BATCH_TIMEOUT = 5.0
+
+    def __init__(self, log_replicator, max_ops=1024, reap_interval=1.0, clock=time.time):
+        self.log_replicator = log_replicator
+        self.max_ops = max_ops
+        self.reap_interval = reap_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.waiting = []  # (op, callback) not proposed yet
+        self.in_flight = None  # id of the batch being committed
+        self.batch_ids = itertools.count(1)
+
+    def start(self):
+        self.log_replicator.scheduler.schedule_periodic(self.reap_interval, self._reap)
+
+    def submit(self, command, callback):
+        """Queue a worker request; callback(success, message, result, index) as for propose()"""
+        try:
+            op = parse_worker_request(command)
+        except ValueError as e:
+            callback(False, f"Invalid request: {e}", "", 0)
+            return
+        with self.lock:
+            self.waiting.append((op, callback))
+            batch = self._take() if self.in_flight is None else None
+        if batch is not None:
+            self._propose(*batch)
+
+    def _take(self):
+        """Next batch to propose, marked in flight (lock held)"""
+        batch, self.waiting = self.waiting[:self.max_ops], self.waiting[self.max_ops:]
+        self.in_flight = next(self.batch_ids)
+        return self.in_flight, batch
+
+    def _propose(self, batch_id, batch):
+        try:
+            command = task_batch_command(int(self.clock() * 1000), [op for op, _ in batch])
+        except Exception as e:
+            # Fail this batch but keep the batcher going: _done clears in_flight
+            self._done(batch_id, batch, None, False, f"Invalid task batch: {e}", "", 0)
+            return
+        timer = self.log_replicator.scheduler.schedule(
+            self.BATCH_TIMEOUT, lambda: self._done(batch_id, batch, None, False, "Timed out waiting for commit", "", 0))
+        self.log_replicator.propose(
+            command, lambda success, message, result, index: self._done(batch_id, batch, timer, success, message,
+                                                                        result, index),
+            internal=True)
+
+    def _done(self, batch_id, batch, timer, success, message, result, index):
+        with self.lock:
+            if self.in_flight != batch_id:
+                return  # already answered: timed out before it was applied
+            self.in_flight = None
+            next_batch = self._take() if self.waiting else None
+        if timer is not None:
+            timer.cancel()
+
+        if success and result != "INVALID":
+            for (_, callback), op_result in zip(batch, json.loads(result)):
+                callback(True, message, json.dumps(op_result), index)
+        else:
+            for _, callback in batch:
+                callback(False, message if not success else "Invalid task batch", "", index)
+
+        if next_batch is not None:
+            self._propose(*next_batch)
+
+    def _reap(self):
+        """Scheduler tick: write an empty batch if a lease or deadline is due and nothing else will"""
+        if self.log_replicator.election_mgr.role != "leader":
+            return
+        due = self.log_replicator.state_machine.next_expiry_ms()
+        if due is None or due > self.clock() * 1000:
+            return
+        with self.lock:
+            if self.in_flight is not None:
+                return  # the batch in flight expires them when it is applied
+            batch = self._take()
+        self._propose(*batch)
@@ -0,0 +1,28 @@
+import grpc
+import threading
+
+
+class ChannelPool:
+    """One long-lived gRPC channel per peer address, shared by every Raft group of the process.
+
+    gRPC multiplexes concurrent calls over a channel's HTTP/2 connection, so all groups'
+    votes, AppendEntries and snapshots to a peer reuse one connection instead of
+    dialing a new one per RPC.
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def get(self, address):
+        with self._lock:
+            channel = self._channels.get(address)
+            if channel is None:
+                channel = self._channels[address] = grpc.insecure_channel(address)
+            return channel
+
+    def close(self):
+        with self._lock:
+            for channel in self._channels.values():
+                channel.close()
+            self._channels = {}
@@ -0,0 +1,17 @@
+#!/bin/bash
+
+# diagnostics.py is shared by both clusters, but each Docker build context needs its
+# own copy. Fails (and shows the diff) when the two copies have drifted apart.
+
+ROOT="$(cd "$(dirname "$0")/../.." && pwd)"
+RAFT_COPY="$ROOT/Task_Scheduler_System/raft/diagnostics.py"
+TPC_COPY="$ROOT/Ride_Sharing_System/two_phase_commit/diagnostics.py"
+
+if cmp -s "$RAFT_COPY" "$TPC_COPY"; then
+    echo " diagnostics.py copies are identical"
+    exit 0
+fi
+
+echo " diagnostics.py copies differ; make the same change to both:"
+diff -u "$RAFT_COPY" "$TPC_COPY"
+exit 1
@@ -0,0 +1,924 @@
+"""Deterministic in-process Raft simulator with fault injection.
+
+Runs the real ElectionManager, LogReplicationManager and RaftService of every node
+(on real storage, in a temp dir) over an in-memory transport and a virtual clock.
+Partitions, message drops and delays, and crash/restarts are injected from a
+seeded RNG. No threads are started: the simulator drives the same steps the node's
+threads would (timers, elections, proposal batching, replication, apply), so a
+scenario is fully determined by its seed.
+
+Checked after every step:
+  - election safety: at most one leader per term
+  - state machine safety: every node applies the same command at a given index
+  - commit index monotonicity: a running node's commit_index, and the leader commit
+    index it last saw (the bound of stale reads), never go back (pipelined
+    AppendEntries may be handled out of order)
+  - linearizable reads: a leader read never returns a value older than an
+    acknowledged write
+  - task leases: a queued task is never claimed while another worker's lease on it
+    (as last claimed or renewed) is still running
+  - hostile requests: malformed or forged commands (lower-case CONFIG, SESSION entries
+    sent by a client, ...) are rejected or ignored, never applied as what they imitate,
+    and malformed entries already in the log apply as INVALID
+and at the end of each scenario, after healing every fault:
+  - liveness: a single leader is elected, a new write commits and a worker request
+    is answered
+  - durability: every acknowledged write is in the committed log
+  - exactly-once: each key holds its last acknowledged value (writes are client
+    session requests, retried with the same sequence number until acknowledged,
+    so a retry applied twice would bring back an older value)
+  - lease expiry: no claimed task is left with a lease that ran out (the leader
+    re-queues them even when no worker asks for work)
+  - membership: no client request changed a node's recorded cluster configuration
+  - convergence: all nodes end with identical state machines
+
+Directed scenarios that need a precise order of events (see DIRECTED_SCENARIOS) run
+before the randomized ones.
+
+Usage:
+    python3 tests/raft_sim.py --runs 1000           # randomized scenarios, seeds 0..999
+    python3 tests/raft_sim.py --seed 42 --verbose   # replay one scenario with node logs
+"""
+import argparse
+import contextlib
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raft"))
+
+import grpc
+import raft_pb2
+from election import ElectionManager
+from log_replication import LogReplicationManager
+from log_storage import SegmentedLog, SnapshotStore
+from membership import ClusterConfig, Membership, node_id_of
+from raft_node import RaftService
+from scheduler import TimerScheduler
+from sessions import parse_session_command
+from state_machine import TaskSchedulerStateMachine
+
+# Request type of every Raft RPC, to decode what the client side serialized
+REQUEST_TYPES = {
+    "/Raft/RequestVote": raft_pb2.VoteRequest,
+    "/Raft/PreVote": raft_pb2.VoteRequest,
+    "/Raft/AppendEntries": raft_pb2.AppendEntriesRequest,
+    "/Raft/InstallSnapshot": raft_pb2.InstallSnapshotChunk,
+    "/Raft/TimeoutNow": raft_pb2.TimeoutNowRequest,
+}
+
+
+def session_of(command):
+    """parse_session_command(), with None for a malformed entry (applied as INVALID)"""
+    try:
+        return parse_session_command(command)
+    except ValueError:
+        return None
+
+
+class Violation(Exception):
+    """A safety or liveness property does not hold"""
+
+
+class SimRpcError(grpc.RpcError):
+    def __init__(self, code):
+        super().__init__(code.name)
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._code.name
+
+
+class SimContext:
+    """The parts of grpc.ServicerContext the Raft servicer uses"""
+
+    def abort(self, code, details):
+        raise SimRpcError(code)
+
+    def invocation_metadata(self):
+        return ()
+
+
+class SimFuture:
+    """Simulated calls are delivered when they are made, but done() only reports the
+    reply from the next tick on, so pipelined AppendEntries really fill their window.
+    """
+
+    def __init__(self, call, sim):
+        self.sim = sim
+        self.sent_at = sim.now
+        try:
+            self._response, self._error = call(), None
+        except grpc.RpcError as e:
+            self._response, self._error = None, e
+
+    def done(self):
+        return self.sim.now > self.sent_at
+
+    def cancel(self):
+        return False
+
+    def add_done_callback(self, callback):
+        pass  # nothing to wake: the simulator polls every node each tick
+
+    def result(self, timeout=None):
+        if self._error:
+            raise self._error
+        return self._response
+
+
+class SimMethod:
+    """Stub method bound to a SimChannel; requests go through the real (de)serializers"""
+
+    def __init__(self, channel, method, request_serializer, response_deserializer, streaming):
+        self.channel = channel
+        self.method = method
+        self.request_serializer = request_serializer
+        self.response_deserializer = response_deserializer
+        self.streaming = streaming
+
+    def _encode(self, message):
+        # raw_append_entries() passes pre-serialized bytes (request_serializer=None)
+        return self.request_serializer(message) if self.request_serializer else message
+
+    def __call__(self, request, timeout=None, metadata=None, **kwargs):
+        payload = [self._encode(chunk) for chunk in request] if self.streaming else self._encode(request)
+        response = self.channel.network.call(self.channel.src, self.channel.address, self.method, payload)
+        return self.response_deserializer(response)
+
+    def future(self, request, timeout=None, metadata=None, **kwargs):
+        return SimFuture(lambda: self(request, timeout, metadata), self.channel.network.sim)
+
+
+class SimChannel:
+    def __init__(self, network, src, address):
+        self.network = network
+        self.src = src
+        self.address = address
+
+    def unary_unary(self, method, request_serializer=None, response_deserializer=None, **kwargs):
+        return SimMethod(self, method, request_serializer, response_deserializer, streaming=False)
+
+    def stream_unary(self, method, request_serializer=None, response_deserializer=None, **kwargs):
+        return SimMethod(self, method, request_serializer, response_deserializer, streaming=True)
+
+    def close(self):
+        pass
+
+
+class SimChannelPool:
+    """Drop-in for transport.ChannelPool, handing out in-memory channels of one node"""
+
+    def __init__(self, network, src):
+        self.network = network
+        self.src = src
+
+    def get(self, address):
+        return SimChannel(self.network, self.src, address)
+
+    def close(self):
+        pass
+
+
+class SimNetwork:
+    """Delivers RPCs between nodes, subject to crashes, partitions, drops and delays.
+
+    A call is handled synchronously by the receiver unless it is dropped, or delayed:
+    a delayed request reaches the receiver later (from the simulator's event queue)
+    while the caller sees a timeout, so requests can arrive late and out of order.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.partition = None  # list of sets of node ids; None = fully connected
+        self.drop_rate = 0.0
+        self.delay_rate = 0.0
+        self.max_delay = 0.0
+
+    def reachable(self, src, dst):
+        if not (self.sim.nodes[src].alive and self.sim.nodes[dst].alive):
+            return False
+        return self.partition is None or any(src in side and dst in side for side in self.partition)
+
+    def call(self, src, address, method, payload):
+        sim = self.sim
+        dst = node_id_of(address)
+        sim.stats["rpcs"] += 1
+        if method == "/Raft/InstallSnapshot":
+            sim.stats["snapshots"] += 1
+        if not self.reachable(src, dst):
+            raise SimRpcError(grpc.StatusCode.UNAVAILABLE)
+
+        roll = sim.rng.random()
+        if roll < self.drop_rate:
+            sim.stats["dropped"] += 1
+            raise SimRpcError(grpc.StatusCode.DEADLINE_EXCEEDED)
+        if roll < self.drop_rate + self.delay_rate:
+            sim.stats["delayed"] += 1
+            sim.defer(sim.rng.uniform(0.001, self.max_delay), lambda: self._deliver_late(src, dst, method, payload))
+            raise SimRpcError(grpc.StatusCode.DEADLINE_EXCEEDED)
+
+        response = self.deliver(dst, method, payload)
+        if sim.rng.random() < self.drop_rate:
+            sim.stats["dropped"] += 1  # response lost: the receiver did act on the request
+            raise SimRpcError(grpc.StatusCode.DEADLINE_EXCEEDED)
+        return response
+
+    def _deliver_late(self, src, dst, method, payload):
+        if self.reachable(src, dst):
+            try:
+                self.deliver(dst, method, payload)
+            except grpc.RpcError:
+                pass
+
+    def deliver(self, dst, method, payload):
+        node = self.sim.nodes[dst]
+        request_type = REQUEST_TYPES[method]
+        if isinstance(payload, list):
+            request = iter([request_type.FromString(chunk) for chunk in payload])
+        else:
+            request = request_type.FromString(payload)
+        handler = getattr(node.service, method.rsplit("/", 1)[1])
+        try:
+            response = handler(request, SimContext())
+        except grpc.RpcError:
+            raise
+        except Exception:
+            # gRPC would answer UNKNOWN; the simulator reports the bug instead
+            self.sim.errors.append(f"{dst} {method} raised:\n{traceback.format_exc()}")
+            raise SimRpcError(grpc.StatusCode.UNKNOWN)
+        return response.SerializeToString()
+
+
+class CheckedStateMachine(TaskSchedulerStateMachine):
+    """State machine that reports every applied (index, term, command) to the checker.
+
+    Checked at apply time because a snapshot taken in the same apply pass compacts
+    the entries out of the log. Also checks that no client request is executed twice
+    on a node: the simulated clients send one request at a time, so any sequence at
+    or below the highest one executed for that client is a duplicate.
+    """
+
+    def __init__(self, sim, node):
+        super().__init__()
+        self.sim = sim
+        self.node = node
+        self.request = None  # (client_id, sequence) of the SESSION entry being applied
+        self.executed = {}  # client_id -> highest sequence executed
+        self.leased = {}  # task_id -> lease expiry (ms) of its last claim or renewal
+
+    def _apply(self, command):
+        session = session_of(command)
+        if session is None:
+            if self.request is not None:  # the session let the wrapped command through
+                client_id, sequence = self.request
+                if sequence <= self.executed.get(client_id, 0):
+                    self.sim.errors.append(f"{self.node.node_id} executed {client_id} request "
+                                           f"{sequence} twice: {command}")
+                self.executed[client_id] = max(sequence, self.executed.get(client_id, 0))
+                self.request = None
+            return super()._apply(command)
+        self.request = session[:2]
+        try:
+            return super()._apply(command)
+        finally:
+            self.request = None
+
+    def _claim(self, worker, max_tasks, lease_ms, now):
+        claimed = super()._claim(worker, max_tasks, lease_ms, now)
+        for task in claimed:
+            held = self.leased.get(task["task_id"], 0)
+            if held > now:
+                self.sim.errors.append(f"{self.node.node_id}: {worker} claimed {task['task_id']} at {now} "
+                                       f"while it was leased until {held}")
+            self.leased[task["task_id"]] = task["lease_expires"]
+        return claimed
+
+    def _renew_leases(self, worker, lease_ms, now):
+        renewed = super()._renew_leases(worker, lease_ms, now)
+        for task_id in renewed:
+            self.leased[task_id] = now + lease_ms
+        return renewed
+
+    def restore(self, data):
+        super().restore(data)
+        self.executed = {client_id: session["max_sequence"]
+                         for client_id, session in self.sessions.sessions.items()}
+        self.leased = {task_id: task["lease_expires"] for task_id, task in self.tasks.items()
+                       if task["status"] == self.RUNNING and task["lease_expires"] is not None}
+
+    def apply_batch(self, commands):
+        replicator = self.node.log_replicator
+        first = replicator.last_applied + 1  # last_applied moves once the batch is applied
+        for index, term, command in replicator.log.entries(first, first + len(commands) - 1):
+            self.sim.record_applied(self.node, index, term, command)
+        return super().apply_batch(commands)
+
+
+class SimNode:
+    """One Raft node process; crash() drops all in-memory state, start() recovers from disk"""
+
+    def __init__(self, sim, index, data_dir):
+        self.sim = sim
+        self.node_id = f"node{index}"
+        self.port = 50060 + index
+        self.address = f"raft_{self.node_id}:{self.port}"
+        self.data_dir = data_dir
+        self.alive = False
+        self.generation = 0
+
+    def start(self):
+        sim = self.sim
+        self.generation += 1
+        generation = self.generation
+        self.scheduler = TimerScheduler(clock=lambda: sim.now)
+        self.log_store = SegmentedLog(os.path.join(self.data_dir, "log"), segment_bytes=64 * 1024)
+        membership = Membership(ClusterConfig(sim.addresses))
+        channels = SimChannelPool(sim.network, self.node_id)
+
+        def spawn(target, **kwargs):
+            sim.ready.append((self, generation, target, kwargs))
+
+        self.election_mgr = ElectionManager(
+            node_id=self.node_id, membership=membership, port=self.port, data_dir=self.data_dir,
+            log_store=self.log_store, scheduler=self.scheduler, pre_vote=sim.params["pre_vote"],
+            channels=channels, spawn=spawn, rng=sim.rng
+        )
+        self.log_replicator = LogReplicationManager(
+            self.node_id, membership, self.election_mgr, self.log_store,
+            snapshot_store=SnapshotStore(os.path.join(self.data_dir, "snapshot")),
+            state_machine=CheckedStateMachine(sim, self),
+            scheduler=self.scheduler,
+            snapshot_threshold=sim.params["snapshot_threshold"],
+            snapshot_chunk_bytes=256,
+            max_append_entries=sim.params["max_append_entries"],
+            max_inflight=sim.params["max_inflight"],
+            lease_reads=sim.params["lease_reads"],
+            heartbeat_interval=sim.params["heartbeat_interval"],
+            check_quorum=sim.params["check_quorum"],
+            channels=channels
+        )
+        self.log_replicator.PIPELINE_GAP_WAIT = 0  # single-threaded: a gap cannot fill while waiting
+        self.log_replicator.task_batcher.clock = lambda: sim.now  # lease times in virtual time
+        self.log_replicator.task_batcher.start()
+        self.service = RaftService({0: self.log_replicator})
+        self.election_mgr.reset_election_timer()  # what start_election_loop() does
+
+        # Replication bookkeeping the per-follower sender threads would keep
+        self.last_sent = {}
+        self.sent_commit = {}
+        self.retry_at = {}
+        self.alive = True
+
+    def crash(self):
+        self.alive = False
+        self.election_mgr.stop()
+        self.log_store.close()
+
+    def is_leader(self):
+        return self.alive and self.election_mgr.role == "leader"
+
+
+class Simulation:
+    TICK = 0.01  # virtual seconds per step
+    CLIENT_TIMEOUT = 1.0  # virtual seconds before a client retries an unanswered write
+    HOSTILE_COMMANDS = [
+        "config nope",
+        'Config {"voters": ["raft_intruder:50099"], "learners": []}',
+        b'CONFIG {"voters": ["raft_intruder:50099"], "learners": []}',
+        'CONFIG {"voters": ["raft_intruder:50099"], "learners": []}',
+        "SESSION foo",
+        "SESSION a b c SET k0=999",
+        b"SESSION a 1 x SET k0=999",
+        "SESSION forged-client 1 0 SET k0=999",
+        b"TASK_CLAIM \xff 1",
+        b"TASK_HEARTBEAT w1 soon",
+    ]
+    # Malformed entries that only an older leader could have written: logged as they are
+    MALFORMED_ENTRIES = ["CONFIG nope", "CONFIG [1]", 'CONFIG {"voters": 5}',
+                         "SESSION foo", "SESSION a b c SET k0=999", b"SESSION a 1 x SET k0=999"]
+
+    def __init__(self, seed, base_dir, verbose=False):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.now = 0.0
+        self.params = self._draw_params()
+        self.network = SimNetwork(self)
+        self.nodes = {}
+        for index in range(1, self.params["nodes"] + 1):
+            node = SimNode(self, index, os.path.join(base_dir, f"node{index}"))
+            self.nodes[node.node_id] = node
+        self.addresses = [node.address for node in self.nodes.values()]
+        self.ready = []     # elections spawned off timers: (node, generation, target, kwargs)
+        self.deferred = []  # heap of (time, seq, callback) for delayed messages
+        self.seq = 0
+        self.errors = []
+
+        # Checker state
+        self.leaders = {}    # term -> leader id
+        self.commit_seen = {}  # (node_id, generation) -> (commit_index, leader commit seen) as of the last check
+        self.committed = {}  # index -> (term, command), as applied by the first node
+        self.acked = {}      # (client_id, sequence) -> index of writes the client saw succeed (None: deduplicated)
+        self.applied_requests = set()  # (client_id, sequence) of every applied session entry
+        self.inflight = {}   # key -> write not acknowledged yet; one per key, retried until it is
+        self.key_values = {}  # key -> last value written
+        self.key_acked = {}  # key -> highest acknowledged value
+        self.key_sequences = {}  # key -> last sequence number of the key's client
+        self.tasks_enqueued = 0
+        self.stats = dict(elections=0, writes=0, retries=0, acked=0, reads=0, crashes=0, partitions=0,
+                          rpcs=0, dropped=0, delayed=0, snapshots=0, tasks=0, claimed=0)
+
+    def _draw_params(self):
+        rng = self.rng
+        faults = rng.choice(["none", "drops", "delays", "crashes", "partitions", "all"])
+        return {
+            "nodes": rng.choice([3, 5]),
+            "pre_vote": rng.random() < 0.8,
+            "check_quorum": rng.random() < 0.8,
+            "lease_reads": rng.random() < 0.3,
+            "heartbeat_interval": rng.choice([0.1, 0.3, 1.0]),
+            "snapshot_threshold": rng.choice([8, 50, 1000]),
+            "max_append_entries": rng.choice([4, 64]),
+            "max_inflight": rng.choice([1, 4]),
+            "faults": faults,
+            "drop_rate": rng.choice([0.01, 0.05, 0.2]) if faults in ("drops", "all") else 0.0,
+            "delay_rate": rng.choice([0.01, 0.05, 0.2]) if faults in ("delays", "all") else 0.0,
+            "max_delay": rng.choice([0.05, 0.5, 2.0]),
+            "crash_rate": rng.choice([0.1, 0.3]) if faults in ("crashes", "all") else 0.0,  # per second
+            "partition_rate": rng.choice([0.1, 0.3]) if faults in ("partitions", "all") else 0.0,
+            "write_rate": rng.choice([5, 20, 50]),  # per second
+            "read_rate": rng.choice([0, 5, 20]),
+            "duration": 10.0,
+            "settle": 10.0,
+            "task_rate": rng.choice([0, 10, 40]),  # task queue requests per second
+            "hostile_rate": rng.choice([0, 2]),  # malformed / forged client requests per second
+        }
+
+    def log(self, message):
+        if self.verbose:
+            print(f"[sim t={self.now:7.3f}] {message}", file=sys.__stdout__)
+
+    def defer(self, delay, callback):
+        self.seq += 1
+        heapq.heappush(self.deferred, (self.now + delay, self.seq, callback))
+
+    def alive_nodes(self):
+        return [node for node in self.nodes.values() if node.alive]
+
+    # ------------------------------------------------------------------
+    # Driving the nodes
+    # ------------------------------------------------------------------
+
+    def step(self, faults=True, clients=True):
+        self.now += self.TICK
+        while self.deferred and self.deferred[0][0] <= self.now:
+            heapq.heappop(self.deferred)[2]()
+
+        if faults:
+            self._inject_faults()
+        for node in self.alive_nodes():
+            node.scheduler.run_pending()
+        self._run_ready()
+        if clients:
+            self._client_ops()
+        for node in self.alive_nodes():
+            node.log_replicator._append_proposals(node.log_replicator._take_proposals(block=False))
+        for node in self.alive_nodes():
+            if node.is_leader():
+                self._replicate(node)
+        self._run_ready()
+        for node in self.alive_nodes():
+            node.log_replicator._apply_committed_entries()
+        self._check()
+
+    def _run_ready(self):
+        while self.ready:
+            node, generation, target, kwargs = self.ready.pop(0)
+            if node.alive and node.generation == generation:
+                self.stats["elections"] += 1
+                target(**kwargs)
+
+    def _replicate(self, node):
+        """One round of what the node's per-follower sender threads do"""
+        replicator = node.log_replicator
+        for address, peer_id in list(replicator._peer_ids()):
+            if replicator.inflight.get(peer_id):
+                if not replicator._collect_acks(peer_id):
+                    node.retry_at[peer_id] = self.now + replicator.heartbeat_interval
+                if len(replicator.inflight[peer_id]) >= replicator.max_inflight:
+                    continue
+            heartbeat_due = self.now - node.last_sent.get(peer_id, -1e9) >= replicator.heartbeat_interval
+            retry_ok = self.now >= node.retry_at.get(peer_id, 0)
+            entries_pending = replicator.next_index.get(peer_id, 0) <= replicator.log.last_index()
+            commit_pending = replicator.commit_index > node.sent_commit.get(peer_id, 0)
+            if not (heartbeat_due or (retry_ok and (entries_pending or commit_pending))):
+                continue
+            if not node.is_leader():
+                return
+            node.last_sent[peer_id] = self.now
+            node.sent_commit[peer_id] = replicator.commit_index
+            reached = replicator._send_append_entries(address, peer_id, replicator.channels.get(address))
+            node.retry_at[peer_id] = 0 if reached else self.now + replicator.heartbeat_interval
+
+    def _inject_faults(self):
+        p = self.params
+        rng = self.rng
+        if rng.random() < p["crash_rate"] * self.TICK:
+            alive = self.alive_nodes()
+            if len(alive) > 1:
+                node = rng.choice(alive)
+                self.log(f"crash {node.node_id}")
+                self.stats["crashes"] += 1
+                node.crash()
+        if rng.random() < p["crash_rate"] * self.TICK * 2:
+            crashed = [node for node in self.nodes.values() if not node.alive]
+            if crashed:
+                node = rng.choice(crashed)
+                self.log(f"restart {node.node_id}")
+                node.start()
+        if rng.random() < p["partition_rate"] * self.TICK:
+            ids = sorted(self.nodes)
+            rng.shuffle(ids)
+            cut = rng.randint(1, len(ids) - 1)
+            self.network.partition = [set(ids[:cut]), set(ids[cut:])]
+            self.log(f"partition {sorted(ids[:cut])} | {sorted(ids[cut:])}")
+            self.stats["partitions"] += 1
+        elif self.network.partition and rng.random() < p["partition_rate"] * self.TICK * 2:
+            self.log("heal partition")
+            self.network.partition = None
+
+    def _client_ops(self):
+        p = self.params
+        rng = self.rng
+        leaders = [node for node in self.alive_nodes() if node.is_leader()]
+        if not leaders:
+            return
+        if rng.random() < p["write_rate"] * self.TICK:
+            key = f"k{rng.randint(0, 4)}"
+            pending = self.inflight.get(key)
+            if pending is None:
+                self._write(rng.choice(leaders), key)
+            elif self.now >= pending["retry_at"]:
+                self.stats["retries"] += 1
+                self._send(rng.choice(leaders), pending)
+        if rng.random() < p["read_rate"] * self.TICK:
+            self._read(rng.choice(leaders), f"k{rng.randint(0, 4)}")
+        if rng.random() < p["task_rate"] * self.TICK:
+            self._task_request(rng.choice(leaders))
+        if rng.random() < p["hostile_rate"] * self.TICK:
+            self._hostile_request(rng.choice(leaders))
+
+    def _hostile_request(self, node):
+        """A client command that imitates an entry only the leader may write, or a malformed
+        entry put straight into the log; it must apply without taking effect (and without
+        stopping replication or the apply loop, which the final liveness check would catch)"""
+        in_log = self.rng.random() < 0.3
+        command = self.rng.choice(self.MALFORMED_ENTRIES if in_log else self.HOSTILE_COMMANDS)
+
+        def on_done(success, message, result, index):
+            if success and result == "OK":
+                self.errors.append(f"hostile request {command!r} was applied at index {index}")
+
+        node.log_replicator.propose(command, on_done, allow_config=in_log, internal=in_log)
+
+    def _task_request(self, node):
+        """Enqueue a task, or claim / heartbeat as one of a few workers; claimed tasks are
+        completed some time later or abandoned, leaving their lease to run out"""
+        rng = self.rng
+        choice = rng.random()
+        if choice < 0.4:
+            self.tasks_enqueued += 1
+            deadline = int(self.now * 1000) + rng.randint(500, 5000) if rng.random() < 0.3 else 0
+            command = f"TASK_ENQUEUE t{self.tasks_enqueued} {rng.randint(0, 3)} {deadline} work"
+            self.stats["tasks"] += 1
+            node.log_replicator.propose(command, lambda *outcome: None)
+            return
+        worker = f"w{rng.randint(0, 5)}"
+        claim = choice < 0.85
+        if claim:
+            command = f"TASK_CLAIM {worker} {rng.randint(1, 3)} {rng.choice([300, 1000])}"
+        else:
+            command = f"TASK_HEARTBEAT {worker} 1000"
+        if rng.random() < 0.2:
+            command = command.encode()  # as sent in ClientRequest.payload
+
+        def on_done(success, message, result, index):
+            if not success or not claim:
+                return
+            for task in json.loads(result):
+                self.stats["claimed"] += 1
+                if self.rng.random() < 0.7:
+                    self.defer(self.rng.uniform(0.05, 1.5), lambda task_id=task["task_id"]: self._complete(task_id))
+
+        node.log_replicator.propose(command, on_done)
+
+    def _complete(self, task_id):
+        leaders = [node for node in self.alive_nodes() if node.is_leader()]
+        if leaders:
+            leaders[0].log_replicator.propose(f"TASK_COMPLETE {task_id} done", lambda *outcome: None)
+
+    def _write(self, node, key):
+        """New write of the next value of key, from the key's own client session"""
+        value = self.key_values.get(key, 0) + 1
+        self.key_values[key] = value
+        client_id = f"client-{key}"
+        sequence = self.key_sequences[key] = self.key_sequences.get(key, 0) + 1
+        pending = {"key": key, "value": value, "command": f"SET {key}={value}", "request": (client_id, sequence)}
+        self.inflight[key] = pending
+        self.stats["writes"] += 1
+        self._send(node, pending)
+        return pending
+
+    def _send(self, node, pending):
+        """(Re)send a write with its original sequence number; retried if not answered in CLIENT_TIMEOUT"""
+        pending["retry_at"] = self.now + self.CLIENT_TIMEOUT
+        key = pending["key"]
+
+        def on_done(success, message, result, index):
+            if not success:
+                pending["retry_at"] = self.now  # NOT_LEADER, overwritten: retry on the next leader
+                return
+            if self.inflight.get(key) is pending:
+                del self.inflight[key]
+                self.stats["acked"] += 1
+            answered_from_session = message.startswith("Duplicate")
+            self.acked.setdefault(pending["request"], None if answered_from_session else index)
+            self.key_acked[key] = max(self.key_acked.get(key, 0), pending["value"])
+
+        client_id, sequence = pending["request"]
+        node.log_replicator.propose(pending["command"], on_done, client_id=client_id, sequence=sequence)
+
+    def _read(self, node, key):
+        # Apply first so read() never blocks on the apply thread the simulator does not run
+        node.log_replicator._apply_committed_entries()
+        floor = self.key_acked.get(key, 0)
+        success, value, found, message, read_index = node.log_replicator.read(key, timeout=0)
+        self.stats["reads"] += 1
+        if not success:
+            return
+        got = int(value) if found else 0
+        if got < floor:
+            raise Violation(f"stale read on {node.node_id}: {key}={got} but {key}={floor} was acknowledged "
+                            f"before the read (read_index {read_index})")
+        if got > self.key_values.get(key, 0):
+            raise Violation(f"read on {node.node_id} returned {key}={got}, which was never written")
+
+    # ------------------------------------------------------------------
+    # Checks
+    # ------------------------------------------------------------------
+
+    def record_applied(self, node, index, term, command):
+        session = session_of(command)
+        if session is not None:
+            self.applied_requests.add(session[:2])
+        first = self.committed.setdefault(index, (term, command))
+        if first != (term, command):
+            self.errors.append(f"{node.node_id} applied {(term, command)} at index {index}, "
+                               f"another node applied {first}")
+
+    def _check(self):
+        if self.errors:
+            raise Violation(self.errors[0])
+
+        for node in self.alive_nodes():
+            commits = (node.log_replicator.commit_index, node.log_replicator.leader_commit_seen[0])
+            seen = self.commit_seen.get((node.node_id, node.generation), (0, 0))
+            for name, value, before in zip(("commit_index", "leader commit seen"), commits, seen):
+                if value < before:
+                    raise Violation(f"{node.node_id} {name} went back from {before} to {value}")
+            self.commit_seen[(node.node_id, node.generation)] = commits
+
+            term = node.election_mgr.current_term
+            if node.election_mgr.role == "leader":
+                leader = self.leaders.setdefault(term, node.node_id)
+                if leader != node.node_id:
+                    raise Violation(f"two leaders in term {term}: {leader} and {node.node_id}")
+
+
+    def _check_final(self):
+        leaders = [node for node in self.alive_nodes() if node.is_leader()]
+        if len(leaders) != 1:
+            raise Violation(f"no single leader after healing all faults: {[n.node_id for n in leaders]}")
+        leader = leaders[0]
+
+        # Liveness: a new write commits
+        final = self._write(leader, "final")
+        for _ in range(int(3.0 / self.TICK)):
+            self.step(faults=False, clients=False)
+            if final["request"] in self.acked:
+                break
+        else:
+            raise Violation(f"write on leader {leader.node_id} did not commit after healing")
+
+        # Liveness: a worker request is answered (the leader's task batcher is not stuck)
+        answered = []
+        leader.log_replicator.propose("TASK_HEARTBEAT final-worker 1000", lambda *outcome: answered.append(outcome))
+        for _ in range(int(3.0 / self.TICK)):
+            if answered:
+                break
+            self.step(faults=False, clients=False)
+        else:
+            raise Violation(f"worker request on leader {leader.node_id} was not answered after healing")
+        for _ in range(int(1.0 / self.TICK)):
+            self.step(faults=False, clients=False)
+
+        for request, index in self.acked.items():
+            if index is None:
+                found = request in self.applied_requests
+            else:
+                session = session_of(self.committed.get(index, (None, "NOOP"))[1])
+                found = session is not None and session[:2] == request
+            if not found:
+                raise Violation(f"acknowledged write {request} (index {index}) is not in the committed log")
+
+        data = leader.log_replicator.state_machine.data
+        for key, acked in self.key_acked.items():
+            # An unacknowledged write of the key may still have been applied after the last ack
+            allowed = {acked, self.key_values[key]} if key in self.inflight else {acked}
+            value = int(data.get(key, 0))
+            if value not in allowed:
+                raise Violation(f"{key}={value} after settling, expected {sorted(allowed)}: "
+                                f"a write was lost or applied twice")
+
+        state_machine = leader.log_replicator.state_machine
+        overdue = sorted(task_id for task_id, task in state_machine.tasks.items()
+                         if task["status"] == state_machine.RUNNING
+                         and task["lease_expires"] < (self.now - 2.0) * 1000)
+        if overdue:
+            raise Violation(f"tasks {overdue} are still RUNNING long after their lease expired")
+
+        for node in self.nodes.values():
+            config = node.log_replicator.state_machine.config
+            if config is not None and config != node.log_replicator.membership.current().to_dict():
+                raise Violation(f"{node.node_id} recorded configuration {config} that was never in effect")
+
+        states = {node.node_id: node.log_replicator.state_machine.snapshot() for node in self.nodes.values()}
+        if len(set(states.values())) != 1:
+            applied = {node.node_id: node.log_replicator.last_applied for node in self.nodes.values()}
+            raise Violation(f"state machines differ after settling (last_applied {applied})")
+
+    def run(self):
+        try:
+            for node in self.nodes.values():
+                node.start()
+            p = self.params
+            self.network.drop_rate, self.network.delay_rate = p["drop_rate"], p["delay_rate"]
+            self.network.max_delay = p["max_delay"]
+
+            while self.now < p["duration"]:
+                self.step()
+
+            # Heal everything, then the cluster must converge
+            self.log("heal all faults")
+            self.network.partition = None
+            self.network.drop_rate = self.network.delay_rate = 0.0
+            for node in self.nodes.values():
+                if not node.alive:
+                    node.start()
+            settle_end = self.now + p["settle"]
+            while self.now < settle_end:
+                self.step(faults=False, clients=False)
+            self._check_final()
+        finally:
+            for node in self.alive_nodes():
+                node.crash()
+
+
+class ReorderedBatchesScenario(Simulation):
+    """Directed scenario: a lagging follower handles two pipelined AppendEntries batches,
+    then retransmissions of both in reverse order, as a delayed request can arrive after
+    a later batch. The leader's commit index is past both batches, so each one moves the
+    follower's commit index to its own last entry: the older batch must not move it back.
+    A last, late copy of the first batch carries no leader commit at all: it must not
+    lower the leader commit the follower bounds stale reads with."""
+
+    def run(self):
+        self.params["pre_vote"] = True  # the cut-off follower must not move to a newer term
+        try:
+            for node in self.nodes.values():
+                node.start()
+            while not any(node.is_leader() for node in self.nodes.values()):
+                if self.now > 10.0:
+                    raise Violation("no leader elected")
+                self.step(faults=False, clients=False)
+            leader = next(node for node in self.nodes.values() if node.is_leader())
+            follower = next(node for node in self.nodes.values() if node is not leader)
+            self.network.partition = [{follower.node_id}, set(self.nodes) - {follower.node_id}]
+
+            target = leader.log_replicator.log.last_index() + 8
+            for i in range(8):
+                leader.log_replicator.propose(f"SET r{i}={i}", lambda *outcome: None)
+            while leader.log_replicator.commit_index < target:  # proposals are appended in batches
+                if self.now > 20.0:
+                    raise Violation("writes did not commit on the majority side")
+                self.step(faults=False, clients=False)
+
+            start = follower.log_replicator.log.last_index() + 1
+            first = self._append_request(leader, start, 2)
+            second = self._append_request(leader, start + 2, 2)
+            commit = leader.log_replicator.commit_index  # beyond start + 3
+            for request, leader_commit in ((first, 0), (second, 0), (second, commit), (first, commit), (first, 0)):
+                request.leader_commit = leader_commit
+                self.network.deliver(follower.node_id, "/Raft/AppendEntries", request.SerializeToString())
+                self._check()
+            if follower.log_replicator.commit_index != start + 3:
+                raise Violation(f"follower commit_index {follower.log_replicator.commit_index}, expected {start + 3}")
+            if follower.log_replicator.leader_commit_seen[0] != commit:
+                raise Violation(f"follower saw leader commit {follower.log_replicator.leader_commit_seen[0]}, "
+                                f"expected {commit}")
+        finally:
+            for node in self.alive_nodes():
+                node.crash()
+
+    def _append_request(self, leader, start, count):
+        """AppendEntries carrying the leader's entries start..start+count-1"""
+        log = leader.log_replicator.log
+        prev_log_term, frames, count = log.read_batch(start, count, 1 << 20)
+        header = raft_pb2.AppendEntriesRequest(term=leader.election_mgr.current_term, leader_id=leader.node_id,
+                                               prev_log_index=start - 1, prev_log_term=prev_log_term)
+        return raft_pb2.AppendEntriesRequest.FromString(header.SerializeToString() + frames)
+
+
+DIRECTED_SCENARIOS = {"reordered pipelined batches": ReorderedBatchesScenario}
+
+
+def run_scenario(seed, verbose=False, scenario=Simulation):
+    """Returns (seed, params, stats, failure message or None)"""
+    base_dir = tempfile.mkdtemp(prefix=f"raft-sim-{seed}-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    sim = scenario(seed, base_dir, verbose)
+    failure = None
+    try:
+        if verbose:
+            sim.run()
+        else:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                sim.run()
+    except Violation as e:
+        failure = str(e)
+    except Exception:
+        failure = f"simulator crashed:\n{traceback.format_exc()}"
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return seed, sim.params, sim.stats, failure
+
+
+def _run_quiet(seed):
+    return run_scenario(seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", type=int, default=0, help="first scenario seed")
+    parser.add_argument("--runs", type=int, default=1, help="number of scenarios (seeds seed..seed+runs-1)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--verbose", action="store_true", help="print node logs and fault events")
+    args = parser.parse_args()
+
+    seeds = range(args.seed, args.seed + args.runs)
+    start = time.time()
+    totals = {}
+    failures = []
+
+    for name, scenario in DIRECTED_SCENARIOS.items():
+        failure = run_scenario(args.seed, args.verbose, scenario)[3]
+        print(f"directed scenario {name}: {'FAIL: ' + failure if failure else 'ok'}")
+        if failure:
+            failures.append(name)
+
+    if args.verbose or args.jobs <= 1:
+        results = (run_scenario(seed, args.verbose) for seed in seeds)
+    else:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap_unordered(_run_quiet, seeds)
+
+    for count, (seed, params, stats, failure) in enumerate(results, 1):
+        for name, value in stats.items():
+            totals[name] = totals.get(name, 0) + value
+        if failure:
+            failures.append(seed)
+            print(f"\nFAIL seed {seed}: {failure}")
+            print(f"  params: {params}")
+            print(f"  replay: python3 tests/raft_sim.py --seed {seed} --verbose")
+        if count % 100 == 0:
+            print(f"  {count}/{args.runs} scenarios, {len(failures)} failed ({time.time() - start:.0f}s)")
+
+    elapsed = time.time() - start
+    print(f"\n{args.runs} scenarios in {elapsed:.1f}s ({args.runs / elapsed * 60:.0f}/min), "
+          f"{len(failures)} failed")
+    print("  " + ", ".join(f"{name}={value}" for name, value in totals.items()))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
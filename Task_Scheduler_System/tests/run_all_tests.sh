@@ -4,6 +4,9 @@ echo "=========================================="
 echo "RAFT IMPLEMENTATION - COMPLETE TEST SUITE"
 echo "=========================================="
 
+echo -e "\n Checking shared files..."
+bash tests/check_diagnostics_copies.sh || exit 1
+
 echo -e "\n Cleaning up previous runs..."
 docker-compose -f docker-compose.raft.yml down -v 2>/dev/null
 sleep 2
@@ -14,6 +17,7 @@ TESTS=(
     "test3_log_replication.sh"
     "test4_request_forwarding.sh"
     "test5_network_partition.sh"
+    "test6_multi_group_tasks.sh"
 )
 
 PASSED=0
@@ -0,0 +1,22 @@
+#!/bin/bash
+
+echo "======================================"
+echo "TEST 6: Task Queue with Multiple Raft Groups"
+echo "======================================"
+
+# Tasks and workers must meet in one queue even when keys are spread over 3 groups
+RAFT_GROUPS=3 docker-compose -f docker-compose.raft.yml up -d
+sleep 15
+
+echo -e "\n--- Draining 60 tasks with 2 workers ---"
+OUTPUT=$(python3 raft/client.py queue 2 60 2>&1)
+echo "$OUTPUT"
+
+if echo "$OUTPUT" | grep -q "claimed 60/60 tasks"; then
+    echo " Every task was claimed"
+else
+    echo " Some tasks were never claimed"
+    exit 1
+fi
+
+echo -e "\n Test 6 Complete"